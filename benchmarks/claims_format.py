@@ -0,0 +1,42 @@
+"""
+Compares token size and parse time of the verbose and compact claims
+formats.
+
+Usage:
+    python benchmarks/claims_format.py [iterations]
+"""
+import sys
+import timeit
+
+from common import report, setup_django
+
+
+def run(iterations):
+    from paseto_auth import tokens
+    from paseto_auth.settings import AUTH_SETTINGS
+
+    data = {'model': 'user', 'pk': 1234, 'lifetime': 'short'}
+    refresh_data = dict(data, key='0123456789abcdefghijklmnopqrstuv')
+    for claims_format in (tokens.VERBOSE, tokens.COMPACT):
+        AUTH_SETTINGS['CLAIMS_FORMAT'] = claims_format
+        access = str(tokens.AccessToken(data=data))
+        refresh = str(tokens.RefreshToken(data=refresh_data))
+        parse_time = timeit.timeit(
+            lambda: tokens.AccessToken(token=access).is_valid(),
+            number=iterations,
+        )
+        create_time = timeit.timeit(
+            lambda: tokens.AccessToken(data=data),
+            number=iterations,
+        )
+        report(claims_format, [
+            ('access token bytes', len(access)),
+            ('refresh token bytes', len(refresh)),
+            ('create us/op', '{:.1f}'.format(create_time / iterations * 1e6)),
+            ('parse us/op', '{:.1f}'.format(parse_time / iterations * 1e6)),
+        ])
+
+
+if __name__ == '__main__':
+    setup_django()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,36 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The benchmarks run against the test project settings, e.g.:
+
+    python benchmarks/claims_format.py
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    """
+    Configures Django using the test project settings.
+    """
+    sys.path[:0] = [BASE_DIR, os.path.join(BASE_DIR, 'tests')]
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+
+    import django
+    django.setup()
+
+
+def report(title, rows):
+    """
+    Prints a simple table with the benchmark results.
+
+    Args:
+        title: table title.
+        rows: list of tuples (label, value).
+    """
+    print(title)
+    width = max(len(label) for label, value in rows)
+    for label, value in rows:
+        print('  {}  {}'.format(label.ljust(width), value))
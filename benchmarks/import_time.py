@@ -0,0 +1,54 @@
+"""
+Reports the import time of paseto_auth.authentication after Django setup,
+using `python -X importtime`, and the heavy modules it pulls in.
+
+Usage:
+    python benchmarks/import_time.py [module ...]
+"""
+import os
+import subprocess
+import sys
+
+from common import BASE_DIR, report
+
+WATCHED = ('paseto_auth', 'paseto', 'pysodium', 'pendulum')
+
+SCRIPT = """
+import django
+django.setup()
+import sys
+marker = '-- paseto_auth imports --'
+sys.stderr.write(marker + '\\n')
+for module in sys.argv[1:]:
+    __import__(module)
+"""
+
+
+def run(modules):
+    path = [BASE_DIR, os.path.join(BASE_DIR, 'tests')]
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='settings',
+        PYTHONPATH=os.pathsep.join(path),
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT] + modules,
+        env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True,
+    )
+    lines = result.stderr.split('-- paseto_auth imports --\n', 1)[1]
+    rows = []
+    total = 0
+    for line in lines.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_time, cumulative, name = line[12:].split('|')
+        if name.strip().split('.')[0] in WATCHED:
+            rows.append((name.rstrip(), '{} us'.format(cumulative.strip())))
+        if not name.startswith('  '):
+            total += int(cumulative)
+    report('modules imported after django.setup()', rows or [('none', '')])
+    report('total', [('cumulative', '{} us'.format(total))])
+
+
+if __name__ == '__main__':
+    run(sys.argv[1:] or ['paseto_auth.authentication'])
@@ -0,0 +1,406 @@
+"""
+Load test with a realistic authentication workload: logins, refreshes and
+authenticated reads with user and app integration tokens.
+
+It runs in-process with the Django test client by default, or against a
+local server sharing the same database file:
+
+    python benchmarks/loadtest.py --requests 5000 --concurrency 8
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000
+
+To start the server (`--setup-only` creates the user population first):
+
+    python benchmarks/loadtest.py --setup-only
+    cd benchmarks && uvicorn loadtest_asgi:application
+    cd benchmarks && DJANGO_SETTINGS_MODULE=loadtest_settings \\
+        PYTHONPATH=..:../tests python -m django runserver --noreload
+
+`--profile DIR` dumps a cProfile file per worker, ready for flamegraph
+tools such as `flameprof` or `snakeviz`.
+
+Exceptions raised by the operations (e.g. database errors) are reported
+by type apart from HTTP error statuses. Any of them makes the run exit with
+an error, since failed requests skew the latencies. Logins made because a
+user had no tokens yet are recorded as logins, whatever the operation
+picked.
+In-process runs on SQLite serialize the login and refresh requests before
+Django 5.1, where concurrent write transactions fail with "database is
+locked" instead of waiting.
+"""
+import argparse
+import bisect
+import contextlib
+import cProfile
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+from common import report, setup_django
+
+PASSWORD = 'loadtest'
+OPERATIONS = ('login', 'refresh', 'user_read', 'app_read')
+
+
+def parse_mix(value):
+    """
+    Parses an operation mix like `login=1,refresh=5,user_read=70`.
+    """
+    mix = dict.fromkeys(OPERATIONS, 0)
+    for item in value.split(','):
+        name, weight = item.split('=')
+        if name not in mix:
+            raise argparse.ArgumentTypeError('Unknown operation ' + name)
+        mix[name] = float(weight)
+    return mix
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--url', help='base URL of a running server')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--apps', type=int, default=10)
+    parser.add_argument(
+        '--mix', type=parse_mix,
+        default=parse_mix('login=2,refresh=8,user_read=70,app_read=20'),
+        help='operation weights (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--reuse', type=float, default=1.1,
+        help='zipf exponent for picking users/apps, 0 for uniform',
+    )
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--profile', metavar='DIR')
+    parser.add_argument('--setup-only', action='store_true')
+    return parser.parse_args()
+
+
+def setup_population(users, apps):
+    """
+    Creates the users and app integration tokens if missing, and resets
+    the password of existing users.
+
+    Returns:
+        A list of usernames and a list of app refresh tokens.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import Group, Permission, User
+    from django.core.management import call_command
+
+    from paseto_auth.models import AppRefreshToken
+    from paseto_auth.tokens import RefreshToken, create_app_token
+    from loadtest_urls import READ_PERMISSION
+
+    call_command('migrate', verbosity=0)
+    usernames = ['loadtest{}'.format(i) for i in range(users)]
+    password = make_password(PASSWORD)
+    queryset = User.objects.filter(username__in=usernames)
+    existing = set(queryset.values_list('username', flat=True))
+    queryset.update(password=password)
+    User.objects.bulk_create([
+        User(username=username, password=password)
+        for username in usernames if username not in existing
+    ])
+
+    app_label, codename = READ_PERMISSION.split('.')
+    group, created = Group.objects.get_or_create(name='loadtest')
+    group.permissions.add(Permission.objects.get(
+        content_type__app_label=app_label, codename=codename,
+    ))
+    names = ['loadtest{}'.format(i) for i in range(apps)]
+    existing = dict(
+        AppRefreshToken.objects.filter(name__in=names, locked=False)
+        .values_list('name', 'key')
+    )
+    app_tokens = []
+    for name in names:
+        if name in existing:
+            app_tokens.append(str(RefreshToken(data={
+                'model': 'app', 'key': existing[name],
+                'lifetime': 'permanent',
+            })))
+        else:
+            app_tokens.append(create_app_token(name=name, groups=[group])[1])
+    return usernames, app_tokens
+
+
+def get_write_lock():
+    """
+    Returns a lock serializing the write requests of in-process runs on
+    SQLite before Django 5.1, which can't start transactions in IMMEDIATE
+    mode, or a no-op context manager otherwise.
+    """
+    import django
+    from django.db import connection
+
+    if connection.vendor == 'sqlite' and django.VERSION < (5, 1):
+        return threading.Lock()
+    return contextlib.nullcontext()
+
+
+class InProcessClient(object):
+    """
+    Sends requests with the Django test client. POST requests (logins and
+    refreshes) hold the write lock.
+    """
+
+    def __init__(self, write_lock):
+        from django.test import Client
+        self.client = Client()
+        self.write_lock = write_lock
+
+    def request(self, method, path, data=None, token=None):
+        headers = {}
+        if token:
+            headers['HTTP_AUTHORIZATION'] = 'Paseto ' + token
+        if method == 'POST':
+            with self.write_lock:
+                response = self.client.post(
+                    path, json.dumps(data), content_type='application/json',
+                    **headers
+                )
+        else:
+            response = self.client.get(path, **headers)
+        return response.status_code, response.json()
+
+
+class HTTPClient(object):
+    """
+    Sends requests to a running server.
+    """
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def request(self, method, path, data=None, token=None):
+        request = urllib.request.Request(self.url + path, method=method)
+        if token:
+            request.add_header('Authorization', 'Paseto ' + token)
+        body = None
+        if data is not None:
+            request.add_header('Content-Type', 'application/json')
+            body = json.dumps(data).encode()
+        try:
+            with urllib.request.urlopen(request, body) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as error:
+            return error.code, {}
+
+
+class Workload(object):
+    """
+    Picks operations and identities, and keeps the issued tokens so they are
+    reused by later operations.
+    """
+
+    def __init__(self, usernames, app_tokens, args):
+        self.usernames = usernames
+        self.app_refresh_tokens = app_tokens
+        self.user_tokens = {}
+        self.app_access_tokens = {}
+        self.lock = threading.Lock()
+        self.operations = [op for op in OPERATIONS if args.mix[op]]
+        self.operation_weights = list(itertools.accumulate(
+            args.mix[op] for op in self.operations
+        ))
+        self.reuse = args.reuse
+
+    def pick(self, rng, weights, choices):
+        index = bisect.bisect(weights, rng.random() * weights[-1])
+        return choices[min(index, len(choices) - 1)]
+
+    def zipf_weights(self, size):
+        return list(itertools.accumulate(
+            1 / (rank + 1) ** self.reuse for rank in range(size)
+        ))
+
+    def next_operation(self, rng):
+        return self.pick(rng, self.operation_weights, self.operations)
+
+    def login(self, client, rng, weights):
+        username = self.pick(rng, weights['users'], self.usernames)
+        status, data = client.request('POST', '/api/auth/token/', {
+            'username': username, 'password': PASSWORD,
+        })
+        if status == 200:
+            with self.lock:
+                self.user_tokens[username] = data
+        return 'login', status, username
+
+    def refresh(self, client, rng, weights):
+        username = self.pick(rng, weights['users'], self.usernames)
+        pair = self.user_tokens.get(username)
+        if pair is None:
+            return self.login(client, rng, weights)
+        status, data = client.request('POST', '/api/auth/token/refresh/', {
+            'refresh_token': pair['refresh_token'],
+        })
+        if status == 200:
+            with self.lock:
+                pair['access_token'] = data['access_token']
+        return 'refresh', status, username
+
+    def user_read(self, client, rng, weights):
+        username = self.pick(rng, weights['users'], self.usernames)
+        pair = self.user_tokens.get(username)
+        if pair is None:
+            return self.login(client, rng, weights)
+        status, data = client.request(
+            'GET', '/api/read/', token=pair['access_token']
+        )
+        if status == 401:
+            self.refresh(client, rng, weights)
+        return 'user_read', status, username
+
+    def app_read(self, client, rng, weights):
+        refresh_token = self.pick(
+            rng, weights['apps'], self.app_refresh_tokens
+        )
+        access_token = self.app_access_tokens.get(refresh_token)
+        if access_token is not None:
+            status, data = client.request(
+                'GET', '/api/read/', token=access_token
+            )
+            if status != 401:
+                return 'app_read', status, refresh_token
+        status, data = client.request('POST', '/api/auth/token/refresh/', {
+            'refresh_token': refresh_token,
+        })
+        if status == 200:
+            with self.lock:
+                self.app_access_tokens[refresh_token] = data['access_token']
+        return 'app_read', status, refresh_token
+
+
+def worker(number, client, workload, counter, args, results):
+    """
+    Runs operations until the request counter is exhausted.
+    """
+    rng = random.Random(args.seed + number)
+    weights = {
+        'users': workload.zipf_weights(len(workload.usernames)),
+        'apps': workload.zipf_weights(len(workload.app_refresh_tokens)),
+    }
+    profile = cProfile.Profile() if args.profile else None
+    if profile:
+        profile.enable()
+    while next(counter) < args.requests:
+        operation = workload.next_operation(rng)
+        start = time.perf_counter()
+        error = None
+        try:
+            operation, status, identity = getattr(workload, operation)(
+                client, rng, weights
+            )
+        except Exception as exc:
+            status, error = None, exc
+        elapsed = time.perf_counter() - start
+        results.append((operation, status, elapsed, error))
+    if profile:
+        profile.disable()
+        profile.dump_stats(
+            os.path.join(args.profile, 'worker-{}.prof'.format(number))
+        )
+
+
+def percentile(values, fraction):
+    index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def report_results(results, elapsed):
+    """
+    Prints the throughput, and the latencies and errors per operation.
+
+    Returns:
+        The number of failed operations: HTTP error statuses and exceptions.
+    """
+    report('throughput', [
+        ('requests', len(results)),
+        ('seconds', '{:.2f}'.format(elapsed)),
+        ('requests/s', '{:.1f}'.format(len(results) / elapsed)),
+    ])
+    for operation in OPERATIONS + ('total',):
+        latencies = sorted(
+            duration for name, status, duration, error in results
+            if operation in ('total', name)
+        )
+        if not latencies:
+            continue
+        errors = sum(
+            1 for name, status, duration, error in results
+            if operation in ('total', name) and status and status >= 400
+        )
+        exceptions = sum(
+            1 for name, status, duration, error in results
+            if operation in ('total', name) and error is not None
+        )
+        report(operation, [
+            ('count', len(latencies)),
+            ('errors', errors),
+            ('exceptions', exceptions),
+            ('p50 ms', '{:.2f}'.format(percentile(latencies, 0.5) * 1e3)),
+            ('p95 ms', '{:.2f}'.format(percentile(latencies, 0.95) * 1e3)),
+            ('p99 ms', '{:.2f}'.format(percentile(latencies, 0.99) * 1e3)),
+        ])
+
+    exceptions = Counter(
+        '{}: {}'.format(type(error).__name__, error)
+        for name, status, duration, error in results if error is not None
+    )
+    if exceptions:
+        report('exceptions', [
+            (str(count), message)
+            for message, count in exceptions.most_common()
+        ])
+    return sum(
+        1 for name, status, duration, error in results
+        if error is not None or status >= 400
+    )
+
+
+def run(args):
+    usernames, app_tokens = setup_population(args.users, args.apps)
+    if args.setup_only:
+        return
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+
+    workload = Workload(usernames, app_tokens, args)
+    write_lock = get_write_lock()
+    counter = itertools.count()
+    results = []
+    threads = []
+    for number in range(args.concurrency):
+        if args.url:
+            client = HTTPClient(args.url)
+        else:
+            client = InProcessClient(write_lock)
+        threads.append(threading.Thread(
+            target=worker,
+            args=(number, client, workload, counter, args, results),
+        ))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return report_results(results, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'loadtest_settings')
+    setup_django()
+    failures = run(get_arguments())
+    if failures:
+        sys.exit("{} operations failed, the results aren't valid".format(
+            failures
+        ))
@@ -0,0 +1,16 @@
+"""
+ASGI application for running the load test against a local server:
+
+    cd benchmarks && uvicorn loadtest_asgi:application
+"""
+import os
+import sys
+
+from common import BASE_DIR
+
+sys.path[:0] = [BASE_DIR, os.path.join(BASE_DIR, 'tests')]
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'loadtest_settings')
+
+from django.core.asgi import get_asgi_application  # noqa: E402
+
+application = get_asgi_application()
@@ -0,0 +1,40 @@
+"""
+Django settings for the load test, based on the test project settings.
+"""
+import os
+import tempfile
+
+import django
+
+from settings import *  # noqa: F401,F403
+from settings import INSTALLED_APPS
+
+INSTALLED_APPS = tuple(
+    app for app in INSTALLED_APPS if app != 'django.contrib.admin'
+)
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get(
+            'LOADTEST_DB',
+            os.path.join(tempfile.gettempdir(), 'paseto_auth_loadtest.db'),
+        ),
+        'OPTIONS': {'timeout': 30},
+    },
+}
+
+if django.VERSION >= (5, 1):
+    # Avoid lock upgrade failures between concurrent login transactions
+    DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
+
+ROOT_URLCONF = 'loadtest_urls'
+
+MIDDLEWARE = []
+
+if os.environ.get('LOADTEST_FAST_HASHER'):
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -0,0 +1,40 @@
+"""
+URLs for the load test: the token endpoints and an authenticated view.
+"""
+from django.urls import include, path
+
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from paseto_auth.models import AppIntegrationUser
+
+# Permission required by app integrations to use the read view
+READ_PERMISSION = 'paseto_auth.add_userrefreshtoken'
+
+
+class ReadPermission(BasePermission):
+    """
+    Allows users, and app integrations with the read permission.
+    """
+
+    def has_permission(self, request, view):
+        if isinstance(request.user, AppIntegrationUser):
+            return request.user.has_perm(READ_PERMISSION)
+        return request.user.is_authenticated
+
+
+class ReadView(APIView):
+    """
+    Authenticated read returning the caller identity.
+    """
+    permission_classes = (ReadPermission,)
+
+    def get(self, request):
+        return Response({'model': request.auth.data['model']})
+
+
+urlpatterns = [
+    path('api/auth/', include('paseto_auth.urls', namespace='paseto_auth')),
+    path('api/read/', ReadView.as_view(), name='read'),
+]
@@ -0,0 +1,61 @@
+"""
+Compares memory allocations and creation time of tokens created from a data
+dict and tokens minted by a token factory.
+
+Usage:
+    python benchmarks/token_factory.py [iterations]
+"""
+import sys
+import timeit
+import tracemalloc
+
+from common import report, setup_django
+
+
+def measure(create, iterations):
+    """
+    Returns the peak traced memory of a single call, and the memory retained
+    per token when keeping `iterations` tokens alive.
+    """
+    create()
+    tracemalloc.start()
+    try:
+        create()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        created = [create() for i in range(iterations)]
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    del created
+    return peak, retained / iterations
+
+
+def run(iterations):
+    from paseto_auth import tokens
+    from paseto_auth.settings import AUTH_SETTINGS
+
+    data = {'model': 'user', 'pk': 1234}
+    for claims_format in (tokens.VERBOSE, tokens.COMPACT):
+        AUTH_SETTINGS['CLAIMS_FORMAT'] = claims_format
+        factory = tokens.AccessToken.factory(model='user')
+        candidates = (
+            ('data', lambda: tokens.AccessToken(data=data)),
+            ('factory', lambda: factory(pk=1234)),
+        )
+        for name, create in candidates:
+            peak, retained = measure(create, iterations)
+            create_time = timeit.timeit(create, number=iterations)
+            report('{} {}'.format(claims_format, name), [
+                ('peak bytes/op', peak),
+                ('retained bytes/token', '{:.0f}'.format(retained)),
+                ('create us/op', '{:.1f}'.format(
+                    create_time / iterations * 1e6
+                )),
+            ])
+
+
+if __name__ == '__main__':
+    setup_django()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -1,24 +1,172 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import UserRefreshToken, AppRefreshToken, AuthEvent
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids a full `COUNT(*)` on large token tables.
+
+    Unfiltered querysets use the table statistics kept by the database
+    (PostgreSQL and MySQL), filtered ones count at most `count_limit` rows.
+
+    Attributes:
+        count_limit: maximum number of rows counted for filtered querysets.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where:
+            estimate = self.get_estimated_count()
+            if estimate is not None and estimate > self.count_limit:
+                return estimate
+        return self.object_list.values('pk')[:self.count_limit].count()
+
+    def get_estimated_count(self):
+        """
+        Reads the row count estimate from the database statistics.
+
+        Returns:
+            An integer, or None if the database backend keeps no estimate.
+        """
+        model = self.object_list.model
+        connection = connections[self.object_list.db]
+        if connection.vendor == 'postgresql':
+            sql = "SELECT reltuples FROM pg_class WHERE relname = %s"
+        elif connection.vendor == 'mysql':
+            sql = (
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s"
+            )
+        else:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] is not None else None
+
+
+class ExpiryListFilter(admin.SimpleListFilter):
+    """
+    Filters refresh tokens by expiry date buckets.
+    """
+    title = 'expiry'
+    parameter_name = 'expiry'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('expired', 'Expired'),
+            ('day', 'Expires in 24 hours'),
+            ('week', 'Expires in 7 days'),
+            ('active', 'Active'),
+            ('never', 'No expiry date'),
+        )
 
-from .models import UserRefreshToken, AppRefreshToken
+    def queryset(self, request, queryset):
+        now = timezone.now()
+        if self.value() == 'expired':
+            return queryset.filter(expires_at__lte=now)
+        if self.value() == 'day':
+            return queryset.filter(
+                expires_at__gt=now, expires_at__lte=now + timedelta(days=1)
+            )
+        if self.value() == 'week':
+            return queryset.filter(
+                expires_at__gt=now, expires_at__lte=now + timedelta(days=7)
+            )
+        if self.value() == 'active':
+            return queryset.filter(expires_at__gt=now)
+        if self.value() == 'never':
+            return queryset.filter(expires_at__isnull=True)
+        return queryset
 
 
-class UserRefreshTokenAdmin(admin.ModelAdmin):
+class AbstractRefreshTokenAdmin(admin.ModelAdmin):
+    """
+    Base admin for refresh token tables with millions of rows.
+    """
+    list_filter = ('locked', ExpiryListFilter)
+    search_fields = ('key',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('lock_tokens', 'unlock_tokens')
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Searches tokens by key prefix so the primary key index is used.
+        """
+        search_term = search_term.strip().lower()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(key__startswith=search_term), False
+
+    def lock_tokens(self, request, queryset):
+        updated = queryset.update(locked=True)
+        self.message_user(request, '{} tokens locked.'.format(updated))
+    lock_tokens.short_description = 'Lock selected tokens'
+    lock_tokens.allowed_permissions = ('change',)
+
+    def unlock_tokens(self, request, queryset):
+        updated = queryset.update(locked=False)
+        self.message_user(request, '{} tokens unlocked.'.format(updated))
+    unlock_tokens.short_description = 'Unlock selected tokens'
+    unlock_tokens.allowed_permissions = ('change',)
+
+
+class UserRefreshTokenAdmin(AbstractRefreshTokenAdmin):
     readonly_fields = (
         'user', 'key', 'user_agent', 'ip', 'created_at', 'expires_at'
     )
-    list_display = ('user', 'key')
-    list_select_related = True
+    list_display = ('user', 'key', 'locked', 'expires_at')
+    list_select_related = ('user',)
 
 
-class AppRefreshTokenAdmin(admin.ModelAdmin):
+class AppRefreshTokenAdmin(AbstractRefreshTokenAdmin):
     readonly_fields = (
         'key', 'user_agent', 'ip', 'created_at', 'expires_at',
         'owner_ct', 'owner_id', 'owner', 'groups', 'user_permissions'
     )
-    list_display = ('name', 'owner')
-    list_select_related = True
+    list_display = ('name', 'owner', 'locked', 'expires_at')
+    list_select_related = False
+
+    def get_queryset(self, request):
+        """
+        Prefetches the generic owner to avoid a query per row.
+        """
+        return super().get_queryset(request).prefetch_related('owner')
+
+
+class AuthEventAdmin(admin.ModelAdmin):
+    """
+    Read-only admin for the authentication audit log.
+    """
+    list_display = ('created_at', 'event', 'model', 'subject', 'ip')
+    list_filter = ('event', 'model')
+    search_fields = ('subject',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(subject=search_term), False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 admin.site.register(UserRefreshToken, UserRefreshTokenAdmin)
 admin.site.register(AppRefreshToken, AppRefreshTokenAdmin)
+admin.site.register(AuthEvent, AuthEventAdmin)
@@ -0,0 +1,34 @@
+from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import post_migrate
+
+
+class PasetoAuthConfig(AppConfig):
+    name = 'paseto_auth'
+    verbose_name = 'Paseto auth'
+
+    def ready(self):
+        """
+        Imports paseto and its crypto backend at startup if `WARM_IMPORTS`
+        is enabled, otherwise they're imported on first token use. Connects
+        the signals keeping the app token permissions in sync if
+        `DENORMALIZE_PERMISSIONS` is enabled. Clears the user agent id
+        cache when the database is migrated or flushed, and registers the
+        settings checks.
+        """
+        from .checks import check_crypto_backend, check_session_limits
+        from .settings import AUTH_SETTINGS
+        from .models import UserAgent
+
+        checks.register(check_session_limits)
+        checks.register(check_crypto_backend)
+        post_migrate.connect(
+            lambda **kwargs: UserAgent.objects.clear_cache(),
+            sender=self, weak=False,
+            dispatch_uid='paseto_auth.clear_user_agent_cache',
+        )
+        if AUTH_SETTINGS['WARM_IMPORTS']:
+            import paseto  # noqa: F401
+        if AUTH_SETTINGS['DENORMALIZE_PERMISSIONS']:
+            from . import signals
+            signals.connect()
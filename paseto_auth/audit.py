@@ -0,0 +1,245 @@
+import atexit
+import ipaddress
+import logging
+import os
+import threading
+from collections import deque
+
+from . import clock
+from .settings import AUTH_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+LOGIN = 'login'
+LOGIN_FAILED = 'login_failed'
+REFRESH = 'refresh'
+REFRESH_FAILED = 'refresh_failed'
+AUTH_FAILED = 'auth_failed'
+APP_TOKEN_USE = 'app_token_use'
+
+EVENT_CHOICES = [
+    (LOGIN, "Login"),
+    (LOGIN_FAILED, "Failed login"),
+    (REFRESH, "Refresh"),
+    (REFRESH_FAILED, "Failed refresh"),
+    (AUTH_FAILED, "Failed authentication"),
+    (APP_TOKEN_USE, "App token use"),
+]
+
+# Overflow policies of a full buffer
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+
+# Length of the `AuthEvent.subject` column
+SUBJECT_MAX_LENGTH = 150
+
+# Seconds to wait for the flush thread at shutdown
+STOP_TIMEOUT = 5
+
+_audit_log = None
+
+
+def clean_ip(ip):
+    """
+    Validates an IP address string.
+
+    Returns:
+        The stripped IP string, or None if it isn't a valid address.
+    """
+    if not ip:
+        return None
+    ip = ip.strip()
+    try:
+        ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    return ip
+
+
+def get_client_ip(request):
+    """
+    Determines the real client IP from the request headers.
+
+    Returns:
+        A string containing the IP, or None if missing or malformed.
+    """
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return clean_ip(x_forwarded_for.split(',')[0])
+    return clean_ip(request.META.get('REMOTE_ADDR'))
+
+
+class AuditLog(object):
+    """
+    Bounded in-memory buffer of authentication events, written to the
+    `AuthEvent` table in batches by a background thread, so recording an
+    event doesn't wait for the database.
+
+    Attributes:
+        size: maximum number of buffered events.
+        interval: seconds between flushes, or None to only flush manually.
+        batch_size: events per insert query. A buffer holding a full batch
+            wakes the flush thread before the interval ends.
+        overflow: 'drop_newest' to discard the events recorded with a full
+            buffer, or 'drop_oldest' to discard the oldest buffered ones.
+        using: database alias.
+        recorded: number of events buffered.
+        dropped: number of events discarded by a full buffer.
+        flushed: number of events written.
+        failed: number of events lost by failed writes.
+    """
+
+    def __init__(self, size=10000, interval=1, batch_size=500,
+                 overflow=DROP_NEWEST, using='default'):
+        self.size = size
+        self.interval = interval
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.using = using
+        self.recorded = self.dropped = self.flushed = self.failed = 0
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._pid = None
+
+    def record(self, event, model='', subject='', ip=None):
+        """
+        Buffers an event, starting the flush thread if needed. The subject
+        is truncated and invalid IPs are discarded, so a single malformed
+        event can't fail the write of its whole batch.
+
+        Args:
+            event: event name, e.g. 'login'.
+            model: 'user' or 'app'.
+            subject: user pk or username, or token key.
+            ip: client IP.
+        """
+        entry = (
+            event, model, str(subject)[:SUBJECT_MAX_LENGTH], clean_ip(ip),
+            clock.now(),
+        )
+        with self._lock:
+            if len(self._buffer) >= self.size:
+                self.dropped += 1
+                if self.overflow == DROP_NEWEST:
+                    return
+                self._buffer.popleft()
+            self._buffer.append(entry)
+            self.recorded += 1
+            pending = len(self._buffer)
+        if self.interval is not None:
+            if self._pid != os.getpid():
+                self.start()
+            if pending >= self.batch_size:
+                self._wakeup.set()
+
+    def flush(self):
+        """
+        Writes the buffered events to the database.
+
+        Returns:
+            The number of events written.
+        """
+        from django.db import DatabaseError
+        from .models import AuthEvent
+
+        with self._flush_lock:
+            with self._lock:
+                entries = list(self._buffer)
+                self._buffer.clear()
+            if not entries:
+                return 0
+            try:
+                AuthEvent.objects.using(self.using).bulk_create(
+                    [
+                        AuthEvent(
+                            event=event, model=model, subject=subject, ip=ip,
+                            created_at=created_at,
+                        )
+                        for event, model, subject, ip, created_at in entries
+                    ],
+                    batch_size=self.batch_size,
+                )
+            except DatabaseError:
+                self.failed += len(entries)
+                logger.exception(
+                    "Failed to write %d audit events", len(entries)
+                )
+                return 0
+            self.flushed += len(entries)
+            return len(entries)
+
+    def start(self):
+        """
+        Starts the flush thread of the current process. Events inherited
+        from a parent process are discarded, since the parent writes them.
+        """
+        with self._lock:
+            pid = os.getpid()
+            if self._pid == pid:
+                return
+            if self._pid is not None:
+                self._buffer.clear()
+            self._pid = pid
+            self._stopped = False
+            self._thread = threading.Thread(
+                target=self._run, name='paseto-auth-audit', daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops the flush thread and writes the remaining events.
+        """
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(STOP_TIMEOUT)
+        self._thread = self._pid = None
+        self.flush()
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while not self._stopped:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+            close_old_connections()
+
+
+def get_audit_log():
+    """
+    Returns the process audit log, created from the `AUDIT_*` settings and
+    flushed at interpreter shutdown.
+    """
+    global _audit_log
+    if _audit_log is None:
+        _audit_log = AuditLog(
+            size=AUTH_SETTINGS['AUDIT_BUFFER_SIZE'],
+            interval=AUTH_SETTINGS['AUDIT_FLUSH_INTERVAL'],
+            batch_size=AUTH_SETTINGS['AUDIT_BATCH_SIZE'],
+            overflow=AUTH_SETTINGS['AUDIT_OVERFLOW'],
+            using=AUTH_SETTINGS['WRITE_DATABASE'],
+        )
+        atexit.register(_audit_log.stop)
+    return _audit_log
+
+
+def record(event, request=None, model='', subject=''):
+    """
+    Records an authentication event if `AUDIT_LOG` is enabled.
+
+    Args:
+        event: event name, e.g. 'login'.
+        request: optional request, for the client IP.
+        model: 'user' or 'app'.
+        subject: user pk or username, or token key.
+    """
+    if not AUTH_SETTINGS['AUDIT_LOG']:
+        return
+    ip = None if request is None else get_client_ip(request)
+    get_audit_log().record(event, model, subject, ip)
@@ -6,16 +6,25 @@ from django.utils.functional import SimpleLazyObject
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework import authentication
 
-from .models import AppRefreshToken, AppIntegrationUser
+from . import audit, clock
 from .settings import AUTH_SETTINGS
+from .stores import get_token_store
 from .tokens import AccessToken
 
+# Request attribute storing the result of the authentication middleware
+PASETO_AUTH_ATTR = '_paseto_auth'
+
+# Request attribute storing the renewed access token, if any
+PASETO_RENEWAL_ATTR = '_paseto_renewal'
+
 
 def get_user(access_token):
     """
     Returns the user associated with the given access token.
     If no user is retrieved, return an instance of `AnonymousUser`.
     """
+    from .models import AppIntegrationUser
+
     try:
         if access_token.data['model'] == 'user':
             user_model = get_user_model()
@@ -24,9 +33,8 @@ def get_user(access_token):
                 is_active=True,
             )
         elif access_token.data['model'] == 'app':
-            app_token = AppRefreshToken.objects.get(
-                key=access_token.data['pk'],
-                locked=False
+            app_token = get_token_store().get_token(
+                'app', access_token.data['pk']
             )
             user = AppIntegrationUser(app_token)
     except ObjectDoesNotExist:
@@ -35,6 +43,109 @@ def get_user(access_token):
     return user
 
 
+def get_authorization_token(request):
+    """
+    Extracts the token string from the authentication header.
+
+    Returns:
+        A string, or None if the header is missing or has another scheme.
+    """
+    if not request.META.get('HTTP_AUTHORIZATION'):
+        return None
+
+    header = request.META['HTTP_AUTHORIZATION'].split()
+    if header[0] != AUTH_SETTINGS['HEADER_PREFIX'] or len(header) != 2:
+        return None
+
+    return header[1]
+
+
+def authenticate_credentials(token, request=None):
+    """
+    Validates an access token string. Failures and app token uses are
+    recorded in the audit log.
+
+    Args:
+        token: access token string.
+        request: optional request, for the audit log.
+
+    Returns:
+        A tuple with the (lazy) authenticated user and the access token.
+
+    Raises:
+        AuthenticationFailed if the access token is invalid.
+    """
+    access_token = AccessToken(token=token)
+
+    if not access_token.is_valid():
+        audit.record(audit.AUTH_FAILED, request)
+        raise AuthenticationFailed("Invalid access token")
+    if access_token.data['model'] == 'app':
+        audit.record(
+            audit.APP_TOKEN_USE, request, 'app', access_token.data['pk']
+        )
+
+    user = SimpleLazyObject(lambda: get_user(access_token))
+
+    return (user, access_token)
+
+
+def get_renewed_token(user, access_token):
+    """
+    Mints a successor of a verified access token that expires within the
+    `ACCESS_RENEWAL_WINDOW`, from its claims. Successors keep the
+    `renew_until` claim (the expiration of the refresh token the chain
+    started from), and aren't minted past it. Tokens within the window are
+    only renewed if their owner is still active and, for user tokens, the
+    refresh token they were obtained with isn't revoked, so locking it (or
+    evicting the session) stops the renewals.
+
+    Args:
+        user: the (lazy) authenticated user.
+        access_token: the verified access token.
+
+    Returns:
+        An AccessToken, or None if the token doesn't need or can't get
+        renewal.
+    """
+    window = AUTH_SETTINGS['ACCESS_RENEWAL_WINDOW']
+    renew_until = access_token.data.get('renew_until')
+    if not window or renew_until is None:
+        return None
+    now = clock.timestamp()
+    if access_token.get_expiration() - now > window:
+        return None
+    if now + AccessToken.lifetime > clock.to_timestamp(renew_until):
+        return None
+    if not user.is_authenticated:
+        return None
+    data = {
+        'model': access_token.data['model'],
+        'pk': access_token.data['pk'],
+        'renew_until': renew_until,
+    }
+    if data['model'] == 'user':
+        data['key'] = access_token.data.get('key')
+        if data['key'] is None:
+            return None
+        try:
+            get_token_store().get_token('user', data['key'])
+        except ObjectDoesNotExist:
+            return None
+    return AccessToken(data=data)
+
+
+def set_renewed_token(request, user, access_token):
+    """
+    Stores the authentication result in the underlying Django request, for
+    `PasetoRenewalMiddleware` to renew the access token when the response
+    is sent, if needed.
+    """
+    request = getattr(request, '_request', request)
+    if not hasattr(request, PASETO_RENEWAL_ATTR):
+        setattr(request, PASETO_RENEWAL_ATTR, (user, access_token))
+
+
 class PasetoAuthentication(authentication.BaseAuthentication):
     """
     Paseto authentication scheme for Django Rest Framkwork.
@@ -46,22 +157,21 @@ class PasetoAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
         """
         Checks that the authentication header contains a valid access token.
+        The result of `PasetoAuthMiddleware` is reused if already verified.
+        Access tokens close to their expiration are renewed if
+        `ACCESS_RENEWAL_WINDOW` is set.
 
         Returns:
             A tuple with the authenticated user and the access token.
         """
-        if not request.META.get('HTTP_AUTHORIZATION'):
-            return None
-
-        header = request.META['HTTP_AUTHORIZATION'].split()
-        if header[0] != AUTH_SETTINGS['HEADER_PREFIX'] or len(header) != 2:
-            return None
-
-        access_token = AccessToken(token=header[1])
-
-        if not access_token.is_valid():
-            raise AuthenticationFailed("Invalid access token")
-
-        user = SimpleLazyObject(lambda: get_user(access_token))
+        result = getattr(request, PASETO_AUTH_ATTR, None)
+        if isinstance(result, AuthenticationFailed):
+            raise result
+        elif result is None:
+            token = get_authorization_token(request)
+            if token is None:
+                return None
+            result = authenticate_credentials(token, request)
 
-        return (user, access_token)
+        set_renewed_token(request, *result)
+        return result
@@ -0,0 +1,123 @@
+import hashlib
+import hmac
+import threading
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+from . import clock
+from .settings import AUTH_SETTINGS
+
+CACHE_KEY_PREFIX = 'paseto_auth:claims:'
+
+# Derived key, so cache keys don't expose a hash made with the token key
+_hash_key = hashlib.sha256(
+    b'paseto_auth.cache' + bytes.fromhex(AUTH_SETTINGS['SECRET_KEY'])
+).digest()
+
+
+class LocalCache(object):
+    """
+    Process local LRU cache with per-entry expiration.
+
+    Attributes:
+        max_size: maximum number of entries.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the cached value, or None if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if clock.timestamp() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        """
+        Stores a value until the given epoch timestamp.
+        """
+        if not self.max_size:
+            return
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalCache(AUTH_SETTINGS['VERIFICATION_CACHE_SIZE'])
+
+
+def is_enabled():
+    """
+    Indicates if any verification cache tier is enabled.
+    """
+    return bool(local_cache.max_size or AUTH_SETTINGS['VERIFICATION_CACHE'])
+
+
+def get_cache_key(token, prefix=CACHE_KEY_PREFIX):
+    """
+    Returns the cache key for a token string (a keyed hash of the token).
+    """
+    digest = hmac.new(_hash_key, token.encode(), hashlib.sha256).hexdigest()
+    return prefix + digest
+
+
+def get_claims(token):
+    """
+    Retrieves the verified claims of a token from the local cache, or from
+    the shared `VERIFICATION_CACHE` on a local miss.
+
+    Args:
+        token: token string.
+
+    Returns:
+        A dict containing the token claims, or None if not cached.
+    """
+    key = get_cache_key(token)
+    claims = local_cache.get(key)
+    if claims is None and AUTH_SETTINGS['VERIFICATION_CACHE']:
+        claims = caches[AUTH_SETTINGS['VERIFICATION_CACHE']].get(key)
+        if claims is not None:
+            exp = clock.to_timestamp(claims['exp'])
+            if clock.timestamp() >= exp:
+                return None
+            local_cache.set(key, claims, exp)
+    return None if claims is None else claims.copy()
+
+
+def set_claims(token, claims):
+    """
+    Stores the verified claims of a token in the local and shared caches,
+    until the token expiration.
+
+    Args:
+        token: token string.
+        claims: dict containing the token claims.
+    """
+    exp = clock.to_timestamp(claims.get('exp'))
+    if exp is None:
+        return
+    ttl = int(exp - clock.timestamp())
+    if ttl <= 0:
+        return
+    key = get_cache_key(token)
+    local_cache.set(key, claims.copy(), exp)
+    if AUTH_SETTINGS['VERIFICATION_CACHE']:
+        caches[AUTH_SETTINGS['VERIFICATION_CACHE']].set(key, claims, ttl)
@@ -0,0 +1,50 @@
+from django.core import checks
+
+from .settings import AUTH_SETTINGS
+
+
+def check_session_limits(app_configs, **kwargs):
+    """
+    Checks the token store supports `MAX_SESSIONS_PER_USER`, since logins
+    would fail otherwise.
+    """
+    from .stores import get_token_store
+
+    if not AUTH_SETTINGS['MAX_SESSIONS_PER_USER']:
+        return []
+    store = get_token_store()
+    if store.supports_session_limits:
+        return []
+    return [checks.Error(
+        "{} doesn't support session limits.".format(type(store).__name__),
+        hint="Unset MAX_SESSIONS_PER_USER or use the ORM token store.",
+        id='paseto_auth.E001',
+    )]
+
+
+def check_crypto_backend(app_configs, **kwargs):
+    """
+    Checks the crypto backend supports the `PASETO_VERSION` of new tokens,
+    since token issuance would fail otherwise.
+    """
+    from django.utils.module_loading import import_string
+
+    from .crypto import get_available_backends, get_header
+
+    path = AUTH_SETTINGS['CRYPTO_BACKEND']
+    version = AUTH_SETTINGS['PASETO_VERSION']
+    if path is None:
+        if get_available_backends(get_header()):
+            return []
+        return [checks.Error(
+            "No installed crypto backend supports {} tokens.".format(version),
+            hint="Install pysodium or set PASETO_VERSION to 'v2'.",
+            id='paseto_auth.E002',
+        )]
+    if get_header() in import_string(path).versions:
+        return []
+    return [checks.Error(
+        "{} doesn't support {} tokens.".format(path, version),
+        hint="Unset CRYPTO_BACKEND or use a backend supporting the version.",
+        id='paseto_auth.E002',
+    )]
@@ -0,0 +1,123 @@
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .settings import AUTH_SETTINGS
+
+_source = time.time
+_local = threading.local()
+
+
+def set_source(source):
+    """
+    Replaces the time source used by the token layer.
+
+    Args:
+        source: callable returning the current epoch timestamp, or None
+            to restore the system clock.
+    """
+    global _source
+    _source = source or time.time
+
+
+@contextmanager
+def freeze(timestamp):
+    """
+    Freezes the token layer clock at the given epoch timestamp.
+
+    Args:
+        timestamp: epoch timestamp (int or float).
+    """
+    previous = _source
+    set_source(lambda: timestamp)
+    try:
+        yield
+    finally:
+        set_source(previous)
+
+
+@contextmanager
+def scope():
+    """
+    Caches the current time for the duration of the block (e.g. a request),
+    so multi-token operations read the clock once. Nested scopes reuse the
+    outermost cached value.
+    """
+    outermost = getattr(_local, 'timestamp', None) is None
+    if outermost:
+        _local.timestamp = _source()
+    try:
+        yield
+    finally:
+        if outermost:
+            _local.timestamp = None
+
+
+def timestamp():
+    """
+    Returns the current epoch timestamp, cached if inside a `scope` block.
+    """
+    cached = getattr(_local, 'timestamp', None)
+    return _source() if cached is None else cached
+
+
+def utcnow():
+    """
+    Returns the current time as a timezone aware UTC datetime.
+    """
+    return datetime.fromtimestamp(timestamp(), dt_timezone.utc)
+
+
+def now():
+    """
+    Returns the current time to be stored in the database. Like
+    `django.utils.timezone.now`, it's aware if `USE_TZ` is enabled and a
+    naive local time otherwise.
+    """
+    value = utcnow()
+    if not settings.USE_TZ:
+        value = timezone.make_naive(value)
+    return value
+
+
+def to_timestamp(value):
+    """
+    Converts an expiration claim to an epoch timestamp.
+
+    Args:
+        value: integer epoch or ISO 8601 string (naive values are UTC).
+
+    Returns:
+        A float, or None if the value is empty.
+
+    Raises:
+        ValueError: invalid date string.
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError("Invalid date: {}".format(value))
+    if timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed.timestamp()
+
+
+def is_expired(exp):
+    """
+    Checks an expiration claim against the current time, allowing for the
+    configured `LEEWAY` seconds of clock skew between nodes.
+
+    Args:
+        exp: integer epoch or ISO 8601 string.
+
+    Returns:
+        A boolean.
+    """
+    exp = to_timestamp(exp)
+    return exp is not None and timestamp() > exp + AUTH_SETTINGS['LEEWAY']
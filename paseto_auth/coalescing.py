@@ -0,0 +1,151 @@
+import threading
+import time
+
+from django.core.cache import caches
+
+from . import clock
+from .cache import get_cache_key
+from .settings import AUTH_SETTINGS
+
+CACHE_KEY_PREFIX = 'paseto_auth:refresh:'
+
+# Seconds a process waits for another one to share its result
+LOCK_TIMEOUT = 5
+POLL_INTERVAL = 0.05
+
+
+class Call(object):
+    """
+    In-flight or recently completed call.
+    """
+    __slots__ = ('event', 'result', 'error', 'expires_at')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.expires_at = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls with the same key into a single call, whose
+    result is shared with the waiting callers, and with later callers for
+    `window` seconds. Exceptions are shared with the waiting callers only.
+
+    Attributes:
+        max_size: number of completed calls kept before purging the
+            expired ones.
+        timeout: seconds a caller waits for an in-flight call before
+            running `func` itself, so a hung call doesn't block them.
+    """
+
+    def __init__(self, max_size=10000, timeout=LOCK_TIMEOUT):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, window=0):
+        """
+        Runs `func`, unless a call with the same key is in flight or was
+        completed less than `window` seconds ago. Callers waiting for an
+        in-flight call longer than `timeout` run `func` themselves.
+
+        Returns:
+            The result of the (shared) call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.event.is_set() and (
+                call.expires_at <= clock.timestamp()
+            ):
+                call = None
+            leader = call is None
+            if leader:
+                if len(self._calls) >= self.max_size:
+                    self._purge()
+                call = self._calls[key] = Call()
+
+        if not leader:
+            if not call.event.wait(self.timeout):
+                return func()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            call.expires_at = clock.timestamp() + window
+            with self._lock:
+                if call.error is not None or not window:
+                    self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+    def _purge(self):
+        now = clock.timestamp()
+        for key, call in list(self._calls.items()):
+            if call.event.is_set() and call.expires_at <= now:
+                del self._calls[key]
+
+
+refresh_flight = SingleFlight()
+
+
+def share_across_processes(key, func, window):
+    """
+    Runs `func` in a single process at a time for a given key, with a lock
+    in the `REFRESH_COALESCING_CACHE` cache, and shares the result with the
+    other processes for `window` seconds (at least one second).
+    """
+    cache = caches[AUTH_SETTINGS['REFRESH_COALESCING_CACHE']]
+    result_key = get_cache_key(key, CACHE_KEY_PREFIX)
+    lock_key = result_key + ':lock'
+    result = cache.get(result_key)
+    if result is not None:
+        return result
+
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            result = cache.get(result_key)
+            if result is not None:
+                return result
+            if cache.get(lock_key) is None:
+                break
+        return func()
+
+    try:
+        result = func()
+        cache.set(result_key, result, max(int(window), 1))
+    finally:
+        cache.delete(lock_key)
+    return result
+
+
+def coalesce(key, func):
+    """
+    Runs `func` with single-flight coalescing of concurrent calls with the
+    same key, in the process and, if `REFRESH_COALESCING_CACHE` is set,
+    across processes. The result is shared for `REFRESH_COALESCING_WINDOW`
+    seconds.
+
+    Args:
+        key: string identifying the call, e.g. a refresh token.
+        func: callable without arguments.
+
+    Returns:
+        The result of the (shared) call.
+    """
+    window = AUTH_SETTINGS['REFRESH_COALESCING_WINDOW']
+    if AUTH_SETTINGS['REFRESH_COALESCING_CACHE']:
+        return refresh_flight.do(
+            key, lambda: share_across_processes(key, func, window), window
+        )
+    return refresh_flight.do(key, func, window)
@@ -0,0 +1,368 @@
+import base64
+import functools
+import hashlib
+import hmac
+import struct
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from .settings import AUTH_SETTINGS
+
+V2_LOCAL = b'v2.local.'
+V4_LOCAL = b'v4.local.'
+
+# Backends tried in order when `CRYPTO_BACKEND` isn't set
+BACKENDS = [
+    'paseto_auth.crypto.SodiumBackend',
+    'paseto_auth.crypto.NaClBackend',
+    'paseto_auth.crypto.PasetoBackend',
+]
+
+_backends = {}
+
+
+class CryptoError(ValueError):
+    """
+    Invalid or tampered token.
+    """
+    pass
+
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def b64decode(data):
+    try:
+        return base64.urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+    except ValueError:
+        raise CryptoError("Invalid token encoding")
+
+
+def pre_auth_encode(*pieces):
+    """
+    PASETO pre-authentication encoding of the given byte strings.
+    """
+    output = [struct.pack('<Q', len(pieces))]
+    for piece in pieces:
+        output.append(struct.pack('<Q', len(piece)))
+        output.append(piece)
+    return b''.join(output)
+
+
+@functools.lru_cache(maxsize=8)
+def get_version_key(key, header):
+    """
+    Returns the key of a token version. v2.local uses the key as is, for
+    compatibility with the issued tokens and other implementations, and
+    later versions a key derived from it, so no key is shared across
+    versions.
+    """
+    if header == V2_LOCAL:
+        return key
+    return hashlib.blake2b(
+        b'paseto_auth.key.' + header, key=key, digest_size=32
+    ).digest()
+
+
+def split_token(token, header):
+    """
+    Returns the decoded payload and footer of a local token.
+    """
+    if not token.startswith(header):
+        raise CryptoError("Unexpected token header")
+    parts = token[len(header):].split(b'.')
+    if len(parts) > 2:
+        raise CryptoError("Invalid token format")
+    footer = b64decode(parts[1]) if len(parts) == 2 else b''
+    return b64decode(parts[0]), footer
+
+
+def join_token(header, payload, footer):
+    token = header + b64encode(payload)
+    if footer:
+        token += b'.' + b64encode(footer)
+    return token
+
+
+class BaseCryptoBackend(object):
+    """
+    Base class for PASETO local encryption backends. The `encrypt_v*`
+    methods accept fixed `random` nonce bytes for the test vectors.
+
+    Attributes:
+        name: backend name.
+        versions: tuple of supported token headers, e.g. `b'v2.local.'`.
+    """
+    name = None
+    versions = ()
+
+    @classmethod
+    def is_available(cls):
+        """
+        Indicates if the backend libraries are installed.
+        """
+        raise NotImplementedError
+
+    def encrypt(self, message, key, header=V2_LOCAL, footer=b''):
+        """
+        Encrypts a message.
+
+        Args:
+            message: bytes to encrypt.
+            key: 32 bytes key, from which the key of the version is derived.
+            header: token header (version and purpose).
+            footer: optional bytes authenticated but not encrypted.
+
+        Returns:
+            The token as bytes.
+
+        Raises:
+            CryptoError: unsupported version.
+        """
+        if header == V2_LOCAL and V2_LOCAL in self.versions:
+            return self.encrypt_v2(message, key, footer)
+        elif header == V4_LOCAL and V4_LOCAL in self.versions:
+            return self.encrypt_v4(
+                message, get_version_key(key, V4_LOCAL), footer
+            )
+        raise CryptoError("Unsupported token version")
+
+    def decrypt(self, token, key):
+        """
+        Decrypts a token of any supported version.
+
+        Args:
+            token: token bytes.
+            key: 32 bytes key, from which the key of the version is derived.
+
+        Returns:
+            A tuple with the message and footer bytes.
+
+        Raises:
+            CryptoError: invalid token or unsupported version.
+        """
+        header = token[:len(V2_LOCAL)]
+        if header == V2_LOCAL and V2_LOCAL in self.versions:
+            return self.decrypt_v2(token, key)
+        elif header == V4_LOCAL and V4_LOCAL in self.versions:
+            return self.decrypt_v4(token, get_version_key(key, V4_LOCAL))
+        raise CryptoError("Unsupported token version")
+
+
+class SodiumBackend(BaseCryptoBackend):
+    """
+    libsodium through pysodium, with v2.local and v4.local support.
+    """
+    name = 'sodium'
+    versions = (V2_LOCAL, V4_LOCAL)
+
+    @classmethod
+    def is_available(cls):
+        try:
+            import pysodium  # noqa: F401
+        except (ImportError, ValueError):
+            return False
+        return True
+
+    def __init__(self):
+        import pysodium
+        self.sodium = pysodium
+
+    def encrypt_v2(self, message, key, footer=b'', random=None):
+        nonce = self.sodium.crypto_generichash(
+            message, k=random or self.sodium.randombytes(24), outlen=24
+        )
+        ciphertext = self.sodium.crypto_aead_xchacha20poly1305_ietf_encrypt(
+            message, pre_auth_encode(V2_LOCAL, nonce, footer), nonce, key
+        )
+        return join_token(V2_LOCAL, nonce + ciphertext, footer)
+
+    def decrypt_v2(self, token, key):
+        payload, footer = split_token(token, V2_LOCAL)
+        nonce, ciphertext = payload[:24], payload[24:]
+        try:
+            message = self.sodium.crypto_aead_xchacha20poly1305_ietf_decrypt(
+                ciphertext, pre_auth_encode(V2_LOCAL, nonce, footer),
+                nonce, key,
+            )
+        except ValueError:
+            raise CryptoError("Invalid token")
+        return message, footer
+
+    def get_v4_keys(self, key, nonce):
+        """
+        Returns the encryption key, the stream nonce and the authentication
+        key derived from the key and the token nonce.
+        """
+        derived = self.sodium.crypto_generichash(
+            b'paseto-encryption-key' + nonce, k=key, outlen=56
+        )
+        auth_key = self.sodium.crypto_generichash(
+            b'paseto-auth-key-for-aead' + nonce, k=key, outlen=32
+        )
+        return derived[:32], derived[32:], auth_key
+
+    def encrypt_v4(self, message, key, footer=b'', implicit=b'', random=None):
+        nonce = random or self.sodium.randombytes(32)
+        encryption_key, stream_nonce, auth_key = self.get_v4_keys(key, nonce)
+        ciphertext = self.sodium.crypto_stream_xchacha20_xor(
+            message, stream_nonce, encryption_key
+        )
+        tag = self.sodium.crypto_generichash(
+            pre_auth_encode(V4_LOCAL, nonce, ciphertext, footer, implicit),
+            k=auth_key, outlen=32,
+        )
+        return join_token(V4_LOCAL, nonce + ciphertext + tag, footer)
+
+    def decrypt_v4(self, token, key, implicit=b''):
+        payload, footer = split_token(token, V4_LOCAL)
+        if len(payload) < 64:
+            raise CryptoError("Invalid token")
+        nonce, ciphertext, tag = payload[:32], payload[32:-32], payload[-32:]
+        encryption_key, stream_nonce, auth_key = self.get_v4_keys(key, nonce)
+        expected_tag = self.sodium.crypto_generichash(
+            pre_auth_encode(V4_LOCAL, nonce, ciphertext, footer, implicit),
+            k=auth_key, outlen=32,
+        )
+        if not hmac.compare_digest(tag, expected_tag):
+            raise CryptoError("Invalid token")
+        message = self.sodium.crypto_stream_xchacha20_xor(
+            ciphertext, stream_nonce, encryption_key
+        )
+        return message, footer
+
+
+class NaClBackend(BaseCryptoBackend):
+    """
+    libsodium through PyNaCl, with v2.local support (PyNaCl doesn't expose
+    the XChaCha20 stream cipher needed for v4.local).
+    """
+    name = 'nacl'
+    versions = (V2_LOCAL,)
+
+    @classmethod
+    def is_available(cls):
+        try:
+            import nacl.bindings  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def __init__(self):
+        from nacl import bindings, utils
+        self.bindings = bindings
+        self.random = utils.random
+
+    def encrypt_v2(self, message, key, footer=b'', random=None):
+        nonce = self.bindings.crypto_generichash_blake2b_salt_personal(
+            message, digest_size=24, key=random or self.random(24)
+        )
+        ciphertext = (
+            self.bindings.crypto_aead_xchacha20poly1305_ietf_encrypt(
+                message, pre_auth_encode(V2_LOCAL, nonce, footer), nonce, key
+            )
+        )
+        return join_token(V2_LOCAL, nonce + ciphertext, footer)
+
+    def decrypt_v2(self, token, key):
+        from nacl.exceptions import CryptoError as NaClCryptoError
+
+        payload, footer = split_token(token, V2_LOCAL)
+        nonce, ciphertext = payload[:24], payload[24:]
+        try:
+            message = (
+                self.bindings.crypto_aead_xchacha20poly1305_ietf_decrypt(
+                    ciphertext, pre_auth_encode(V2_LOCAL, nonce, footer),
+                    nonce, key,
+                )
+            )
+        except (NaClCryptoError, ValueError):
+            raise CryptoError("Invalid token")
+        return message, footer
+
+
+class PasetoBackend(BaseCryptoBackend):
+    """
+    The `paseto` package implementation, with v2.local support.
+    """
+    name = 'paseto'
+    versions = (V2_LOCAL,)
+
+    @classmethod
+    def is_available(cls):
+        try:
+            import paseto  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def __init__(self):
+        from paseto import PasetoV2
+        self.paseto = PasetoV2
+
+    def encrypt_v2(self, message, key, footer=b''):
+        return self.paseto.encrypt(message, key, footer)
+
+    def decrypt_v2(self, token, key):
+        from paseto import PasetoException
+
+        try:
+            parsed = self.paseto.decrypt(token, key)
+        except (PasetoException, ValueError):
+            raise CryptoError("Invalid token")
+        return parsed['message'], parsed['footer'] or b''
+
+
+def load_backend(path):
+    """
+    Returns the backend instance for a dotted path.
+    """
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def get_available_backends(header=None):
+    """
+    Returns the dotted paths of the installed backends, supporting the
+    given token header if any.
+    """
+    return [
+        path for path in BACKENDS
+        if import_string(path).is_available() and (
+            header is None or header in import_string(path).versions
+        )
+    ]
+
+
+def get_backend():
+    """
+    Returns the backend set in `CRYPTO_BACKEND`, or the first available one
+    supporting the `PASETO_VERSION` of new tokens.
+
+    Raises:
+        ImproperlyConfigured: no installed backend supports the version.
+    """
+    path = AUTH_SETTINGS['CRYPTO_BACKEND']
+    if path is None:
+        header = get_header()
+        if header not in _backends:
+            paths = get_available_backends(header)
+            if not paths:
+                raise ImproperlyConfigured(
+                    "No installed crypto backend supports {} tokens".format(
+                        AUTH_SETTINGS['PASETO_VERSION']
+                    )
+                )
+            _backends[header] = load_backend(paths[0])
+        return _backends[header]
+    return load_backend(path)
+
+
+def get_header():
+    """
+    Returns the header of new tokens from the `PASETO_VERSION` setting.
+    """
+    return {'v2': V2_LOCAL, 'v4': V4_LOCAL}[AUTH_SETTINGS['PASETO_VERSION']]
@@ -0,0 +1,214 @@
+import csv
+import itertools
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .stores import get_token_store
+
+# Tokens per query, with one more query per related table
+EXPORT_CHUNK_SIZE = 1000
+
+CSV = 'csv'
+JSONL = 'jsonl'
+EXPORT_FORMATS = {
+    CSV: 'text/csv',
+    JSONL: 'application/x-ndjson',
+}
+
+# Leading characters of the CSV values evaluated as formulas by spreadsheets
+CSV_FORMULA_CHARACTERS = ('=', '+', '-', '@', '\t', '\r')
+
+EXPORT_FIELDS = {
+    'user': [
+        'key', 'user_id', 'username', 'user_agent', 'ip', 'created_at',
+        'expires_at', 'locked', 'groups', 'permissions',
+    ],
+    'app': [
+        'key', 'name', 'owner_type', 'owner_id', 'owner', 'user_agent', 'ip',
+        'created_at', 'expires_at', 'locked', 'groups', 'permissions',
+    ],
+}
+
+
+class Echo(object):
+    """
+    File-like object returning what is written, to stream CSV rows.
+    """
+    def write(self, value):
+        return value
+
+
+def get_export_queryset(refresh_token_type, database):
+    """
+    Returns the queryset of refresh tokens to export from a database, with
+    the owners and their groups and permissions loaded by chunk.
+
+    Args:
+        refresh_token_type: 'user' or 'app'.
+        database: database alias.
+    """
+    from .models import UserRefreshToken, AppRefreshToken
+
+    if refresh_token_type == 'user':
+        queryset = UserRefreshToken.objects.select_related(
+            'user', 'agent'
+        ).prefetch_related(
+            'user__groups',
+            Prefetch(
+                'user__user_permissions',
+                queryset=Permission.objects.select_related('content_type'),
+            ),
+        )
+    else:
+        queryset = AppRefreshToken.objects.select_related(
+            'agent', 'owner_ct'
+        ).prefetch_related(
+            'owner',
+            'groups',
+            Prefetch(
+                'user_permissions',
+                queryset=Permission.objects.select_related('content_type'),
+            ),
+        )
+    return queryset.using(database)
+
+
+def iter_tokens(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Iterates a token queryset with keyset pagination over the key, so
+    every query reads an index range whatever the table size, no cursor
+    stays open between chunks and the related objects are prefetched by
+    chunk. Each chunk is a sliced queryset evaluated as a whole, since
+    `iterator()` skips the prefetches before Django 4.1.
+
+    Args:
+        queryset: refresh token queryset.
+        chunk_size: tokens per query.
+
+    Returns:
+        An iterator of token objects, ordered by key.
+    """
+    queryset = queryset.order_by('key')
+    last_key = None
+    while True:
+        page = queryset
+        if last_key is not None:
+            page = page.filter(key__gt=last_key)
+        count = 0
+        for token in page[:chunk_size]:
+            count += 1
+            last_key = token.key
+            yield token
+        if count < chunk_size:
+            return
+
+
+def get_permission_names(permissions):
+    return sorted(
+        '{}.{}'.format(perm.content_type.app_label, perm.codename)
+        for perm in permissions
+    )
+
+
+def get_row(refresh_token_type, token):
+    """
+    Returns the export values of a token, keyed by field name.
+    """
+    row = {
+        'key': token.key,
+        'user_agent': token.user_agent,
+        'ip': token.ip,
+        'created_at': token.created_at,
+        'expires_at': token.expires_at,
+        'locked': token.locked,
+    }
+    if refresh_token_type == 'user':
+        row['user_id'] = token.user_id
+        row['username'] = getattr(token.user, get_user_model().USERNAME_FIELD)
+        row['groups'] = sorted(group.name for group in token.user.groups.all())
+        row['permissions'] = get_permission_names(
+            token.user.user_permissions.all()
+        )
+    else:
+        row['name'] = token.name
+        row['owner_type'] = (
+            token.owner_ct and
+            '{}.{}'.format(token.owner_ct.app_label, token.owner_ct.model)
+        )
+        row['owner_id'] = token.owner_id
+        row['owner'] = str(token.owner) if token.owner is not None else None
+        row['groups'] = sorted(group.name for group in token.groups.all())
+        row['permissions'] = get_permission_names(
+            token.user_permissions.all()
+        )
+    return row
+
+
+def get_csv_value(value):
+    """
+    Formats an export value for CSV. Text starting with a formula character
+    is prefixed with a quote, so spreadsheets don't evaluate user supplied
+    values (e.g. app token names or user agents).
+    """
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        value = ','.join(value)
+    elif hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_CHARACTERS):
+        return "'" + value
+    return value
+
+
+def export_tokens(refresh_token_type, export_format=JSONL,
+                  chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Exports the refresh tokens of a type in constant memory, from every
+    database of the token store (e.g. each shard).
+
+    Args:
+        refresh_token_type: 'user' or 'app'.
+        export_format: 'csv' (with a header row, and comma separated
+            groups and permissions) or 'jsonl' (a JSON object per line).
+        chunk_size: tokens per query.
+
+    Returns:
+        An iterator of lines.
+
+    Raises:
+        NotImplementedError: the token store doesn't keep the tokens of the
+            type in the token models (e.g. cached user tokens).
+    """
+    databases = get_token_store().get_databases(refresh_token_type)
+    return iter_lines(refresh_token_type, export_format, chunk_size, databases)
+
+
+def iter_lines(refresh_token_type, export_format, chunk_size, databases):
+    """
+    Yields the export lines of the tokens of each database in turn.
+    """
+    fields = EXPORT_FIELDS[refresh_token_type]
+    tokens = itertools.chain.from_iterable(
+        iter_tokens(get_export_queryset(refresh_token_type, database),
+                    chunk_size)
+        for database in databases
+    )
+    if export_format == CSV:
+        writer = csv.writer(Echo())
+        yield writer.writerow(fields)
+        for token in tokens:
+            row = get_row(refresh_token_type, token)
+            yield writer.writerow(
+                [get_csv_value(row[field]) for field in fields]
+            )
+    else:
+        encoder = DjangoJSONEncoder()
+        for token in tokens:
+            row = get_row(refresh_token_type, token)
+            yield encoder.encode(
+                {field: row[field] for field in fields}
+            ) + '\n'
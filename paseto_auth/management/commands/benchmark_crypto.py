@@ -0,0 +1,87 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from paseto_auth import crypto
+from paseto_auth.settings import AUTH_SETTINGS
+
+VERSIONS = {'v2': crypto.V2_LOCAL, 'v4': crypto.V4_LOCAL}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the installed crypto backends on this machine, checks "
+        "their tokens are interoperable and reports the fastest one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=5000,
+            help="Tokens encrypted and decrypted per backend and version.",
+        )
+        parser.add_argument(
+            '--paseto-version', dest='versions', action='append',
+            choices=sorted(VERSIONS),
+            help="PASETO version to benchmark, all by default.",
+        )
+
+    def handle(self, *args, **options):
+        key = bytes.fromhex(AUTH_SETTINGS['SECRET_KEY'])
+        message = json.dumps({
+            'type': 'access', 'model': 'user', 'pk': 1234,
+            'exp': '2030-01-01T00:00:00+00:00',
+        }).encode()
+        backends = [
+            import_string(path)() for path in crypto.get_available_backends()
+        ]
+        for version in options['versions'] or sorted(VERSIONS):
+            header = VERSIONS[version]
+            candidates = [b for b in backends if header in b.versions]
+            if not candidates:
+                self.stdout.write("{}: no backend available".format(version))
+                continue
+            self.check_interoperability(candidates, message, key, header)
+            results = []
+            for backend in candidates:
+                token = backend.encrypt(message, key, header)
+                encrypt = timeit.timeit(
+                    lambda: backend.encrypt(message, key, header),
+                    number=options['iterations'],
+                )
+                decrypt = timeit.timeit(
+                    lambda: backend.decrypt(token, key),
+                    number=options['iterations'],
+                )
+                results.append((encrypt + decrypt, backend, encrypt, decrypt))
+                self.stdout.write(
+                    "{} {:<8} encrypt {:>7.1f} us/op  decrypt {:>7.1f} us/op"
+                    .format(
+                        version, backend.name,
+                        encrypt / options['iterations'] * 1e6,
+                        decrypt / options['iterations'] * 1e6,
+                    )
+                )
+            fastest = min(results, key=lambda result: result[0])[1]
+            self.stdout.write(self.style.SUCCESS(
+                "{} fastest: {}, set PASETO_AUTH['CRYPTO_BACKEND'] = "
+                "'{}.{}'".format(
+                    version, fastest.name, fastest.__module__,
+                    type(fastest).__name__,
+                )
+            ))
+
+    def check_interoperability(self, backends, message, key, header):
+        """
+        Checks every backend decrypts the tokens of the others.
+        """
+        for encrypter in backends:
+            token = encrypter.encrypt(message, key, header)
+            for decrypter in backends:
+                if decrypter.decrypt(token, key)[0] != message:
+                    raise crypto.CryptoError(
+                        "{} can't decrypt {} tokens".format(
+                            decrypter.name, encrypter.name
+                        )
+                    )
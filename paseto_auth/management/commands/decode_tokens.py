@@ -0,0 +1,183 @@
+import itertools
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from paseto_auth import clock
+from paseto_auth.stores import get_token_store
+from paseto_auth.tokens import ACCESS, REFRESH, decode_token
+
+INVALID = 'invalid'
+EXPIRED = 'expired'
+VALID = 'valid'
+
+
+def decode(token):
+    """
+    Decodes and classifies a token string.
+
+    Returns:
+        A dict with the token `status` ('valid', 'expired' or 'invalid')
+        and, unless invalid, its `type`, `model`, `pk` (access tokens) or
+        `key` (refresh tokens) and `exp` epoch.
+    """
+    import paseto
+
+    try:
+        claims = decode_token(token)['message']
+        token_type = claims['type']
+        subject = 'pk' if token_type == ACCESS else 'key'
+        result = {
+            'type': token_type,
+            'model': claims['model'],
+            subject: claims[subject],
+            'exp': clock.to_timestamp(claims.get('exp')),
+        }
+    except (
+        paseto.PasetoException, ValueError, KeyError, TypeError,
+        AttributeError,
+    ):
+        return {'status': INVALID}
+    if token_type not in (ACCESS, REFRESH):
+        return {'status': INVALID}
+    result['status'] = EXPIRED if clock.is_expired(result['exp']) else VALID
+    return result
+
+
+def decode_chunk(tokens):
+    """
+    Decodes a list of token strings, in a worker process.
+    """
+    return [decode(token) for token in tokens]
+
+
+class Command(BaseCommand):
+    help = (
+        "Decodes and classifies tokens read one per line, e.g. captured "
+        "authorization headers (only the last field of each line is "
+        "decoded), and writes a JSON line per token."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help="File with a token per line, '-' (default) for stdin.",
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help="Decoding processes, 0 to decode in this process.",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help="Tokens per work unit.",
+        )
+        parser.add_argument(
+            '--resolve-owners', action='store_true',
+            help="Add the token owners, with a few queries per chunk.",
+        )
+
+    def handle(self, *args, **options):
+        if options['input'] == '-':
+            stream = sys.stdin
+        else:
+            stream = open(options['input'])
+        try:
+            chunks = self.read_chunks(stream, options['chunk_size'])
+            for lines, results in self.decode_chunks(
+                chunks, options['workers']
+            ):
+                if options['resolve_owners']:
+                    self.resolve_owners(results)
+                for line, result in zip(lines, results):
+                    self.stdout.write(json.dumps({'line': line, **result}))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def read_chunks(self, stream, chunk_size):
+        """
+        Reads the tokens lazily in chunks, skipping blank lines.
+
+        Returns:
+            An iterator of (line numbers, token strings) tuples.
+        """
+        fields = ((number, line.split()) for number, line in enumerate(
+            stream, 1
+        ))
+        tokens = ((number, values[-1]) for number, values in fields if values)
+        while True:
+            chunk = list(itertools.islice(tokens, chunk_size))
+            if not chunk:
+                return
+            lines, values = zip(*chunk)
+            yield lines, list(values)
+
+    def decode_chunks(self, chunks, workers):
+        """
+        Decodes the chunks in a process pool, keeping at most two chunks
+        per worker in flight so memory doesn't grow with the input.
+
+        Returns:
+            An iterator of (line numbers, results) tuples, in input order.
+        """
+        if not workers:
+            for lines, tokens in chunks:
+                yield lines, decode_chunk(tokens)
+            return
+        with ProcessPoolExecutor(workers, initializer=django.setup) as pool:
+            pending = deque()
+            for lines, tokens in chunks:
+                if len(pending) >= workers * 2:
+                    done_lines, future = pending.popleft()
+                    yield done_lines, future.result()
+                pending.append((lines, pool.submit(decode_chunk, tokens)))
+            while pending:
+                done_lines, future = pending.popleft()
+                yield done_lines, future.result()
+
+    def resolve_owners(self, results):
+        """
+        Adds the `owner` of the decoded tokens of a chunk: the username of
+        the active user, or the name (or key) of the unlocked app token.
+        Tokens of inactive users or revoked refresh tokens get a null owner.
+        """
+        store = get_token_store()
+        decoded = [result for result in results if result['status'] != INVALID]
+        user_pks, app_keys, user_token_keys = set(), set(), set()
+        for result in decoded:
+            if result['model'] == 'app':
+                app_keys.add(result.get('pk') or result.get('key'))
+            elif result['type'] == ACCESS:
+                user_pks.add(result['pk'])
+            else:
+                user_token_keys.add(result['key'])
+
+        user_tokens = store.get_tokens('user', user_token_keys)
+        user_pks.update(token.user_id for token in user_tokens.values())
+        user_model = get_user_model()
+        usernames = {
+            str(pk): username for pk, username in
+            user_model.objects.filter(pk__in=user_pks, is_active=True)
+            .values_list('pk', user_model.USERNAME_FIELD)
+        }
+        app_tokens = store.get_tokens('app', app_keys)
+
+        for result in decoded:
+            if result['model'] == 'app':
+                app_token = app_tokens.get(
+                    result.get('pk') or result.get('key')
+                )
+                result['owner'] = str(app_token) if app_token else None
+            elif result['type'] == ACCESS:
+                result['owner'] = usernames.get(str(result['pk']))
+            else:
+                user_token = user_tokens.get(result['key'])
+                result['owner'] = user_token and usernames.get(
+                    str(user_token.user_id)
+                )
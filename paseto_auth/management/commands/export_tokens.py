@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from paseto_auth.export import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_FIELDS,
+    EXPORT_FORMATS,
+    JSONL,
+    export_tokens,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports the user or app refresh tokens, with their owners, groups "
+        "and permissions, as CSV or JSON lines in constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('refresh_token_type', choices=list(EXPORT_FIELDS))
+        parser.add_argument(
+            '--format', dest='export_format', default=JSONL,
+            choices=list(EXPORT_FORMATS),
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help="Tokens per query.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            lines = export_tokens(
+                options['refresh_token_type'], options['export_format'],
+                options['chunk_size'],
+            )
+        except NotImplementedError as exc:
+            raise CommandError(exc)
+        for line in lines:
+            self.stdout.write(line, ending='')
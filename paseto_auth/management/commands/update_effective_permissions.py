@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from paseto_auth.models import AppRefreshToken
+from paseto_auth.settings import AUTH_SETTINGS
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the denormalized permissions of all the app tokens. Run "
+        "it when enabling DENORMALIZE_PERMISSIONS, since the signals keeping "
+        "them in sync aren't connected while the setting is disabled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=AUTH_SETTINGS['WRITE_DATABASE'],
+            help="Database alias of the app tokens.",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help="Tokens per query.",
+        )
+
+    def handle(self, *args, **options):
+        database = options['database']
+        chunk_size = options['chunk_size']
+        queryset = AppRefreshToken.objects.using(database).order_by('key')
+        last_key = None
+        count = 0
+        while True:
+            page = queryset
+            if last_key is not None:
+                page = page.filter(key__gt=last_key)
+            keys = list(page.values_list('key', flat=True)[:chunk_size])
+            if keys:
+                AppRefreshToken.update_effective_permissions(keys, database)
+                count += len(keys)
+                last_key = keys[-1]
+            if len(keys) < chunk_size:
+                break
+        self.stdout.write("{} app tokens updated.".format(count))
@@ -0,0 +1,108 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import (
+    PASETO_AUTH_ATTR,
+    PASETO_RENEWAL_ATTR,
+    authenticate_credentials,
+    get_authorization_token,
+    get_renewed_token,
+    set_renewed_token,
+)
+from .settings import AUTH_SETTINGS
+
+try:
+    from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+except ImportError:
+    iscoroutinefunction = asyncio.iscoroutinefunction
+
+    def markcoroutinefunction(func):
+        func._is_coroutine = asyncio.coroutines._is_coroutine
+        return func
+
+
+class PasetoAuthMiddleware(object):
+    """
+    Authenticates requests with an access token in the authentication
+    header, for both Django and DRF views. It sets a lazy `request.user`
+    and `request.auth`, and `PasetoAuthentication` reuses the result
+    instead of verifying the token again.
+
+    Requests without a valid access token are left untouched, so it can be
+    placed after `AuthenticationMiddleware` to fall back to sessions.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        self.process_request(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        return await self.get_response(request)
+
+    def process_request(self, request):
+        """
+        Verifies the access token. No database queries are made until the
+        user is accessed.
+        """
+        token = get_authorization_token(request)
+        if token is None:
+            return
+        try:
+            user, access_token = authenticate_credentials(token, request)
+        except AuthenticationFailed as exc:
+            setattr(request, PASETO_AUTH_ATTR, exc)
+        else:
+            setattr(request, PASETO_AUTH_ATTR, (user, access_token))
+            request.user = user
+            request.auth = access_token
+            set_renewed_token(request, user, access_token)
+
+
+class PasetoRenewalMiddleware(object):
+    """
+    Renews the access token of authenticated requests close to its
+    expiration, and adds it to the `RENEWAL_HEADER` response header. Tokens
+    are only renewed with this middleware installed.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if getattr(request, PASETO_RENEWAL_ATTR, None) is None:
+            return response
+        # The renewal checks may query the database
+        return await sync_to_async(self.process_response)(request, response)
+
+    def process_response(self, request, response):
+        result = getattr(request, PASETO_RENEWAL_ATTR, None)
+        if result is None:
+            return response
+        access_token = get_renewed_token(*result)
+        if access_token is not None:
+            response[AUTH_SETTINGS['RENEWAL_HEADER']] = str(access_token)
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paseto_auth', '0002_token_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apprefreshtoken',
+            name='effective_permissions',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:46
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paseto_auth', '0003_app_token_effective_permissions'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='apprefreshtoken',
+            options={'permissions': [('introspect_token', 'Can introspect tokens')]},
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:03
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paseto_auth', '0004_app_token_permissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('event', models.CharField(choices=[('login', 'Login'), ('login_failed', 'Failed login'), ('refresh', 'Refresh'), ('refresh_failed', 'Failed refresh'), ('auth_failed', 'Failed authentication'), ('app_token_use', 'App token use')], max_length=20)),
+                ('model', models.CharField(blank=True, max_length=10)),
+                ('subject', models.CharField(blank=True, max_length=150)),
+                ('ip', models.GenericIPAddressField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paseto_auth', '0005_auth_events'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='apprefreshtoken',
+            options={'permissions': [('introspect_token', 'Can introspect tokens'), ('export_tokens', 'Can export tokens')]},
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paseto_auth', '0006_export_tokens_permission'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userrefreshtoken',
+            index=models.Index(fields=['user', 'created_at'], name='paseto_user_token_created_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paseto_auth', '0007_user_token_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userrefreshtoken',
+            name='user_agent_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='userrefreshtoken',
+            index=models.Index(fields=['user', 'user_agent_hash', 'ip'], name='paseto_user_token_device_idx'),
+        ),
+    ]
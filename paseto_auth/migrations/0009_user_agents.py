@@ -0,0 +1,134 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:14
+
+import hashlib
+from collections import defaultdict
+
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+# Tokens per backfill transaction
+CHUNK_SIZE = 1000
+
+
+def get_user_agent_hash(user_agent):
+    return hashlib.blake2b(
+        user_agent.encode('utf-8'), digest_size=16
+    ).hexdigest()
+
+
+def backfill_agents(apps, schema_editor):
+    """
+    Moves the user agent strings to the `UserAgent` table, in a transaction
+    per chunk of tokens so large tables aren't locked for the whole copy.
+    """
+    UserAgent = apps.get_model('paseto_auth', 'UserAgent')
+    database = schema_editor.connection.alias
+    for model_name in ('UserRefreshToken', 'AppRefreshToken'):
+        model = apps.get_model('paseto_auth', model_name)
+        queryset = model.objects.using(database).exclude(
+            user_agent=''
+        ).order_by('key')
+        last_key = None
+        while True:
+            chunk = queryset
+            if last_key is not None:
+                chunk = chunk.filter(key__gt=last_key)
+            rows = list(chunk.values_list('key', 'user_agent')[:CHUNK_SIZE])
+            if not rows:
+                break
+            last_key = rows[-1][0]
+            values = {
+                get_user_agent_hash(user_agent): user_agent
+                for key, user_agent in rows
+            }
+            with transaction.atomic(using=database):
+                UserAgent.objects.using(database).bulk_create(
+                    [
+                        UserAgent(hash=agent_hash, value=value)
+                        for agent_hash, value in values.items()
+                    ],
+                    ignore_conflicts=True,
+                )
+                agent_ids = dict(
+                    UserAgent.objects.using(database).filter(
+                        hash__in=values
+                    ).values_list('hash', 'id')
+                )
+                keys = defaultdict(list)
+                for key, user_agent in rows:
+                    keys[agent_ids[get_user_agent_hash(user_agent)]].append(
+                        key
+                    )
+                for agent_id, agent_keys in keys.items():
+                    model.objects.using(database).filter(
+                        key__in=agent_keys
+                    ).update(agent_id=agent_id)
+            if len(rows) < CHUNK_SIZE:
+                break
+
+
+def restore_user_agents(apps, schema_editor):
+    """
+    Copies the user agent strings back to the token tables.
+    """
+    UserAgent = apps.get_model('paseto_auth', 'UserAgent')
+    database = schema_editor.connection.alias
+    for model_name in ('UserRefreshToken', 'AppRefreshToken'):
+        model = apps.get_model('paseto_auth', model_name)
+        for agent_id, value in UserAgent.objects.using(database).values_list(
+            'id', 'value'
+        ).iterator():
+            model.objects.using(database).filter(agent_id=agent_id).update(
+                user_agent=value
+            )
+
+
+class Migration(migrations.Migration):
+    # The backfill commits chunk by chunk
+    atomic = False
+
+    dependencies = [
+        ('paseto_auth', '0008_user_token_device'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('hash', models.CharField(max_length=32, unique=True)),
+                ('value', models.TextField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='apprefreshtoken',
+            name='agent',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='paseto_auth.useragent'),
+        ),
+        migrations.AddField(
+            model_name='userrefreshtoken',
+            name='agent',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='paseto_auth.useragent'),
+        ),
+        migrations.RunPython(backfill_agents, restore_user_agents),
+        migrations.RemoveIndex(
+            model_name='userrefreshtoken',
+            name='paseto_user_token_device_idx',
+        ),
+        migrations.RemoveField(
+            model_name='apprefreshtoken',
+            name='user_agent',
+        ),
+        migrations.RemoveField(
+            model_name='userrefreshtoken',
+            name='user_agent',
+        ),
+        migrations.RemoveField(
+            model_name='userrefreshtoken',
+            name='user_agent_hash',
+        ),
+        migrations.AddIndex(
+            model_name='userrefreshtoken',
+            index=models.Index(fields=['user', 'agent', 'ip'], name='paseto_user_token_device_idx'),
+        ),
+    ]
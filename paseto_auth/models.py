@@ -1,24 +1,179 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser, Permission
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
+
+from .audit import EVENT_CHOICES, SUBJECT_MAX_LENGTH
+from .settings import AUTH_SETTINGS
+
+# Separator of the permission names in `effective_permissions`
+PERMISSIONS_SEPARATOR = '\n'
+
+
+def get_effective_permissions(app_token_model, keys, using='default'):
+    """
+    Computes the permissions of app tokens, including their group ones,
+    with two queries. It only relies on the model relations, so it also
+    works with historical models in migrations.
+
+    Args:
+        app_token_model: app refresh token model.
+        keys: iterable of app token keys.
+        using: database alias.
+
+    Returns:
+        A dict mapping token keys to sets of permission names.
+    """
+    perms = {key: set() for key in keys}
+    rows = []
+    for field in ('user_permissions', 'groups__permissions'):
+        rows.extend(
+            app_token_model.objects.using(using).filter(key__in=perms)
+            .values_list(
+                'key',
+                '{}__content_type__app_label'.format(field),
+                '{}__codename'.format(field),
+            )
+            .order_by()
+        )
+    for key, app_label, codename in rows:
+        if codename is not None:
+            perms[key].add("%s.%s" % (app_label, codename))
+    return perms
+
+
+def get_user_agent_hash(user_agent):
+    """
+    Returns the hex digest identifying a user agent string.
+    """
+    return hashlib.blake2b(user_agent.encode(), digest_size=16).hexdigest()
+
+
+class UserAgentManager(models.Manager):
+    """
+    Resolves user agent strings to `UserAgent` ids, with a process-local
+    LRU cache of the ids by database and hash. Ids are only cached once
+    their transaction is committed, so rolled back rows are never cached.
+
+    Attributes:
+        cache_size: maximum number of cached ids.
+    """
+    cache_size = 10000
+
+    def __init__(self):
+        super().__init__()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_id(self, user_agent, create=True, using=None):
+        """
+        Returns the id of a user agent string.
+
+        Args:
+            user_agent: user agent string.
+            create: boolean to create the row if missing.
+            using: database alias, the write database by default.
+
+        Returns:
+            An integer, or None for empty strings and missing rows.
+        """
+        if not user_agent:
+            return None
+        database = using or router.db_for_write(self.model)
+        cache_key = (database, get_user_agent_hash(user_agent))
+        with self._lock:
+            agent_id = self._cache.get(cache_key)
+            if agent_id is not None:
+                self._cache.move_to_end(cache_key)
+                return agent_id
+
+        queryset = self.db_manager(database)
+        if create:
+            agent_id = queryset.get_or_create(
+                hash=cache_key[1], defaults={'value': user_agent}
+            )[0].pk
+        else:
+            agent_id = queryset.filter(hash=cache_key[1]).values_list(
+                'pk', flat=True
+            ).first()
+            if agent_id is None:
+                return None
+        transaction.on_commit(
+            lambda: self._set_cache(cache_key, agent_id), using=database
+        )
+        return agent_id
+
+    def _set_cache(self, cache_key, agent_id):
+        with self._lock:
+            self._cache[cache_key] = agent_id
+            self._cache.move_to_end(cache_key)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        """
+        Clears the id cache, e.g. after flushing the database.
+        """
+        with self._lock:
+            self._cache.clear()
+
+
+class UserAgent(models.Model):
+    """
+    Distinct user agent string of refresh tokens, identified by its hash.
+    """
+    id = models.BigAutoField(primary_key=True)
+    hash = models.CharField(max_length=32, unique=True)
+    value = models.TextField()
+
+    objects = UserAgentManager()
+
+    def __str__(self):
+        return self.value
 
 
 class AbstractRefreshToken(models.Model):
     """
-    Abstract base model to store the state of refresh tokens.
+    Abstract base model to store the state of refresh tokens. The user
+    agent string is stored once in the `UserAgent` table, and read and
+    written through the `user_agent` property.
     """
     key = models.CharField(max_length=40, primary_key=True)
-    user_agent = models.TextField(blank=True)
+    agent = models.ForeignKey(
+        UserAgent,
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name='+',
+    )
     ip = models.GenericIPAddressField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField(blank=True, null=True)
-    locked = models.BooleanField(default=False)
+    expires_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    locked = models.BooleanField(default=False, db_index=True)
 
     class Meta:
         abstract = True
 
+    # Raw user agent string of tokens not stored with the model
+    _user_agent = None
+
+    @property
+    def user_agent(self):
+        if self._user_agent is not None:
+            return self._user_agent
+        return self.agent.value if self.agent_id is not None else ''
+
+    @user_agent.setter
+    def user_agent(self, value):
+        self.agent_id = UserAgent.objects.get_id(value)
+
 
 class UserRefreshToken(AbstractRefreshToken):
     """
@@ -30,6 +185,18 @@ class UserRefreshToken(AbstractRefreshToken):
         related_name='refresh_tokens'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'created_at'],
+                name='paseto_user_token_created_idx',
+            ),
+            models.Index(
+                fields=['user', 'agent', 'ip'],
+                name='paseto_user_token_device_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.key
 
@@ -56,24 +223,69 @@ class AppRefreshToken(AbstractRefreshToken):
         related_name="app_token_set",
         related_query_name="app_token",
     )
+    effective_permissions = models.TextField(
+        blank=True, null=True, editable=False
+    )
+
+    class Meta:
+        permissions = [
+            ('introspect_token', "Can introspect tokens"),
+            ('export_tokens', "Can export tokens"),
+        ]
 
     def __str__(self):
         return self.name or self.key
 
+    @classmethod
+    def update_effective_permissions(cls, keys, using='default'):
+        """
+        Recomputes the denormalized permissions of the given app tokens.
+
+        Args:
+            keys: iterable of app token keys.
+            using: database alias.
+        """
+        perms = get_effective_permissions(cls, keys, using)
+        cls.objects.using(using).bulk_update(
+            [
+                cls(key=key, effective_permissions=PERMISSIONS_SEPARATOR.join(
+                    sorted(names)
+                ))
+                for key, names in perms.items()
+            ],
+            ['effective_permissions'],
+            batch_size=500,
+        )
+
     def get_group_permissions(self, obj=None):
-        perms = Permission.objects.filter(group__app_token=self).values_list(
-            'content_type__app_label', 'codename'
-        ).order_by()
-        return {"%s.%s" % (ct, name) for ct, name in perms}
+        if not hasattr(self, '_group_perm_cache'):
+            perms = Permission.objects.using(self._state.db).filter(
+                group__app_token=self
+            ).values_list('content_type__app_label', 'codename').order_by()
+            self._group_perm_cache = {
+                "%s.%s" % (ct, name) for ct, name in perms
+            }
+        return self._group_perm_cache
 
     def get_all_permissions(self, obj=None):
-        perms = self.user_permissions.values_list(
-            'content_type__app_label', 'codename'
-        ).order_by()
-        return {
-            *{"%s.%s" % (ct, name) for ct, name in perms},
-            *self.get_group_permissions(obj),
-        }
+        if (
+            not hasattr(self, '_perm_cache') and
+            AUTH_SETTINGS['DENORMALIZE_PERMISSIONS'] and
+            self.effective_permissions is not None
+        ):
+            self._perm_cache = set(
+                self.effective_permissions.split(PERMISSIONS_SEPARATOR)
+            )
+            self._perm_cache.discard('')
+        if not hasattr(self, '_perm_cache'):
+            perms = self.user_permissions.values_list(
+                'content_type__app_label', 'codename'
+            ).order_by()
+            self._perm_cache = {
+                *{"%s.%s" % (ct, name) for ct, name in perms},
+                *self.get_group_permissions(obj),
+            }
+        return self._perm_cache
 
     def has_perm(self, perm, obj=None):
         return perm in self.get_all_permissions(obj)
@@ -88,6 +300,21 @@ class AppRefreshToken(AbstractRefreshToken):
         )
 
 
+class AuthEvent(models.Model):
+    """
+    Authentication audit log entry, written in batches by `audit.AuditLog`.
+    """
+    id = models.BigAutoField(primary_key=True)
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES)
+    model = models.CharField(max_length=10, blank=True)
+    subject = models.CharField(max_length=SUBJECT_MAX_LENGTH, blank=True)
+    ip = models.GenericIPAddressField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return '{} {}'.format(self.event, self.subject)
+
+
 class AppIntegrationUser(AnonymousUser):
     """
     Anonymous user for app integrations.
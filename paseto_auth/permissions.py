@@ -0,0 +1,29 @@
+from rest_framework.permissions import BasePermission
+
+from .models import AppIntegrationUser
+
+INTROSPECT_PERMISSION = 'paseto_auth.introspect_token'
+EXPORT_PERMISSION = 'paseto_auth.export_tokens'
+
+
+class CanIntrospectTokens(BasePermission):
+    """
+    Allows access to app integration tokens with the `introspect_token`
+    permission.
+    """
+
+    def has_permission(self, request, view):
+        return (
+            isinstance(request.user, AppIntegrationUser) and
+            request.user.has_perm(INTROSPECT_PERMISSION)
+        )
+
+
+class CanExportTokens(BasePermission):
+    """
+    Allows access to users and app integration tokens with the
+    `export_tokens` permission.
+    """
+
+    def has_permission(self, request, view):
+        return request.user.has_perm(EXPORT_PERMISSION)
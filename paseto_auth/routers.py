@@ -0,0 +1,61 @@
+from django.core.exceptions import ObjectDoesNotExist
+
+from .settings import AUTH_SETTINGS
+
+
+def get_read_database():
+    """
+    Returns the database alias for token validation reads.
+    """
+    return AUTH_SETTINGS['READ_DATABASE'] or AUTH_SETTINGS['WRITE_DATABASE']
+
+
+def get_refresh_token(model, key):
+    """
+    Retrieves an unlocked refresh token state from the read database. If
+    it's missing there (e.g. a replica lagging right after the token was
+    issued), it's read again from the write database. A token found in the
+    replica isn't read again, so a lock is only seen once it's replicated.
+
+    Args:
+        model: refresh token model.
+        key: refresh token key.
+
+    Returns:
+        A refresh token model instance.
+
+    Raises:
+        ObjectDoesNotExist: no token with the given key, or locked token.
+    """
+    read_database = get_read_database()
+    try:
+        token = model.objects.using(read_database).get(key=key)
+    except ObjectDoesNotExist:
+        if read_database == AUTH_SETTINGS['WRITE_DATABASE']:
+            raise
+        token = model.objects.using(AUTH_SETTINGS['WRITE_DATABASE']).get(
+            key=key
+        )
+    if token.locked:
+        raise model.DoesNotExist("Locked refresh token")
+    return token
+
+
+class TokenRouter(object):
+    """
+    Database router sending token reads and writes to the `WRITE_DATABASE`
+    alias. Only token validation reads the `READ_DATABASE`, with explicit
+    `using()` calls, so admin, revocation and uniqueness checks never see a
+    lagging replica.
+    """
+    app_label = 'paseto_auth'
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == self.app_label and 'instance' not in hints:
+            return AUTH_SETTINGS['WRITE_DATABASE']
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == self.app_label:
+            return AUTH_SETTINGS['WRITE_DATABASE']
+        return None
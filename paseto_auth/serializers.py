@@ -1,19 +1,29 @@
-from datetime import datetime, timedelta
+import hashlib
+from datetime import timedelta
 
 from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.models import update_last_login
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 
 from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed
 
-from .models import UserRefreshToken, AppRefreshToken
+from . import audit, clock
+from .coalescing import coalesce
+from .settings import AUTH_SETTINGS
+from .stores import get_token_store
 from .tokens import (
     AccessToken,
     RefreshToken,
+    TokenFactory,
     LIFETIME_CHOICES,
-    generate_token_key,
+    decode_token,
 )
 
+# Maximum number of tokens per introspection request
+INTROSPECTION_BATCH_SIZE = 100
+
 
 class GetTokenPairSerializer(serializers.Serializer):
     """
@@ -23,7 +33,17 @@ class GetTokenPairSerializer(serializers.Serializer):
         username_field: username field of the configured user model.
         password: user password.
         remember: boolean to determine refresh token lifetime.
+
+    Attributes:
+        query_budget: maximum number of queries run by a successful login
+            (user fetch and refresh token insert). Enabling the
+            `UPDATE_LAST_LOGIN`, `MAX_SESSIONS_PER_USER` or
+            `DEVICE_REUSE_WINDOW` settings adds one query each, but reusing
+            a device token saves the insert.
+        device_token: state of the reused device token, or None.
     """
+    query_budget = 2
+    device_token = None
     password = serializers.CharField(write_only=True)
     remember = serializers.BooleanField(required=False)
 
@@ -37,7 +57,11 @@ class GetTokenPairSerializer(serializers.Serializer):
 
     def validate(self, data):
         """
-        Validates user credentials.
+        Validates user credentials. The credentials are checked outside of
+        any transaction, so failed login signal receivers (e.g. lockout
+        counters) keep their writes and password hashing doesn't hold one
+        open. The token state writes run in a single transaction. The login
+        is recorded in the audit log.
 
         Args:
             data: serializer data.
@@ -50,8 +74,18 @@ class GetTokenPairSerializer(serializers.Serializer):
         """
         self.user = authenticate(**data)
         if self.user is None or not self.user.is_active:
+            audit.record(
+                audit.LOGIN_FAILED, self.context.get('request'), 'user',
+                data.get(get_user_model().USERNAME_FIELD, ''),
+            )
             raise AuthenticationFailed()
-        tokens = self.get_tokens(data)
+        with transaction.atomic(using=AUTH_SETTINGS['WRITE_DATABASE']):
+            tokens = self.get_tokens(data)
+            if AUTH_SETTINGS['UPDATE_LAST_LOGIN']:
+                update_last_login(None, self.user)
+        audit.record(
+            audit.LOGIN, self.context['request'], 'user', self.user.pk
+        )
         return tokens
 
     def get_tokens(self, data):
@@ -68,13 +102,21 @@ class GetTokenPairSerializer(serializers.Serializer):
             'model': 'user',
             'pk': self.user.pk,
         }
-        access_token = AccessToken(data=self.claims)
+        access_claims = self.claims.copy()
         if data.get('remember'):
             self.claims['lifetime'] = 'long'
         else:
             self.claims['lifetime'] = 'short'
         self.claims['key'] = self.get_token_key()
-        refresh_token = RefreshToken(data=self.claims)
+        if self.device_token is not None:
+            refresh_token = self.get_device_refresh_token()
+        else:
+            refresh_token = RefreshToken(data=self.claims)
+        if AUTH_SETTINGS['ACCESS_RENEWAL_WINDOW']:
+            # Renewals check the refresh token isn't revoked
+            access_claims['key'] = self.claims['key']
+            access_claims['renew_until'] = refresh_token.data['exp']
+        access_token = AccessToken(data=access_claims)
         return {
             'access_token': str(access_token),
             'refresh_token': str(refresh_token),
@@ -82,26 +124,69 @@ class GetTokenPairSerializer(serializers.Serializer):
 
     def get_token_key(self):
         """
-        Creates a token key and stores the token state.
+        Creates a token key and stores the token state in the configured
+        token store. With `MAX_SESSIONS_PER_USER` set, the oldest sessions
+        of the user beyond the limit are deleted (or locked, according to
+        `SESSION_EVICTION`) in the same transaction.
+
+        With `DEVICE_REUSE_WINDOW` set, the key of a token from the same
+        user agent and IP, created with the same lifetime within the window,
+        is reused instead (see `device_token`).
 
         Returns:
             A string containing the key.
         """
-        token_key = generate_token_key(refresh_token_type='user')
+        store = get_token_store()
         lifetime = LIFETIME_CHOICES[self.claims['lifetime']]
-        expires_at = datetime.now() + timedelta(seconds=lifetime)
+        expires_at = clock.now() + timedelta(seconds=lifetime)
         user_agent = self.context['request'].META.get(
             'HTTP_USER_AGENT', ''
         )
-        UserRefreshToken.objects.create(
+        ip = self.get_user_ip()
+        if AUTH_SETTINGS['DEVICE_REUSE_WINDOW']:
+            window = timedelta(seconds=AUTH_SETTINGS['DEVICE_REUSE_WINDOW'])
+            self.device_token = store.get_device_token(
+                self.user, user_agent, ip,
+                (max(expires_at - window, clock.now()), expires_at),
+            )
+            if self.device_token is not None:
+                return self.device_token.key
+        token_key = store.generate_key(
+            refresh_token_type='user', check_unique=False
+        )
+        store.create_token(
+            'user',
             key=token_key,
             user=self.user,
             user_agent=user_agent,
-            ip=self.get_user_ip(),
+            ip=ip,
             expires_at=expires_at,
         )
+        if AUTH_SETTINGS['MAX_SESSIONS_PER_USER']:
+            store.evict_tokens(
+                self.user,
+                AUTH_SETTINGS['MAX_SESSIONS_PER_USER'],
+                lock=AUTH_SETTINGS['SESSION_EVICTION'] == 'lock',
+            )
         return token_key
 
+    def get_device_refresh_token(self):
+        """
+        Mints a refresh token for the reused device token, expiring with
+        its state.
+
+        Returns:
+            A RefreshToken.
+        """
+        remaining = self.device_token.expires_at - clock.now()
+        factory = TokenFactory(
+            RefreshToken,
+            max(int(remaining.total_seconds()), 1),
+            model=self.claims['model'],
+            pk=self.claims['pk'],
+        )
+        return factory(key=self.device_token.key)
+
     def get_user_ip(self):
         """
         Determines the real user IP from the request headers.
@@ -109,13 +194,7 @@ class GetTokenPairSerializer(serializers.Serializer):
         Returns:
             A string containing the user IP.
         """
-        request = self.context['request']
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return audit.get_client_ip(self.context['request'])
 
 
 class RefreshTokenSerializer(serializers.Serializer):
@@ -124,19 +203,15 @@ class RefreshTokenSerializer(serializers.Serializer):
 
     Fields:
         refresh_token: a refresh token.
-
-    Attributes:
-        token_model: a dict mapping token types to their models.
     """
     refresh_token = serializers.CharField()
-    refresh_models = {
-        'user': UserRefreshToken,
-        'app': AppRefreshToken,
-    }
 
     def validate(self, data):
         """
-        Generates a new access token if the refresh token is valid.
+        Generates a new access token if the refresh token is valid. With
+        `REFRESH_COALESCING` enabled, concurrent refreshes of the same token
+        share a single validation and access token. Every refresh is
+        recorded in the audit log.
 
         Returns:
             A dict containing the new access token.
@@ -144,21 +219,211 @@ class RefreshTokenSerializer(serializers.Serializer):
         Raises:
             AuthenticationFailed if the refresh token is invalid.
         """
-        refresh_token = RefreshToken(token=data['refresh_token'])
+        token = data['refresh_token']
+        request = self.context.get('request')
+        try:
+            if AUTH_SETTINGS['REFRESH_COALESCING']:
+                result, claims = coalesce(token, lambda: (
+                    self.get_access_token(token), self.refresh_claims
+                ))
+                result = result.copy()
+            else:
+                result = self.get_access_token(token)
+                claims = self.refresh_claims
+        except AuthenticationFailed:
+            audit.record(audit.REFRESH_FAILED, request)
+            raise
+        audit.record(audit.REFRESH, request, claims['model'], claims['key'])
+        return result
+
+    def get_access_token(self, token):
+        """
+        Validates the refresh token and creates an access token. The
+        refresh token claims are kept in `refresh_claims`.
+
+        Args:
+            token: refresh token string.
+
+        Returns:
+            A dict containing the new access token.
+
+        Raises:
+            AuthenticationFailed if the refresh token is invalid.
+        """
+        refresh_token = RefreshToken(token=token)
         if refresh_token.is_valid():
-            refresh_model = self.refresh_models[refresh_token.data['model']]
             try:
-                refresh_model.objects.get(
-                    key=refresh_token.data['key'], locked=False,
+                get_token_store().get_token(
+                    refresh_token.data['model'], refresh_token.data['key']
                 )
             except ObjectDoesNotExist:
                 raise AuthenticationFailed(detail="Invalid refresh token.")
         else:
             raise AuthenticationFailed(detail="Invalid refresh token.")
 
+        self.refresh_claims = refresh_token.data
         data = {
             'model': refresh_token.data['model'],
             'pk': refresh_token.data.get('pk') or refresh_token.data.get('key')
         }
+        if AUTH_SETTINGS['ACCESS_RENEWAL_WINDOW']:
+            if data['model'] == 'user':
+                # Renewals check the refresh token isn't revoked
+                data['key'] = refresh_token.data['key']
+            data['renew_until'] = refresh_token.data['exp']
         access_token = AccessToken(data=data)
         return {'access_token': str(access_token)}
+
+
+class IntrospectTokenSerializer(serializers.Serializer):
+    """
+    Introspects one token or a batch of tokens, following RFC 7662.
+
+    Fields:
+        token: a token string.
+        tokens: a list of token strings.
+        token_type_hint: 'access_token' or 'refresh_token', the type tried
+            first.
+    """
+    token = serializers.CharField(required=False)
+    tokens = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        max_length=INTROSPECTION_BATCH_SIZE,
+    )
+    token_type_hint = serializers.ChoiceField(
+        choices=['access_token', 'refresh_token'], required=False
+    )
+
+    def validate(self, data):
+        """
+        Validates the tokens and retrieves their owners, with one query per
+        owner model.
+
+        Returns:
+            A dict describing the token, or a dict with the list of
+            `results` for a batch.
+
+        Raises:
+            ValidationError if both or none of `token` and `tokens` are set.
+        """
+        if ('token' in data) == ('tokens' in data):
+            raise serializers.ValidationError(
+                "Provide either 'token' or 'tokens'."
+            )
+        strings = data['tokens'] if 'tokens' in data else [data['token']]
+        tokens = [self.parse_token(token) for token in strings]
+        owners = self.get_owners([token for token in tokens if token])
+        results = [self.describe_token(token, owners) for token in tokens]
+        return {'results': results} if 'tokens' in data else results[0]
+
+    def parse_token(self, token):
+        """
+        Returns the valid access or refresh token object, or None. The token
+        is decrypted once and its class picked by the `type` claim, so the
+        `token_type_hint` isn't needed.
+        """
+        import paseto
+
+        try:
+            data = decode_token(token)['message']
+        except (paseto.PasetoException, ValueError):
+            return None
+        token_class = {
+            AccessToken.token_type: AccessToken,
+            RefreshToken.token_type: RefreshToken,
+        }.get(data.get('type'))
+        if (
+            token_class is None or clock.is_expired(data.get('exp')) or
+            set(token_class.required_claims).difference(data)
+        ):
+            return None
+        return token_class.from_parts(data, token)
+
+    def get_owner_key(self, token):
+        """
+        Returns a (owner type, pk) tuple: the user or app token of access
+        tokens, or the token state of refresh tokens.
+        """
+        model = token.data['model']
+        if token.token_type == AccessToken.token_type:
+            return (model, token.data['pk'])
+        return (model if model == 'app' else 'user_token', token.data['key'])
+
+    def get_owners(self, tokens):
+        """
+        Retrieves the active users and unlocked token states of the tokens.
+
+        Returns:
+            A dict mapping owner keys to objects.
+        """
+        pks = {'user': set(), 'app': set(), 'user_token': set()}
+        for token in tokens:
+            owner_type, pk = self.get_owner_key(token)
+            pks[owner_type].add(pk)
+
+        owners = {}
+        store = get_token_store()
+        if pks['user']:
+            users = get_user_model().objects.filter(is_active=True)
+            owners.update(
+                (('user', pk), user)
+                for pk, user in users.in_bulk(pks['user']).items()
+            )
+        for owner_type, refresh_token_type in (
+            ('app', 'app'), ('user_token', 'user')
+        ):
+            if pks[owner_type]:
+                owners.update(
+                    ((owner_type, key), token) for key, token in
+                    store.get_tokens(refresh_token_type, pks[owner_type])
+                    .items()
+                )
+        return owners
+
+    def get_subject(self, token, owner):
+        """
+        Returns the opaque identifier of the token owner: the user primary
+        key for user tokens, and a keyed hash of the app token key for app
+        tokens, since the key identifies the token state.
+        """
+        if token.data['model'] == 'user':
+            if token.token_type == AccessToken.token_type:
+                return str(owner.pk)
+            return str(owner.user_id)
+        return hashlib.blake2b(
+            token.data['pk' if 'pk' in token.data else 'key'].encode(),
+            key=bytes.fromhex(AUTH_SETTINGS['SECRET_KEY']),
+            person=b'paseto_auth.sub', digest_size=16,
+        ).hexdigest()
+
+    def describe_token(self, token, owners):
+        """
+        Returns the introspection response of a token. The refresh token
+        keys aren't disclosed, the owner is only identified by `sub`.
+        """
+        if token is None:
+            return {'active': False}
+        owner = owners.get(self.get_owner_key(token))
+        if owner is None:
+            return {'active': False}
+
+        exp = token.get_expiration()
+        if exp is not None:
+            exp = int(exp)
+        response = {
+            claim: value for claim, value in token.data.items()
+            if claim not in ('type', 'exp', 'renew_until', 'key', 'pk')
+        }
+        response.update({
+            'active': True,
+            'token_type': token.token_type,
+            'sub': self.get_subject(token, owner),
+            'exp': exp,
+            'expires_in': (
+                None if exp is None else max(exp - int(clock.timestamp()), 0)
+            ),
+        })
+        if self.get_owner_key(token)[0] == 'user':
+            response['username'] = owner.get_username()
+        return response
@@ -14,5 +14,45 @@ AUTH_SETTINGS = {
     ),
     'REFRESH_PERMANENT_LIFETIME': user_settings.get(
         'REFRESH_PERMANENT_LIFETIME', 2*365*24*3600
-    )
+    ),
+    'CLAIMS_FORMAT': user_settings.get('CLAIMS_FORMAT', 'verbose'),
+    'LEEWAY': user_settings.get('LEEWAY', 0),
+    'UPDATE_LAST_LOGIN': user_settings.get('UPDATE_LAST_LOGIN', False),
+    'READ_DATABASE': user_settings.get('READ_DATABASE'),
+    'WRITE_DATABASE': user_settings.get('WRITE_DATABASE', 'default'),
+    'VERIFICATION_CACHE': user_settings.get('VERIFICATION_CACHE'),
+    'VERIFICATION_CACHE_SIZE': user_settings.get(
+        'VERIFICATION_CACHE_SIZE', 0
+    ),
+    'WEBSOCKET_REVALIDATION_INTERVAL': user_settings.get(
+        'WEBSOCKET_REVALIDATION_INTERVAL', 30
+    ),
+    'WARM_IMPORTS': user_settings.get('WARM_IMPORTS', False),
+    'KEY_STRATEGY': user_settings.get('KEY_STRATEGY', 'random'),
+    'TOKEN_STORE': user_settings.get(
+        'TOKEN_STORE', 'paseto_auth.stores.ORMTokenStore'
+    ),
+    'TOKEN_STORE_OPTIONS': user_settings.get('TOKEN_STORE_OPTIONS', {}),
+    'DENORMALIZE_PERMISSIONS': user_settings.get(
+        'DENORMALIZE_PERMISSIONS', False
+    ),
+    'REFRESH_COALESCING': user_settings.get('REFRESH_COALESCING', False),
+    'REFRESH_COALESCING_WINDOW': user_settings.get(
+        'REFRESH_COALESCING_WINDOW', 0
+    ),
+    'REFRESH_COALESCING_CACHE': user_settings.get('REFRESH_COALESCING_CACHE'),
+    'ACCESS_RENEWAL_WINDOW': user_settings.get('ACCESS_RENEWAL_WINDOW', 0),
+    'RENEWAL_HEADER': user_settings.get(
+        'RENEWAL_HEADER', 'Paseto-Access-Token'
+    ),
+    'CRYPTO_BACKEND': user_settings.get('CRYPTO_BACKEND'),
+    'PASETO_VERSION': user_settings.get('PASETO_VERSION', 'v2'),
+    'MAX_SESSIONS_PER_USER': user_settings.get('MAX_SESSIONS_PER_USER'),
+    'SESSION_EVICTION': user_settings.get('SESSION_EVICTION', 'delete'),
+    'DEVICE_REUSE_WINDOW': user_settings.get('DEVICE_REUSE_WINDOW', 0),
+    'AUDIT_LOG': user_settings.get('AUDIT_LOG', False),
+    'AUDIT_BUFFER_SIZE': user_settings.get('AUDIT_BUFFER_SIZE', 10000),
+    'AUDIT_FLUSH_INTERVAL': user_settings.get('AUDIT_FLUSH_INTERVAL', 1),
+    'AUDIT_BATCH_SIZE': user_settings.get('AUDIT_BATCH_SIZE', 500),
+    'AUDIT_OVERFLOW': user_settings.get('AUDIT_OVERFLOW', 'drop_newest'),
 }
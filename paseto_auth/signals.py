@@ -0,0 +1,124 @@
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
+
+from .models import AppRefreshToken
+
+# Instance attribute keeping the affected tokens between pre and post signals
+AFFECTED_TOKENS_ATTR = '_paseto_auth_tokens'
+
+
+def get_affected_tokens(sender, instance, reverse, pk_set, using):
+    """
+    Returns the keys of the app tokens whose permissions depend on a many to
+    many change. A None `pk_set` stands for all the related objects.
+    """
+    token_groups = AppRefreshToken.groups.through
+    token_perms = AppRefreshToken.user_permissions.through
+    if sender in (token_groups, token_perms):
+        if not reverse:
+            return {instance.pk}
+        if pk_set is not None:
+            return set(pk_set)
+        field = 'group_id' if sender is token_groups else 'permission_id'
+        queryset = sender.objects.using(using).filter(**{field: instance.pk})
+    else:
+        if not reverse:
+            group_ids = [instance.pk]
+        elif pk_set is not None:
+            group_ids = pk_set
+        else:
+            group_ids = sender.objects.using(using).filter(
+                permission_id=instance.pk
+            ).values_list('group_id', flat=True)
+        queryset = token_groups.objects.using(using).filter(
+            group_id__in=group_ids
+        )
+    return set(queryset.values_list('apprefreshtoken_id', flat=True))
+
+
+def update_effective_permissions(sender, instance, action, reverse, pk_set,
+                                 using, **kwargs):
+    """
+    Recomputes the permissions of the app tokens affected by changes of
+    their groups or permissions, or of the group permissions.
+    """
+    if action == 'pre_clear':
+        setattr(instance, AFFECTED_TOKENS_ATTR, get_affected_tokens(
+            sender, instance, reverse, None, using
+        ))
+        return
+    elif action == 'post_clear':
+        keys = instance.__dict__.pop(AFFECTED_TOKENS_ATTR, set())
+    elif action in ('post_add', 'post_remove'):
+        keys = get_affected_tokens(sender, instance, reverse, pk_set, using)
+    else:
+        return
+    if keys:
+        AppRefreshToken.update_effective_permissions(keys, using)
+
+
+def collect_deleted_tokens(sender, instance, using, **kwargs):
+    """
+    Keeps the app tokens affected by a group or permission deletion, whose
+    relation rows are deleted without m2m_changed signals.
+    """
+    keys = get_affected_tokens(
+        AppRefreshToken.groups.through if sender is Group
+        else AppRefreshToken.user_permissions.through,
+        instance, True, None, using,
+    )
+    if sender is Permission:
+        keys.update(get_affected_tokens(
+            Group.permissions.through, instance, True, None, using
+        ))
+    setattr(instance, AFFECTED_TOKENS_ATTR, keys)
+
+
+def update_deleted_tokens(sender, instance, using, **kwargs):
+    keys = instance.__dict__.pop(AFFECTED_TOKENS_ATTR, set())
+    if keys:
+        AppRefreshToken.update_effective_permissions(keys, using)
+
+
+def connect():
+    """
+    Connects the signal handlers keeping `effective_permissions` in sync.
+    """
+    for sender in (
+        AppRefreshToken.groups.through,
+        AppRefreshToken.user_permissions.through,
+        Group.permissions.through,
+    ):
+        m2m_changed.connect(
+            update_effective_permissions, sender=sender,
+            dispatch_uid='paseto_auth.effective_permissions',
+        )
+    for sender in (Group, Permission):
+        pre_delete.connect(
+            collect_deleted_tokens, sender=sender,
+            dispatch_uid='paseto_auth.effective_permissions',
+        )
+        post_delete.connect(
+            update_deleted_tokens, sender=sender,
+            dispatch_uid='paseto_auth.effective_permissions',
+        )
+
+
+def disconnect():
+    """
+    Disconnects the signal handlers connected by `connect`.
+    """
+    for sender in (
+        AppRefreshToken.groups.through,
+        AppRefreshToken.user_permissions.through,
+        Group.permissions.through,
+    ):
+        m2m_changed.disconnect(
+            sender=sender, dispatch_uid='paseto_auth.effective_permissions',
+        )
+    for sender in (Group, Permission):
+        for signal in (pre_delete, post_delete):
+            signal.disconnect(
+                sender=sender,
+                dispatch_uid='paseto_auth.effective_permissions',
+            )
@@ -0,0 +1,492 @@
+import sys
+import zlib
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections, router
+from django.db.models import Subquery
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from django.core.exceptions import ObjectDoesNotExist
+
+from . import clock
+from .routers import get_read_database, get_refresh_token
+from .settings import AUTH_SETTINGS
+from .tokens import KEY_STRATEGIES
+
+# Store instance and the settings it was created with
+_token_store = (None, None)
+
+
+def get_token_store():
+    """
+    Returns the refresh token store configured by the `TOKEN_STORE` and
+    `TOKEN_STORE_OPTIONS` settings.
+    """
+    global _token_store
+    config = (
+        AUTH_SETTINGS['TOKEN_STORE'], AUTH_SETTINGS['TOKEN_STORE_OPTIONS']
+    )
+    if _token_store[0] != config:
+        store_class = import_string(config[0])
+        _token_store = (config, store_class(**config[1]))
+    return _token_store[1]
+
+
+class BaseTokenStore(object):
+    """
+    Interface for refresh token state storage.
+
+    Refresh token types are 'user' and 'app'. Token objects expose at least
+    the `key`, `expires_at` and `locked` attributes.
+
+    Attributes:
+        supports_session_limits: boolean to indicate the store implements
+            `evict_tokens`, required by `MAX_SESSIONS_PER_USER`.
+    """
+    supports_session_limits = False
+
+    def generate_key(self, refresh_token_type, check_unique=True):
+        """
+        Creates a token key with the `KEY_STRATEGY` setting.
+
+        Args:
+            refresh_token_type: 'user' or 'app'.
+            check_unique: boolean to check the key is not in use.
+
+        Returns:
+            A string containing the key.
+        """
+        generate = KEY_STRATEGIES[AUTH_SETTINGS['KEY_STRATEGY']]
+        while True:
+            key = generate()
+            if not check_unique or not self.exists(refresh_token_type, key):
+                return key
+
+    def exists(self, refresh_token_type, key):
+        """
+        Indicates if a token with the given key is stored.
+        """
+        raise NotImplementedError
+
+    def create_token(self, refresh_token_type, **fields):
+        """
+        Stores the state of a new refresh token.
+
+        Args:
+            refresh_token_type: 'user' or 'app'.
+            fields: token fields, including `key`.
+
+        Returns:
+            The token object.
+        """
+        raise NotImplementedError
+
+    def get_token(self, refresh_token_type, key):
+        """
+        Retrieves an unlocked refresh token.
+
+        Args:
+            refresh_token_type: 'user' or 'app'.
+            key: refresh token key.
+
+        Returns:
+            The token object.
+
+        Raises:
+            ObjectDoesNotExist: no token with the given key, or locked token.
+        """
+        raise NotImplementedError
+
+    def get_tokens(self, refresh_token_type, keys):
+        """
+        Retrieves several unlocked refresh tokens.
+
+        Args:
+            refresh_token_type: 'user' or 'app'.
+            keys: iterable of refresh token keys.
+
+        Returns:
+            A dict mapping the keys of the found tokens to the token objects.
+        """
+        tokens = {}
+        for key in keys:
+            try:
+                tokens[key] = self.get_token(refresh_token_type, key)
+            except ObjectDoesNotExist:
+                pass
+        return tokens
+
+    def lock_token(self, refresh_token_type, key):
+        """
+        Locks (revokes) a refresh token.
+
+        Args:
+            refresh_token_type: 'user' or 'app'.
+            key: refresh token key.
+        """
+        raise NotImplementedError
+
+    def get_device_token(self, user, user_agent, ip, expires_range):
+        """
+        Retrieves an unlocked user token of a device, to reuse it for a
+        repeat login. Stores without a device index return None.
+
+        Args:
+            user: user instance.
+            user_agent: user agent string.
+            ip: IP address string, or None.
+            expires_range: (min, max) tuple of expiration datetimes.
+
+        Returns:
+            The token object with the latest expiration, or None.
+        """
+        return None
+
+    def evict_tokens(self, user, keep, lock=False):
+        """
+        Revokes the oldest refresh tokens of a user beyond the newest ones.
+
+        Args:
+            user: user instance.
+            keep: number of newest tokens kept, at least 1.
+            lock: boolean to lock the evicted tokens instead of deleting
+                them. Only unlocked tokens are counted when locking.
+
+        Returns:
+            The number of evicted tokens.
+        """
+        raise NotImplementedError(
+            "{} doesn't support session limits".format(type(self).__name__)
+        )
+
+    def get_databases(self, refresh_token_type):
+        """
+        Returns the aliases of the databases holding all the tokens of a
+        type in the token models, for exports.
+
+        Args:
+            refresh_token_type: 'user' or 'app'.
+
+        Returns:
+            A list of database aliases.
+
+        Raises:
+            NotImplementedError: the tokens aren't kept in the token models.
+        """
+        raise NotImplementedError(
+            "{} doesn't store {} tokens in the database".format(
+                type(self).__name__, refresh_token_type
+            )
+        )
+
+
+class ORMTokenStore(BaseTokenStore):
+    """
+    Stores the refresh token state with the token models, in the databases
+    selected by the `READ_DATABASE` and `WRITE_DATABASE` settings.
+    """
+    supports_session_limits = True
+
+    def get_model(self, refresh_token_type):
+        from .models import UserRefreshToken, AppRefreshToken
+
+        return {
+            'user': UserRefreshToken,
+            'app': AppRefreshToken,
+        }[refresh_token_type]
+
+    def exists(self, refresh_token_type, key):
+        model = self.get_model(refresh_token_type)
+        return model.objects.filter(key=key).exists()
+
+    def create_token(self, refresh_token_type, **fields):
+        return self.get_model(refresh_token_type).objects.create(**fields)
+
+    def get_token(self, refresh_token_type, key):
+        return get_refresh_token(self.get_model(refresh_token_type), key)
+
+    def get_tokens(self, refresh_token_type, keys):
+        model = self.get_model(refresh_token_type)
+        keys = set(keys)
+        if not keys:
+            return {}
+        read_database = get_read_database()
+        tokens = model.objects.using(read_database).in_bulk(keys)
+        missing = keys.difference(tokens)
+        if missing and read_database != AUTH_SETTINGS['WRITE_DATABASE']:
+            tokens.update(
+                model.objects.using(AUTH_SETTINGS['WRITE_DATABASE'])
+                .in_bulk(missing)
+            )
+        return {
+            key: token for key, token in tokens.items() if not token.locked
+        }
+
+    def lock_token(self, refresh_token_type, key):
+        model = self.get_model(refresh_token_type)
+        model.objects.filter(key=key).update(locked=True)
+
+    def get_databases(self, refresh_token_type):
+        return [get_read_database()]
+
+    def get_device_token(self, user, user_agent, ip, expires_range):
+        """
+        Looks the token up with the (user, agent, ip) index, in the write
+        database since replicas may lag behind recent logins.
+        """
+        from .models import UserAgent
+
+        agent_id = UserAgent.objects.get_id(user_agent, create=False)
+        if user_agent and agent_id is None:
+            return None
+        model = self.get_model('user')
+        return model.objects.using(router.db_for_write(model)).filter(
+            user=user,
+            agent_id=agent_id,
+            ip=ip,
+            locked=False,
+            expires_at__range=expires_range,
+        ).order_by('-expires_at').only('key', 'expires_at').first()
+
+    def evict_tokens(self, user, keep, lock=False):
+        """
+        Evicts the tokens other than the newest `keep` ones with a single
+        statement, using the (user, created_at) index. Tokens created at
+        the same time are ordered by key, so exactly `keep` are kept.
+        """
+        model = self.get_model('user')
+        database = router.db_for_write(model)
+        tokens = model.objects.using(database).filter(user=user)
+        if lock:
+            tokens = tokens.filter(locked=False)
+        kept = tokens.order_by('-created_at', '-key').values('key')[:keep]
+        if connections[database].features.update_can_self_select:
+            kept = Subquery(kept)
+        else:
+            # MySQL can't select from the table being updated or deleted
+            kept = list(kept.values_list('key', flat=True))
+            if len(kept) < keep:
+                return 0
+        evicted = tokens.exclude(key__in=kept)
+        if lock:
+            return evicted.update(locked=True)
+        return evicted.delete()[0]
+
+
+class ShardedTokenStore(ORMTokenStore):
+    """
+    Distributes the refresh token state across several databases by a hash
+    of the token key. Each shard holds the token tables, and the user table
+    (or a replica of it) for the user token foreign keys.
+
+    Attributes:
+        databases: list of database aliases, one per shard. Changing the
+            list remaps existing keys.
+    """
+    # User tokens are spread across the shards by key
+    supports_session_limits = False
+
+    def __init__(self, databases):
+        self.databases = list(databases)
+
+    def get_database(self, key):
+        """
+        Returns the database alias of the shard storing the given key.
+        """
+        index = zlib.crc32(key.encode()) % len(self.databases)
+        return self.databases[index]
+
+    def exists(self, refresh_token_type, key):
+        model = self.get_model(refresh_token_type)
+        queryset = model.objects.using(self.get_database(key))
+        return queryset.filter(key=key).exists()
+
+    def create_token(self, refresh_token_type, **fields):
+        from .models import UserAgent
+
+        model = self.get_model(refresh_token_type)
+        database = self.get_database(fields['key'])
+        # Each shard holds the user agents of its tokens
+        fields['agent_id'] = UserAgent.objects.get_id(
+            fields.pop('user_agent', ''), using=database
+        )
+        return model.objects.using(database).create(**fields)
+
+    def get_databases(self, refresh_token_type):
+        return list(self.databases)
+
+    def get_device_token(self, user, user_agent, ip, expires_range):
+        # User tokens are spread across the shards by key
+        return None
+
+    def evict_tokens(self, user, keep, lock=False):
+        # User tokens are spread across the shards by key
+        return BaseTokenStore.evict_tokens(self, user, keep, lock)
+
+    def get_token(self, refresh_token_type, key):
+        model = self.get_model(refresh_token_type)
+        token = model.objects.using(self.get_database(key)).get(key=key)
+        if token.locked:
+            raise model.DoesNotExist("Locked refresh token")
+        return token
+
+    def get_tokens(self, refresh_token_type, keys):
+        model = self.get_model(refresh_token_type)
+        shards = {}
+        for key in keys:
+            shards.setdefault(self.get_database(key), set()).add(key)
+        tokens = {}
+        for database, shard_keys in shards.items():
+            tokens.update(model.objects.using(database).in_bulk(shard_keys))
+        return {
+            key: token for key, token in tokens.items() if not token.locked
+        }
+
+    def lock_token(self, refresh_token_type, key):
+        model = self.get_model(refresh_token_type)
+        queryset = model.objects.using(self.get_database(key))
+        queryset.filter(key=key).update(locked=True)
+
+
+class CacheTokenStore(ORMTokenStore):
+    """
+    Stores the user refresh token state in a Django cache, as a dict of the
+    token field values that expires with the token. The cache must be
+    persistent and shared by all the processes (e.g. Redis), since evicted
+    entries invalidate their refresh tokens.
+
+    App tokens keep using the token model, since their groups and
+    permissions are relations.
+
+    Attributes:
+        alias: Django cache alias.
+        prefix: prefix for the cache keys.
+    """
+    kv_types = ('user',)
+    supports_session_limits = False
+
+    def __init__(self, alias='default', prefix='paseto_auth:token:'):
+        self.alias = alias
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_cache_key(self, refresh_token_type, key):
+        return '{}{}:{}'.format(self.prefix, refresh_token_type, key)
+
+    def get_timeout(self, expires_at):
+        """
+        Returns the cache timeout in seconds for an expiration datetime, or
+        None for tokens that don't expire.
+        """
+        if expires_at is None:
+            return None
+        if timezone.is_naive(expires_at):
+            expires_at = timezone.make_aware(expires_at)
+        return max(int(expires_at.timestamp() - clock.timestamp()), 1)
+
+    def exists(self, refresh_token_type, key):
+        if refresh_token_type not in self.kv_types:
+            return super().exists(refresh_token_type, key)
+        cache_key = self.get_cache_key(refresh_token_type, key)
+        return self.cache.get(cache_key) is not None
+
+    def create_token(self, refresh_token_type, **fields):
+        if refresh_token_type not in self.kv_types:
+            return super().create_token(refresh_token_type, **fields)
+        # The user agent string is kept in the state, not in the database
+        user_agent = fields.pop('user_agent', '')
+        obj = self.get_model(refresh_token_type)(**fields)
+        obj._user_agent = user_agent
+        obj.created_at = clock.now()
+        state = {
+            field.attname: getattr(obj, field.attname)
+            for field in obj._meta.concrete_fields
+        }
+        state['user_agent'] = user_agent
+        self.cache.set(
+            self.get_cache_key(refresh_token_type, obj.key),
+            state,
+            self.get_timeout(obj.expires_at),
+        )
+        return obj
+
+    def get_state_token(self, model, state):
+        """
+        Builds a token instance from its cached state, without queries.
+        """
+        state = dict(state)
+        # Legacy states stored the user agent hash
+        state.pop('user_agent_hash', None)
+        user_agent = state.pop('user_agent', '')
+        obj = model(**state)
+        obj._user_agent = user_agent
+        return obj
+
+    def get_token(self, refresh_token_type, key):
+        if refresh_token_type not in self.kv_types:
+            return super().get_token(refresh_token_type, key)
+        model = self.get_model(refresh_token_type)
+        state = self.cache.get(self.get_cache_key(refresh_token_type, key))
+        if state is None:
+            raise model.DoesNotExist("Missing refresh token")
+        if state['locked']:
+            raise model.DoesNotExist("Locked refresh token")
+        return self.get_state_token(model, state)
+
+    def get_tokens(self, refresh_token_type, keys):
+        if refresh_token_type not in self.kv_types:
+            return super().get_tokens(refresh_token_type, keys)
+        model = self.get_model(refresh_token_type)
+        cache_keys = {
+            self.get_cache_key(refresh_token_type, key): key for key in keys
+        }
+        states = self.cache.get_many(list(cache_keys))
+        return {
+            cache_keys[cache_key]: self.get_state_token(model, state)
+            for cache_key, state in states.items() if not state['locked']
+        }
+
+    def get_databases(self, refresh_token_type):
+        if refresh_token_type not in self.kv_types:
+            return super().get_databases(refresh_token_type)
+        return BaseTokenStore.get_databases(self, refresh_token_type)
+
+    def get_device_token(self, user, user_agent, ip, expires_range):
+        return None
+
+    def evict_tokens(self, user, keep, lock=False):
+        return BaseTokenStore.evict_tokens(self, user, keep, lock)
+
+    def lock_token(self, refresh_token_type, key):
+        if refresh_token_type not in self.kv_types:
+            return super().lock_token(refresh_token_type, key)
+        cache_key = self.get_cache_key(refresh_token_type, key)
+        state = self.cache.get(cache_key)
+        if state is not None:
+            state['locked'] = True
+            self.cache.set(
+                cache_key, state, self.get_timeout(state['expires_at'])
+            )
+
+
+class InMemoryTokenStore(CacheTokenStore):
+    """
+    Stores the user refresh token state in process memory, for tests and
+    single process deployments. Each instance has its own storage.
+    """
+
+    def __init__(self, prefix='paseto_auth:token:'):
+        super().__init__(prefix=prefix)
+        self._cache = LocMemCache(
+            'paseto_auth.stores.{}'.format(id(self)),
+            {'OPTIONS': {'MAX_ENTRIES': sys.maxsize}},
+        )
+
+    @property
+    def cache(self):
+        return self._cache
@@ -1,20 +1,42 @@
-import paseto
+import json
 import string
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from django.utils.crypto import get_random_string
 
+from . import cache, clock
 from .exceptions import TokenError
-from .models import UserRefreshToken, AppRefreshToken
 from .settings import AUTH_SETTINGS
 
 
 VALID_KEY_CHARS = string.ascii_lowercase + string.digits
 
+# Digits before letters, so ordered key prefixes sort by time
+ORDERED_KEY_CHARS = string.digits + string.ascii_lowercase
+
 # Token types
 ACCESS = 'access'
 REFRESH = 'refresh'
 
+# Claims formats
+VERBOSE = 'verbose'
+COMPACT = 'compact'
+
+# Compact claims profile
+COMPACT_VERSION = 1
+COMPACT_NAMES = {
+    'type': 't', 'model': 'm', 'pk': 'p', 'key': 'k', 'renew_until': 'r',
+}
+COMPACT_CODES = {
+    'type': {ACCESS: 0, REFRESH: 1},
+    'model': {'user': 0, 'app': 1},
+}
+VERBOSE_NAMES = {short: name for name, short in COMPACT_NAMES.items()}
+VERBOSE_CODES = {
+    name: {code: value for value, code in codes.items()}
+    for name, codes in COMPACT_CODES.items()
+}
+
 # Lifetime values
 LIFETIME_CHOICES = {
     'short': AUTH_SETTINGS['REFRESH_SHORT_LIFETIME'],
@@ -23,6 +45,190 @@ LIFETIME_CHOICES = {
 }
 
 
+class CompactJsonEncoder(object):
+    """
+    JSON encoder for paseto without insignificant whitespace.
+    """
+    @classmethod
+    def dumps(cls, var):
+        return json.dumps(var, separators=(',', ':')).encode('utf8')
+
+    @classmethod
+    def loads(cls, var):
+        return json.loads(var)
+
+
+def encode_claims(data, exp):
+    """
+    Encodes token claims using the compact profile.
+
+    Args:
+        data: dict containing the verbose claims.
+        exp: expiration date as an integer epoch.
+
+    Returns:
+        A dict containing the compact claims.
+    """
+    claims = {'v': COMPACT_VERSION, 'e': exp}
+    for name, value in data.items():
+        if name in COMPACT_CODES:
+            value = COMPACT_CODES[name][value]
+        claims[COMPACT_NAMES.get(name, name)] = value
+    return claims
+
+
+def decode_claims(claims):
+    """
+    Decodes token claims encoded using the compact profile.
+
+    Args:
+        claims: dict containing the compact claims.
+
+    Returns:
+        A dict containing the verbose claims, with `exp` as an integer epoch.
+
+    Raises:
+        PasetoValidationError: unknown profile version or claim code, or
+            missing expiration.
+    """
+    import paseto
+
+    if claims.pop('v') != COMPACT_VERSION:
+        raise paseto.PasetoValidationError("Unknown claims version")
+    if not isinstance(claims.get('e'), int):
+        raise paseto.PasetoValidationError("Missing expiration claim")
+    data = {'exp': claims.pop('e')}
+    try:
+        for short, value in claims.items():
+            name = VERBOSE_NAMES.get(short, short)
+            if name in VERBOSE_CODES:
+                value = VERBOSE_CODES[name][value]
+            data[name] = value
+    except (KeyError, TypeError):
+        raise paseto.PasetoValidationError("Unknown claim code")
+    return data
+
+
+def decode_token(token):
+    """
+    Decrypts a token string with the crypto backend and decodes its claims,
+    without validating them. Tokens using the compact claims profile are
+    recognised by their version claim, so both formats are accepted.
+
+    Args:
+        token: token string.
+
+    Returns:
+        A dict containing the token message and footer.
+
+    Raises:
+        PasetoException: invalid claims.
+        ValueError: invalid token string.
+    """
+    from . import crypto
+
+    message, footer = crypto.get_backend().decrypt(
+        bytes(token, 'utf-8'), bytes.fromhex(AUTH_SETTINGS['SECRET_KEY'])
+    )
+    parsed = {
+        'message': CompactJsonEncoder.loads(message),
+        'footer': CompactJsonEncoder.loads(footer) if footer else None,
+    }
+    if 'v' in parsed['message']:
+        parsed['message'] = decode_claims(parsed['message'])
+    return parsed
+
+
+class TokenFactory(object):
+    """
+    Mints tokens of a given class with the static parts precomputed: key
+    bytes, claims shared by every token, claims encoding and JSON encoder.
+    Each call only serializes the per-token claims and encrypts the payload.
+
+    The settings are read when the factory is created, and the crypto
+    backend when the first token is minted.
+
+    Attributes:
+        token_class: BaseToken subclass of the minted tokens.
+        lifetime: token lifetime in seconds.
+    """
+    __slots__ = (
+        'token_class', 'lifetime', '_key', '_compact', '_claims', '_static',
+        '_encode', '_exp', '_backend', '_header',
+    )
+
+    def __init__(self, token_class, lifetime=None, **claims):
+        """
+        Args:
+            token_class: BaseToken subclass.
+            lifetime: optional lifetime in seconds, defaults to the class one.
+            claims: claims shared by every minted token, e.g. `model`.
+        """
+        self.token_class = token_class
+        self.lifetime = lifetime or token_class.lifetime
+        self._key = bytes.fromhex(AUTH_SETTINGS['SECRET_KEY'])
+        self._compact = AUTH_SETTINGS['CLAIMS_FORMAT'] == COMPACT
+        claims['type'] = token_class.token_type
+        self._claims = claims
+        if self._compact:
+            self._static = encode_claims(claims, None)
+            self._encode = json.JSONEncoder(separators=(',', ':')).encode
+        else:
+            self._static = claims
+            self._encode = json.JSONEncoder().encode
+        self._exp = (None, None)
+        self._backend = None
+        self._header = None
+
+    def _get_exp(self):
+        """
+        Returns the expiration claim value, computed once per second.
+        """
+        now = int(clock.timestamp())
+        if self._exp[0] != now:
+            exp = now + self.lifetime
+            if not self._compact:
+                exp = clock.utcnow().replace(microsecond=0) + timedelta(
+                    seconds=self.lifetime
+                )
+                exp = exp.isoformat()
+            self._exp = (now, exp)
+        return self._exp[1]
+
+    def __call__(self, **claims):
+        """
+        Mints a token.
+
+        Args:
+            claims: per-token claims, e.g. `pk` or `key`.
+
+        Returns:
+            A token_class object.
+        """
+        if self._backend is None:
+            from . import crypto
+
+            self._backend = crypto.get_backend()
+            self._header = crypto.get_header()
+        exp = self._get_exp()
+        data = self._claims.copy()
+        data.update(claims)
+        data['exp'] = exp
+        if self._compact:
+            payload = self._static.copy()
+            payload['e'] = exp
+            for name, value in claims.items():
+                if name in COMPACT_CODES:
+                    value = COMPACT_CODES[name][value]
+                payload[COMPACT_NAMES.get(name, name)] = value
+        else:
+            payload = data
+        token = self._backend.encrypt(
+            self._encode(payload).encode(), self._key, self._header
+        )
+        return self.token_class.from_parts(data, token.decode())
+
+
 class BaseToken(object):
     """
     Base class for tokens.
@@ -31,11 +237,15 @@ class BaseToken(object):
         required_claims: list of token required claims.
         token_type: token type (access/refresh).
         lifetime: token lifetime in seconds.
+        cacheable: boolean to keep verified claims in the verification cache.
 
     Methods:
         is_valid: returns boolean indicating if the token is valid.
+        factory: returns a TokenFactory minting tokens of the class.
     """
+    __slots__ = ('data', 'token', 'lifetime')
     required_claims = ['type', 'model', 'pk']
+    cacheable = False
 
     def __init__(self, data=None, token=None):
         """
@@ -58,35 +268,77 @@ class BaseToken(object):
         else:
             raise TokenError("Missing argument 'data' or 'token'")
 
+    @classmethod
+    def from_parts(cls, data, token):
+        """
+        Creates a token object from its claims and token string, without
+        encrypting or parsing anything.
+        """
+        obj = cls.__new__(cls)
+        obj.data = data
+        obj.token = token
+        return obj
+
+    @classmethod
+    def factory(cls, **claims):
+        """
+        Returns a TokenFactory minting tokens of the class, for creating
+        many tokens with the same static claims.
+
+        Args:
+            claims: claims shared by every minted token, e.g. `model`.
+        """
+        return TokenFactory(cls, **claims)
+
     def _create_token(self):
         """
-        Creates a token using paseto and assigns it to the token attribute.
+        Creates a token with the crypto backend and assigns it to the token
+        attribute. The claims are encoded according to the `CLAIMS_FORMAT`
+        setting.
         """
-        token = paseto.create(
-            key=bytes.fromhex(AUTH_SETTINGS['SECRET_KEY']),
-            purpose='local',
-            claims=self.data,
-            exp_seconds=self.lifetime,
+        from . import crypto
+
+        if AUTH_SETTINGS['CLAIMS_FORMAT'] == COMPACT:
+            exp = int(clock.timestamp()) + self.lifetime
+            message = CompactJsonEncoder.dumps(encode_claims(self.data, exp))
+            self.data['exp'] = exp
+        else:
+            exp = clock.utcnow() + timedelta(seconds=self.lifetime)
+            self.data['exp'] = exp.replace(microsecond=0).isoformat()
+            message = json.dumps(self.data).encode()
+        token = crypto.get_backend().encrypt(
+            message,
+            bytes.fromhex(AUTH_SETTINGS['SECRET_KEY']),
+            crypto.get_header(),
         )
         self.token = token.decode()
 
     def _parse_token(self):
         """
-        Parses the token string.
+        Parses the token string with the crypto backend, for any supported
+        PASETO version and claims format. The expiration is checked against
+        the `clock` time source.
 
         Returns:
-            A dict containing the token message, exp date and footer
+            A dict containing the token message and footer
 
         Raises:
             PasetoException: invalid token data.
             ValueError: invalid token string.
         """
-        return paseto.parse(
-            key=bytes.fromhex(AUTH_SETTINGS['SECRET_KEY']),
-            purpose='local',
-            token=bytes(self.token, 'utf-8'),
-            required_claims=self.required_claims,
+        import paseto
+
+        parsed = decode_token(self.token)
+        if clock.is_expired(parsed['message'].get('exp')):
+            raise paseto.PasetoTokenExpired("token expired")
+        missing_claims = set(self.required_claims).difference(
+            parsed['message']
         )
+        if missing_claims:
+            raise paseto.PasetoValidationError(
+                "required claims missing {}".format(missing_claims)
+            )
+        return parsed
 
     def is_valid(self):
         """
@@ -95,6 +347,14 @@ class BaseToken(object):
         Returns:
             A boolean.
         """
+        import paseto
+
+        use_cache = self.cacheable and cache.is_enabled()
+        if use_cache:
+            claims = cache.get_claims(self.token)
+            if claims is not None:
+                self.data = claims
+                return True
         try:
             parsed = self._parse_token()
         except (paseto.PasetoException, ValueError):
@@ -102,9 +362,18 @@ class BaseToken(object):
         else:
             self.data = parsed['message']
             is_valid = self.data['type'] == self.token_type
+            if is_valid and use_cache:
+                cache.set_claims(self.token, self.data)
 
         return is_valid
 
+    def get_expiration(self):
+        """
+        Returns the token expiration as an epoch timestamp, or None if the
+        token has no expiration claim.
+        """
+        return clock.to_timestamp(self.data.get('exp'))
+
     def __str__(self):
         return self.token
 
@@ -113,14 +382,17 @@ class AccessToken(BaseToken):
     """
     Class for access tokens.
     """
+    __slots__ = ()
     token_type = ACCESS
     lifetime = AUTH_SETTINGS['ACCESS_LIFETIME']
+    cacheable = True
 
 
 class RefreshToken(BaseToken):
     """
     Class for refresh tokens.
     """
+    __slots__ = ()
     token_type = REFRESH
     required_claims = ['type', 'model', 'key']
 
@@ -135,25 +407,63 @@ class RefreshToken(BaseToken):
             self.lifetime = LIFETIME_CHOICES[data['lifetime']]
         super().__init__(data, token)
 
+    @classmethod
+    def factory(cls, lifetime, **claims):
+        """
+        Returns a TokenFactory minting refresh tokens.
+
+        Args:
+            lifetime: 'short', 'long' or 'permanent'.
+            claims: claims shared by every minted token, e.g. `model`.
+        """
+        return TokenFactory(cls, LIFETIME_CHOICES[lifetime], **claims)
+
 
-def generate_token_key(refresh_token_type):
+def generate_random_key():
     """
-    Creates a unique token key.
+    Returns a key made of 32 random characters.
+    """
+    return get_random_string(32, VALID_KEY_CHARS)
+
+
+def generate_ordered_key():
+    """
+    Returns a time-ordered key: the creation time in milliseconds (9 base36
+    characters) followed by 23 random characters. Keys created close in time
+    are close in the primary key index, which keeps inserts local.
+    """
+    timestamp = int(clock.timestamp() * 1000)
+    prefix = ''
+    while timestamp:
+        timestamp, index = divmod(timestamp, len(ORDERED_KEY_CHARS))
+        prefix = ORDERED_KEY_CHARS[index] + prefix
+    return prefix.rjust(9, '0') + get_random_string(23, VALID_KEY_CHARS)
+
+
+# Key generators for the KEY_STRATEGY setting
+KEY_STRATEGIES = {
+    'random': generate_random_key,
+    'ordered': generate_ordered_key,
+}
+
+
+def generate_token_key(refresh_token_type, check_unique=True):
+    """
+    Creates a unique token key with the configured token store.
 
     Args:
         refresh_token_type: 'user' or 'app'.
+        check_unique: boolean to check the key is not in use.
+            A collision between 32 random characters is negligible, so it
+            can be skipped when the insert relies on the primary key
+            constraint instead.
 
     Returns:
         A string containing the key.
     """
-    token_model = {
-        'user': UserRefreshToken,
-        'app': AppRefreshToken,
-    }[refresh_token_type]
-    while True:
-        token_key = get_random_string(32, VALID_KEY_CHARS)
-        if not token_model.objects.filter(key=token_key).exists():
-            return token_key
+    from .stores import get_token_store
+
+    return get_token_store().generate_key(refresh_token_type, check_unique)
 
 
 def create_app_token(name="", owner=None, groups=[], perms=[]):
@@ -170,11 +480,14 @@ def create_app_token(name="", owner=None, groups=[], perms=[]):
     Returns:
         The crated app token object and the refresh token string.
     """
-    token_key = generate_token_key(refresh_token_type='app')
+    from .stores import get_token_store
+
+    store = get_token_store()
+    token_key = store.generate_key(refresh_token_type='app')
     lifetime = LIFETIME_CHOICES['permanent']
-    expires_at = datetime.now() + timedelta(seconds=lifetime)
-    obj = AppRefreshToken.objects.create(
-        name=name, owner=owner, key=token_key, expires_at=expires_at
+    expires_at = clock.now() + timedelta(seconds=lifetime)
+    obj = store.create_token(
+        'app', name=name, owner=owner, key=token_key, expires_at=expires_at
     )
     if groups:
         obj.groups.add(*list(groups))
@@ -1,6 +1,11 @@
 from django.urls import path
 
-from .views import GetTokenPairView, GetAccessTokenView
+from .views import (
+    ExportTokensView,
+    GetAccessTokenView,
+    GetTokenPairView,
+    IntrospectTokenView,
+)
 
 app_name = 'paseto_auth'
 urlpatterns = [
@@ -10,4 +15,12 @@ urlpatterns = [
     path(
         'token/refresh/', GetAccessTokenView.as_view(), name="get_access_token"
     ),
+    path(
+        'token/introspect/', IntrospectTokenView.as_view(),
+        name="introspect_token"
+    ),
+    path(
+        'token/export/<str:refresh_token_type>.<str:export_format>',
+        ExportTokensView.as_view(), name="export_tokens"
+    ),
 ]
@@ -1,22 +1,46 @@
+from django.http import StreamingHttpResponse
+
+from rest_framework.exceptions import NotFound
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from .serializers import GetTokenPairSerializer, RefreshTokenSerializer
+from . import clock
+from .authentication import PasetoAuthentication
+from .export import EXPORT_FIELDS, EXPORT_FORMATS, export_tokens
+from .permissions import CanExportTokens, CanIntrospectTokens
+from .serializers import (
+    GetTokenPairSerializer,
+    IntrospectTokenSerializer,
+    RefreshTokenSerializer,
+)
 from .settings import AUTH_SETTINGS
 
 
-class GetTokenPairView(GenericAPIView):
+class BaseTokenView(GenericAPIView):
     """
-    View for retrieving a token pair using user credentials.
+    Base view for token endpoints.
     """
-    serializer_class = GetTokenPairSerializer
     permission_classes = ()
     authentication_classes = ()
 
     def get_authenticate_header(self, request):
         return '{} realm="api"'.format(AUTH_SETTINGS['HEADER_PREFIX'])
 
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Caches the current time while handling the request.
+        """
+        with clock.scope():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class GetTokenPairView(BaseTokenView):
+    """
+    View for retrieving a token pair using user credentials.
+    """
+    serializer_class = GetTokenPairSerializer
+
     def post(self, request, *args, **kwargs):
         """
         Validates user credentials and returns response containing
@@ -32,16 +56,11 @@ class GetTokenPairView(GenericAPIView):
         return Response(serializer.validated_data, status=status.HTTP_200_OK)
 
 
-class GetAccessTokenView(GenericAPIView):
+class GetAccessTokenView(BaseTokenView):
     """
     View for retrieving a new access token using a refresh token.
     """
     serializer_class = RefreshTokenSerializer
-    permission_classes = ()
-    authentication_classes = ()
-
-    def get_authenticate_header(self, request):
-        return '{} realm="api"'.format(AUTH_SETTINGS['HEADER_PREFIX'])
 
     def post(self, request, *args, **kwargs):
         """
@@ -54,3 +73,63 @@ class GetAccessTokenView(GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         return Response(serializer.validated_data, status=status.HTTP_200_OK)
+
+
+class IntrospectTokenView(BaseTokenView):
+    """
+    View for introspecting tokens (RFC 7662), with batch support, for app
+    integration tokens with the `paseto_auth.introspect_token` permission.
+    """
+    serializer_class = IntrospectTokenSerializer
+    authentication_classes = (PasetoAuthentication,)
+    permission_classes = (CanIntrospectTokens,)
+
+    def post(self, request, *args, **kwargs):
+        """
+        Returns a response describing the token, or the list of `results`
+        for a batch. Invalid, expired or revoked tokens are described as
+        `{"active": false}`.
+
+        Raises:
+            ValidationError (400 response) if invalid request data.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
+
+
+class ExportTokensView(BaseTokenView):
+    """
+    View for streaming the refresh token inventory of a type as CSV or JSON
+    lines, for users and app integration tokens with the
+    `paseto_auth.export_tokens` permission.
+    """
+    authentication_classes = (PasetoAuthentication,)
+    permission_classes = (CanExportTokens,)
+
+    def get(self, request, refresh_token_type, export_format):
+        """
+        Returns a streaming response with the exported tokens.
+
+        Raises:
+            NotFound (404 response) if unknown token type or format, or
+            tokens not stored in the database by the token store.
+        """
+        if (
+            refresh_token_type not in EXPORT_FIELDS or
+            export_format not in EXPORT_FORMATS
+        ):
+            raise NotFound()
+        try:
+            lines = export_tokens(refresh_token_type, export_format)
+        except NotImplementedError as exc:
+            raise NotFound(str(exc))
+        response = StreamingHttpResponse(
+            lines, content_type=EXPORT_FORMATS[export_format],
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="{}_tokens.{}"'.format(
+                refresh_token_type, export_format
+            )
+        )
+        return response
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+
+from .authentication import get_user
+from .settings import AUTH_SETTINGS
+from .stores import get_token_store
+from .tokens import AccessToken
+
+logger = logging.getLogger(__name__)
+
+# Close code sent when the user or app token is revoked
+CLOSE_CODE = 4001
+
+# Maximum number of primary keys per revalidation query
+BATCH_SIZE = 500
+
+
+def get_scope_token(scope):
+    """
+    Extracts the access token from a websocket handshake: the authentication
+    header, the subprotocols (e.g. `['paseto', '<token>']`) or the `token`
+    query string parameter.
+
+    Returns:
+        A string, or None if no token is found.
+    """
+    prefix = AUTH_SETTINGS['HEADER_PREFIX']
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            header = value.decode('latin1').split()
+            if len(header) == 2 and header[0] == prefix:
+                return header[1]
+
+    subprotocols = scope.get('subprotocols', [])
+    if prefix.lower() in subprotocols:
+        index = subprotocols.index(prefix.lower()) + 1
+        if index < len(subprotocols):
+            return subprotocols[index]
+
+    query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+    if query.get('token'):
+        return query['token'][0]
+
+    return None
+
+
+class Connection(object):
+    """
+    Authenticated websocket connection tracked for revalidation. The access
+    token is only checked in the handshake: clients can't send a new one
+    over an open connection, so its expiry doesn't close the connection.
+    """
+
+    def __init__(self, access_token, send):
+        self.model = access_token.data['model']
+        self.pk = access_token.data['pk']
+        self.send = send
+        self.closed = False
+
+    async def close(self):
+        """
+        Closes the connection, the server then sends the disconnect event
+        to the application.
+        """
+        if not self.closed:
+            self.closed = True
+            await self.send({'type': 'websocket.close', 'code': CLOSE_CODE})
+
+
+def get_active_owners(connections):
+    """
+    Retrieves the owners of the given connections that are still active,
+    with one query per model and batch. App tokens are read through the
+    token store, so they're found whatever the store or shard.
+
+    Returns:
+        A set of (model, pk) tuples.
+    """
+    pks = {'user': set(), 'app': set()}
+    for connection in connections:
+        pks[connection.model].add(connection.pk)
+
+    active = set()
+    users = get_user_model().objects.filter(is_active=True)
+    store = get_token_store()
+    for model, model_pks in pks.items():
+        model_pks = list(model_pks)
+        for start in range(0, len(model_pks), BATCH_SIZE):
+            batch = model_pks[start:start + BATCH_SIZE]
+            if model == 'user':
+                batch_active = users.filter(pk__in=batch).values_list(
+                    'pk', flat=True
+                )
+            else:
+                batch_active = store.get_tokens('app', batch)
+            active.update((model, pk) for pk in batch_active)
+    return active
+
+
+class Revalidator(object):
+    """
+    Periodically closes connections whose user is deactivated or app token
+    locked. A single timer and a batch of queries per interval are shared by
+    all the registered connections.
+
+    Attributes:
+        interval: seconds between revalidations.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = (
+            interval or AUTH_SETTINGS['WEBSOCKET_REVALIDATION_INTERVAL']
+        )
+        self.connections = set()
+        self._task = None
+
+    def register(self, connection):
+        """
+        Tracks a connection, starting the timer if it isn't running in the
+        current event loop (e.g. first connection, or a new loop per test or
+        `async_to_sync` call).
+        """
+        self.connections.add(connection)
+        if (
+            self._task is None or self._task.done() or
+            self._task.get_loop() is not asyncio.get_running_loop()
+        ):
+            self._task = asyncio.ensure_future(self.run())
+
+    def unregister(self, connection):
+        self.connections.discard(connection)
+
+    async def run(self):
+        while self.connections:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.revalidate()
+            except Exception:
+                # Keep revalidating the other connections on later runs
+                logger.exception("Websocket revalidation failed")
+
+    async def revalidate(self):
+        """
+        Closes the connections whose owner has been revoked.
+        """
+        connections = [c for c in self.connections if not c.closed]
+        invalid = []
+        if connections:
+            active = await sync_to_async(get_active_owners)(connections)
+            invalid = [
+                c for c in connections if (c.model, c.pk) not in active
+            ]
+        for connection in invalid:
+            self.unregister(connection)
+            try:
+                await connection.close()
+            except Exception:
+                logger.exception("Failed to close a websocket connection")
+
+
+revalidator = Revalidator()
+
+
+class PasetoWebsocketAuthMiddleware(object):
+    """
+    ASGI middleware authenticating websocket connections with an access
+    token. It populates `scope['user']` and `scope['auth']`, and closes the
+    connection when the user is deactivated or the app token locked.
+    """
+
+    def __init__(self, inner, revalidator=revalidator):
+        self.inner = inner
+        self.revalidator = revalidator
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'websocket':
+            return await self.inner(scope, receive, send)
+
+        user, access_token = AnonymousUser(), None
+        token = get_scope_token(scope)
+        if token is not None:
+            access_token = AccessToken(token=token)
+            if access_token.is_valid():
+                user = await sync_to_async(get_user)(access_token)
+            else:
+                access_token = None
+
+        scope = dict(scope, user=user, auth=access_token)
+        if not user.is_authenticated:
+            return await self.inner(scope, receive, send)
+
+        connection = Connection(access_token, send)
+        self.revalidator.register(connection)
+        try:
+            return await self.inner(scope, receive, send)
+        finally:
+            self.revalidator.unregister(connection)
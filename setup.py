@@ -15,10 +15,10 @@ setup(
   license='MIT',
   packages=find_packages(exclude=['tests*']),
   include_package_data=True,
-  python_requires=">=3.6",
+  python_requires=">=3.7",
   install_requires=[
-        'Django>=2',
-        'djangorestframework>=3.8',
+        'Django>=3.2',
+        'djangorestframework>=3.12',
         'paseto>=0.0.5',
     ],
   classifiers=[
@@ -26,8 +26,13 @@ setup(
     'Intended Audience :: Developers',
     'Environment :: Web Environment',
     'Operating System :: OS Independent',
-    'Programming Language :: Python :: 3.6',
-    'Framework :: Django :: 2.0',
+    'Programming Language :: Python :: 3.7',
+    'Programming Language :: Python :: 3.8',
+    'Programming Language :: Python :: 3.9',
+    'Programming Language :: Python :: 3.10',
+    'Programming Language :: Python :: 3.11',
+    'Framework :: Django :: 3.2',
+    'Framework :: Django :: 4.2',
     'License :: OSI Approved :: MIT License',
     'Topic :: Internet :: WWW/HTTP',
   ],
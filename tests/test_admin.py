@@ -0,0 +1,130 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth.models import Permission, User
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils import timezone
+
+from paseto_auth import tokens
+from paseto_auth.admin import EstimatedCountPaginator, ExpiryListFilter
+from paseto_auth.models import UserRefreshToken, AppRefreshToken
+
+
+class AdminTestCase(TestCase):
+    """
+    Tests for the refresh token admin.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="qwerty"
+        )
+        now = timezone.now()
+        UserRefreshToken.objects.create(
+            key="abc1", user=self.user, expires_at=now - timedelta(hours=1)
+        )
+        UserRefreshToken.objects.create(
+            key="abc2", user=self.user, expires_at=now + timedelta(hours=1)
+        )
+        UserRefreshToken.objects.create(
+            key="xyz1", user=self.user, expires_at=now + timedelta(days=3),
+            locked=True,
+        )
+        UserRefreshToken.objects.create(key="xyz2", user=self.user)
+        self.model_admin = admin.site._registry[UserRefreshToken]
+        self.request = RequestFactory().get('/admin/')
+        self.request.user = self.user
+
+    def filter_expiry(self, value):
+        expiry_filter = ExpiryListFilter(
+            self.request, {'expiry': value}, UserRefreshToken,
+            self.model_admin,
+        )
+        queryset = expiry_filter.queryset(
+            self.request, UserRefreshToken.objects.all()
+        )
+        return sorted(queryset.values_list('key', flat=True))
+
+    def test_expiry_filter(self):
+        """
+        Test tokens are filtered by expiry buckets.
+        """
+        self.assertEqual(self.filter_expiry('expired'), ['abc1'])
+        self.assertEqual(self.filter_expiry('day'), ['abc2'])
+        self.assertEqual(self.filter_expiry('week'), ['abc2', 'xyz1'])
+        self.assertEqual(self.filter_expiry('active'), ['abc2', 'xyz1'])
+        self.assertEqual(self.filter_expiry('never'), ['xyz2'])
+
+    def test_key_prefix_search(self):
+        """
+        Test tokens are searched by key prefix.
+        """
+        queryset, use_distinct = self.model_admin.get_search_results(
+            self.request, UserRefreshToken.objects.all(), ' ABC '
+        )
+        self.assertFalse(use_distinct)
+        self.assertEqual(
+            sorted(queryset.values_list('key', flat=True)), ['abc1', 'abc2']
+        )
+
+    def test_lock_actions(self):
+        """
+        Test tokens are locked/unlocked with a single update.
+        """
+        queryset = UserRefreshToken.objects.filter(key__startswith='abc')
+        with mock.patch.object(self.model_admin, 'message_user'):
+            with self.assertNumQueries(1):
+                self.model_admin.lock_tokens(self.request, queryset)
+            self.assertEqual(queryset.filter(locked=True).count(), 2)
+            with self.assertNumQueries(1):
+                self.model_admin.unlock_tokens(
+                    self.request, UserRefreshToken.objects.all()
+                )
+        self.assertFalse(UserRefreshToken.objects.filter(locked=True).exists())
+
+    def test_lock_actions_permissions(self):
+        """
+        Test view-only staff users can't lock/unlock tokens.
+        """
+        staff = User.objects.create_user(username="staff", is_staff=True)
+        staff.user_permissions.add(
+            Permission.objects.get(codename='view_userrefreshtoken')
+        )
+        request = RequestFactory().get('/admin/')
+        request.user = staff
+        actions = self.model_admin.get_actions(request)
+        self.assertNotIn('lock_tokens', actions)
+        self.assertNotIn('unlock_tokens', actions)
+        actions = self.model_admin.get_actions(self.request)
+        self.assertIn('lock_tokens', actions)
+        self.assertIn('unlock_tokens', actions)
+
+    def test_paginator_count(self):
+        """
+        Test the paginator counts at most `count_limit` rows.
+        """
+        paginator = EstimatedCountPaginator(
+            UserRefreshToken.objects.order_by('key'), 2
+        )
+        self.assertEqual(paginator.count, 4)
+        paginator = EstimatedCountPaginator(
+            UserRefreshToken.objects.filter(locked=False).order_by('key'), 2
+        )
+        paginator.count_limit = 2
+        self.assertEqual(paginator.count, 2)
+        self.assertEqual(paginator.num_pages, 1)
+
+    def test_app_token_owner_prefetch(self):
+        """
+        Test app token owners are prefetched in a single query.
+        """
+        for i in range(3):
+            owner = User.objects.create_user(username="owner{}".format(i))
+            tokens.create_app_token(owner=owner)
+        model_admin = admin.site._registry[AppRefreshToken]
+        queryset = model_admin.get_queryset(self.request)
+        with self.assertNumQueries(2):
+            owners = [str(obj.owner) for obj in queryset]
+        self.assertEqual(len(owners), 3)
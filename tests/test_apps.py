@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from paseto_auth.checks import check_crypto_backend, check_session_limits
+from paseto_auth import crypto
+from paseto_auth.settings import AUTH_SETTINGS
+
+CHECK_IMPORTS = """
+import sys
+import django
+django.setup()
+import paseto_auth.authentication
+print('paseto' in sys.modules)
+"""
+
+
+class AppConfigTestCase(SimpleTestCase):
+    """
+    Tests for the application configuration and lazy imports.
+    """
+
+    def check_imports(self, **user_settings):
+        tests_dir = os.path.dirname(os.path.abspath(__file__))
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='settings',
+            PYTHONPATH=os.pathsep.join(
+                [os.path.dirname(tests_dir), tests_dir]
+            ),
+        )
+        code = 'import settings\nsettings.PASETO_AUTH = {!r}\n'.format(
+            user_settings
+        ) + CHECK_IMPORTS
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], env=env, universal_newlines=True
+        )
+        return output.strip() == 'True'
+
+    def test_app_config(self):
+        """
+        Test the application configuration is installed.
+        """
+        config = apps.get_app_config('paseto_auth')
+        self.assertEqual(config.name, 'paseto_auth')
+        self.assertIn('paseto_auth', settings.INSTALLED_APPS)
+
+    def test_lazy_imports(self):
+        """
+        Test paseto is only imported on first use unless warmed.
+        """
+        self.assertFalse(self.check_imports())
+        self.assertTrue(self.check_imports(WARM_IMPORTS=True))
+
+    def test_session_limits_check(self):
+        """
+        Test session limits are rejected with stores not supporting them.
+        """
+        for store, errors in (
+            ('paseto_auth.stores.ORMTokenStore', []),
+            ('paseto_auth.stores.InMemoryTokenStore', ['paseto_auth.E001']),
+        ):
+            with mock.patch.dict(AUTH_SETTINGS, {
+                'TOKEN_STORE': store,
+                'TOKEN_STORE_OPTIONS': {},
+                'MAX_SESSIONS_PER_USER': 5,
+            }):
+                self.assertEqual(
+                    [error.id for error in check_session_limits(None)], errors
+                )
+        with mock.patch.dict(AUTH_SETTINGS, {
+            'TOKEN_STORE': 'paseto_auth.stores.InMemoryTokenStore',
+            'TOKEN_STORE_OPTIONS': {},
+        }):
+            self.assertEqual(check_session_limits(None), [])
+
+    def test_crypto_backend_check(self):
+        """
+        Test crypto backends not supporting the token version are rejected.
+        """
+        for backend, version, errors in (
+            (None, 'v2', []),
+            (None, 'v4', []),
+            ('paseto_auth.crypto.PasetoBackend', 'v2', []),
+            ('paseto_auth.crypto.PasetoBackend', 'v4', ['paseto_auth.E002']),
+        ):
+            with mock.patch.dict(AUTH_SETTINGS, {
+                'CRYPTO_BACKEND': backend, 'PASETO_VERSION': version,
+            }):
+                self.assertEqual(
+                    [error.id for error in check_crypto_backend(None)], errors
+                )
+        with mock.patch.dict(AUTH_SETTINGS, {'PASETO_VERSION': 'v4'}):
+            with mock.patch.object(
+                crypto, 'BACKENDS', ['paseto_auth.crypto.PasetoBackend']
+            ):
+                self.assertEqual(
+                    [error.id for error in check_crypto_backend(None)],
+                    ['paseto_auth.E002'],
+                )
@@ -0,0 +1,252 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase
+from django.test.client import RequestFactory
+
+from rest_framework.exceptions import AuthenticationFailed
+
+from paseto_auth import audit, tokens
+from paseto_auth.authentication import PasetoAuthentication
+from paseto_auth.models import AuthEvent
+from paseto_auth.serializers import (
+    GetTokenPairSerializer,
+    RefreshTokenSerializer,
+)
+from paseto_auth.settings import AUTH_SETTINGS
+
+
+class AuditLogTestCase(TestCase):
+    """
+    Tests for the audit log buffer.
+    """
+
+    def test_flush(self):
+        """
+        Test buffered events are written in batches.
+        """
+        log = audit.AuditLog(interval=None, batch_size=2)
+        log.record(audit.LOGIN, 'user', 13, '127.0.0.1')
+        log.record(audit.AUTH_FAILED)
+        log.record(audit.APP_TOKEN_USE, 'app', 'qwerty')
+        self.assertEqual(AuthEvent.objects.count(), 0)
+        with self.assertNumQueries(2):
+            self.assertEqual(log.flush(), 3)
+        self.assertEqual(log.flush(), 0)
+        event = AuthEvent.objects.get(event=audit.LOGIN)
+        self.assertEqual(
+            (event.model, event.subject, event.ip),
+            ('user', '13', '127.0.0.1'),
+        )
+        self.assertEqual((log.recorded, log.flushed), (3, 3))
+
+    def test_drop_newest(self):
+        """
+        Test events recorded with a full buffer are dropped.
+        """
+        log = audit.AuditLog(size=2, interval=None)
+        for subject in range(3):
+            log.record(audit.LOGIN, 'user', subject)
+        log.flush()
+        self.assertEqual(log.dropped, 1)
+        self.assertEqual(
+            set(AuthEvent.objects.values_list('subject', flat=True)),
+            {'0', '1'},
+        )
+
+    def test_drop_oldest(self):
+        """
+        Test the oldest events are dropped with the 'drop_oldest' policy.
+        """
+        log = audit.AuditLog(
+            size=2, interval=None, overflow=audit.DROP_OLDEST
+        )
+        for subject in range(3):
+            log.record(audit.LOGIN, 'user', subject)
+        log.flush()
+        self.assertEqual(log.dropped, 1)
+        self.assertEqual(
+            set(AuthEvent.objects.values_list('subject', flat=True)),
+            {'1', '2'},
+        )
+
+    def test_failed_flush(self):
+        """
+        Test failed writes are counted and don't raise.
+        """
+        log = audit.AuditLog(interval=None)
+        log.record(audit.LOGIN, 'user', 13)
+        with mock.patch(
+            'django.db.models.query.QuerySet.bulk_create',
+            side_effect=DatabaseError,
+        ), self.assertLogs('paseto_auth.audit'):
+            self.assertEqual(log.flush(), 0)
+        self.assertEqual(log.failed, 1)
+
+
+class AuditThreadTestCase(TransactionTestCase):
+    """
+    Tests for the audit log flush thread.
+    """
+
+    def test_background_flush(self):
+        """
+        Test events are written by the flush thread, and on stop.
+        """
+        log = audit.AuditLog(interval=60, batch_size=2)
+        log.record(audit.LOGIN, 'user', 1)
+        self.assertTrue(log._thread.is_alive())
+        log.record(audit.LOGIN, 'user', 2)
+        for i in range(100):
+            if log.flushed:
+                break
+            log._thread.join(0.05)
+        self.assertEqual(log.flushed, 2)
+        log.record(audit.LOGIN, 'user', 3)
+        log.stop()
+        self.assertFalse(log._thread)
+        self.assertEqual(AuthEvent.objects.count(), 3)
+
+
+class AuditHooksTestCase(TestCase):
+    """
+    Tests for the events recorded by the authentication entry points.
+    """
+    user_credentials = {
+        'username': 'testuser',
+        'password': 'qwerty'
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(**self.user_credentials)
+        self.log = audit.AuditLog(interval=None)
+        patchers = [
+            mock.patch.dict(AUTH_SETTINGS, {'AUDIT_LOG': True}),
+            mock.patch.object(audit, '_audit_log', self.log),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.request = RequestFactory().post('/')
+
+    def get_events(self):
+        self.log.flush()
+        return list(AuthEvent.objects.order_by('id').values_list(
+            'event', 'model', 'subject', 'ip'
+        ))
+
+    def login(self, **credentials):
+        serializer = GetTokenPairSerializer(
+            data=credentials, context={'request': self.request}
+        )
+        try:
+            serializer.is_valid()
+        except AuthenticationFailed:
+            return None
+        return serializer.validated_data
+
+    def test_login(self):
+        """
+        Test successful and failed logins are recorded.
+        """
+        self.login(**self.user_credentials)
+        self.login(username='testuser', password='wrong')
+        self.assertEqual(self.get_events(), [
+            (audit.LOGIN, 'user', str(self.user.pk), '127.0.0.1'),
+            (audit.LOGIN_FAILED, 'user', 'testuser', '127.0.0.1'),
+        ])
+
+    def test_malformed_input(self):
+        """
+        Test malformed IPs are discarded and long usernames truncated, so
+        they don't fail the write of other events.
+        """
+        self.request = RequestFactory().post(
+            '/', HTTP_X_FORWARDED_FOR='not-an-ip, 10.0.0.1'
+        )
+        self.login(username='x' * 1000, password='wrong')
+        self.request = RequestFactory().post(
+            '/', HTTP_X_FORWARDED_FOR=' 10.0.0.2 , 10.0.0.1'
+        )
+        self.login(**self.user_credentials)
+        self.assertEqual(self.get_events(), [
+            (audit.LOGIN_FAILED, 'user', 'x' * audit.SUBJECT_MAX_LENGTH,
+             None),
+            (audit.LOGIN, 'user', str(self.user.pk), '10.0.0.2'),
+        ])
+        self.assertEqual(self.log.failed, 0)
+
+    def test_refresh(self):
+        """
+        Test successful and failed refreshes are recorded.
+        """
+        refresh_token = self.login(**self.user_credentials)['refresh_token']
+        parsed = tokens.RefreshToken(token=refresh_token)
+        parsed.is_valid()
+        serializer = RefreshTokenSerializer(
+            data={'refresh_token': refresh_token},
+            context={'request': self.request},
+        )
+        self.assertTrue(serializer.is_valid())
+        serializer = RefreshTokenSerializer(
+            data={'refresh_token': 'qwerty'},
+            context={'request': self.request},
+        )
+        with self.assertRaises(AuthenticationFailed):
+            serializer.is_valid()
+        self.assertEqual(self.get_events()[1:], [
+            (audit.REFRESH, 'user', parsed.data['key'], '127.0.0.1'),
+            (audit.REFRESH_FAILED, '', '', '127.0.0.1'),
+        ])
+
+    def test_coalesced_refresh(self):
+        """
+        Test coalesced refreshes are recorded.
+        """
+        app_token, refresh_token = tokens.create_app_token()
+        with mock.patch.dict(AUTH_SETTINGS, {
+            'REFRESH_COALESCING': True, 'REFRESH_COALESCING_WINDOW': 60,
+        }):
+            for i in range(2):
+                serializer = RefreshTokenSerializer(
+                    data={'refresh_token': refresh_token}
+                )
+                self.assertTrue(serializer.is_valid())
+        self.assertEqual(
+            self.get_events(),
+            [(audit.REFRESH, 'app', app_token.key, None)] * 2,
+        )
+
+    def test_authentication(self):
+        """
+        Test failed authentications and app token uses are recorded.
+        """
+        app_token, refresh_token = tokens.create_app_token()
+        for data in (
+            {'model': 'user', 'pk': self.user.pk},
+            {'model': 'app', 'pk': app_token.key},
+        ):
+            request = RequestFactory().get(
+                '/', HTTP_AUTHORIZATION='Paseto {}'.format(
+                    tokens.AccessToken(data=data)
+                ),
+            )
+            PasetoAuthentication().authenticate(request)
+        request = RequestFactory().get(
+            '/', HTTP_AUTHORIZATION='Paseto qwerty'
+        )
+        with self.assertRaises(AuthenticationFailed):
+            PasetoAuthentication().authenticate(request)
+        self.assertEqual(self.get_events(), [
+            (audit.APP_TOKEN_USE, 'app', app_token.key, '127.0.0.1'),
+            (audit.AUTH_FAILED, '', '', '127.0.0.1'),
+        ])
+
+    def test_disabled(self):
+        """
+        Test nothing is recorded unless `AUDIT_LOG` is enabled.
+        """
+        with mock.patch.dict(AUTH_SETTINGS, {'AUDIT_LOG': False}):
+            self.login(**self.user_credentials)
+        self.assertEqual(self.log.recorded, 0)
@@ -0,0 +1,100 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache as default_cache
+from django.test import SimpleTestCase
+
+from paseto_auth import cache, clock, tokens
+from paseto_auth.settings import AUTH_SETTINGS
+
+
+@mock.patch.dict(AUTH_SETTINGS, {'VERIFICATION_CACHE': 'default'})
+class VerificationCacheTestCase(SimpleTestCase):
+    """
+    Tests for the access token verification cache.
+    """
+    data = {
+        'model': 'user',
+        'pk': 13,
+    }
+
+    def setUp(self):
+        default_cache.clear()
+        cache.local_cache.clear()
+        cache.local_cache.max_size = 2
+        self.addCleanup(setattr, cache.local_cache, 'max_size', 0)
+        self.token = str(tokens.AccessToken(data=self.data))
+
+    def verify(self, token):
+        access_token = tokens.AccessToken(token=token)
+        with mock.patch.object(
+            tokens.AccessToken, '_parse_token',
+            side_effect=tokens.AccessToken._parse_token, autospec=True,
+        ) as parse:
+            is_valid = access_token.is_valid()
+        return is_valid, parse.called, access_token
+
+    def test_cache_hit(self):
+        """
+        Test verified claims are retrieved from the cache.
+        """
+        is_valid, parsed, access_token = self.verify(self.token)
+        self.assertTrue(is_valid)
+        self.assertTrue(parsed)
+        is_valid, parsed, access_token = self.verify(self.token)
+        self.assertTrue(is_valid)
+        self.assertFalse(parsed)
+        self.assertEqual(access_token.data['pk'], self.data['pk'])
+        self.assertEqual(access_token.data['type'], tokens.ACCESS)
+
+    def test_shared_cache(self):
+        """
+        Test verified claims are shared through the Django cache.
+        """
+        self.verify(self.token)
+        cache.local_cache.clear()
+        is_valid, parsed, access_token = self.verify(self.token)
+        self.assertTrue(is_valid)
+        self.assertFalse(parsed)
+        self.assertIsNotNone(
+            cache.local_cache.get(cache.get_cache_key(self.token))
+        )
+
+    def test_cache_expiration(self):
+        """
+        Test cached claims expire with the token.
+        """
+        self.verify(self.token)
+        with clock.freeze(time.time() + AUTH_SETTINGS['ACCESS_LIFETIME']):
+            is_valid, parsed, access_token = self.verify(self.token)
+        self.assertFalse(is_valid)
+        self.assertTrue(parsed)
+
+    def test_invalid_token_not_cached(self):
+        """
+        Test invalid tokens are not cached.
+        """
+        self.verify('qwerty')
+        is_valid, parsed, access_token = self.verify('qwerty')
+        self.assertFalse(is_valid)
+        self.assertTrue(parsed)
+
+    def test_local_cache_size(self):
+        """
+        Test the local cache evicts the least recently used entries.
+        """
+        local_cache = cache.LocalCache(max_size=2)
+        expires_at = time.time() + 60
+        for key in ('a', 'b', 'c'):
+            local_cache.set(key, key, expires_at)
+        self.assertIsNone(local_cache.get('a'))
+        self.assertEqual(local_cache.get('b'), 'b')
+        self.assertEqual(local_cache.get('c'), 'c')
+
+    def test_cache_key(self):
+        """
+        Test cache keys don't contain the token.
+        """
+        key = cache.get_cache_key(self.token)
+        self.assertNotIn(self.token, key)
+        self.assertEqual(key, cache.get_cache_key(self.token))
@@ -0,0 +1,95 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from paseto_auth import clock, tokens
+from paseto_auth.settings import AUTH_SETTINGS
+
+
+class ClockTestCase(SimpleTestCase):
+    """
+    Tests for the token layer time source.
+    """
+    data = {
+        'model': 'user',
+        'pk': 13,
+    }
+
+    def test_freeze(self):
+        """
+        Test the clock can be frozen at a given timestamp.
+        """
+        with clock.freeze(1000):
+            self.assertEqual(clock.timestamp(), 1000)
+            self.assertEqual(clock.utcnow().timestamp(), 1000)
+        self.assertGreater(clock.timestamp(), 1000)
+
+    def test_scope(self):
+        """
+        Test the current time is cached inside a scope.
+        """
+        source = mock.Mock(side_effect=[10, 20, 30])
+        clock.set_source(source)
+        try:
+            with clock.scope():
+                self.assertEqual(clock.timestamp(), 10)
+                with clock.scope():
+                    self.assertEqual(clock.timestamp(), 10)
+                self.assertEqual(clock.timestamp(), 10)
+            self.assertEqual(clock.timestamp(), 20)
+        finally:
+            clock.set_source(None)
+        self.assertEqual(source.call_count, 2)
+
+    @override_settings(USE_TZ=True)
+    def test_now_aware(self):
+        """
+        Test the database time is aware if USE_TZ is enabled.
+        """
+        self.assertTrue(timezone.is_aware(clock.now()))
+
+    @override_settings(USE_TZ=False)
+    def test_now_naive(self):
+        """
+        Test the database time is naive if USE_TZ is disabled.
+        """
+        self.assertTrue(timezone.is_naive(clock.now()))
+
+    def test_to_timestamp(self):
+        """
+        Test expiration claims are converted to epoch timestamps.
+        """
+        self.assertEqual(clock.to_timestamp(1000), 1000)
+        self.assertEqual(clock.to_timestamp(None), None)
+        self.assertEqual(
+            clock.to_timestamp('1970-01-01T00:16:40+00:00'), 1000
+        )
+        self.assertEqual(clock.to_timestamp('1970-01-01T00:16:40'), 1000)
+        with self.assertRaises(ValueError):
+            clock.to_timestamp('qwerty')
+
+    def test_token_expiration(self):
+        """
+        Test token expiration is checked against the clock with leeway.
+        """
+        now = time.time()
+        for claims_format in (tokens.VERBOSE, tokens.COMPACT):
+            with mock.patch.dict(AUTH_SETTINGS, {
+                'CLAIMS_FORMAT': claims_format, 'LEEWAY': 30,
+            }):
+                with clock.freeze(now):
+                    token = str(tokens.AccessToken(data=self.data))
+                expired_at = now + AUTH_SETTINGS['ACCESS_LIFETIME'] + 1
+                with clock.freeze(expired_at):
+                    self.assertTrue(tokens.AccessToken(token=token).is_valid())
+                with clock.freeze(expired_at + 30):
+                    access_token = tokens.AccessToken(token=token)
+                    self.assertFalse(access_token.is_valid())
+            access_token = tokens.AccessToken(token=token)
+            self.assertTrue(access_token.is_valid())
+            self.assertEqual(
+                int(access_token.get_expiration()),
+                int(now) + AUTH_SETTINGS['ACCESS_LIFETIME'],
+            )
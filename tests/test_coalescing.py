@@ -0,0 +1,188 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.test.client import RequestFactory
+
+from rest_framework.exceptions import AuthenticationFailed
+
+from paseto_auth import clock, coalescing
+from paseto_auth.serializers import (
+    GetTokenPairSerializer,
+    RefreshTokenSerializer,
+)
+from paseto_auth.settings import AUTH_SETTINGS
+
+from .utils import QueryBudgetMixin
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    """
+    Tests for the single-flight call coalescing.
+    """
+
+    def setUp(self):
+        self.flight = coalescing.SingleFlight()
+        self.calls = 0
+
+    def slow_call(self):
+        self.calls += 1
+        time.sleep(0.1)
+        return self.calls
+
+    def run_concurrently(self, func, count=5):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(func()))
+            for i in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_calls(self):
+        """
+        Test concurrent calls with the same key share a single call.
+        """
+        results = self.run_concurrently(
+            lambda: self.flight.do('key', self.slow_call)
+        )
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(self.flight.do('key', self.slow_call), 2)
+
+    def test_window(self):
+        """
+        Test results are shared for the window duration.
+        """
+        with clock.freeze(1000):
+            self.assertEqual(self.flight.do('key', self.slow_call, 2), 1)
+            self.assertEqual(self.flight.do('key', self.slow_call, 2), 1)
+            self.assertEqual(self.flight.do('other', self.slow_call, 2), 2)
+        with clock.freeze(1002):
+            self.assertEqual(self.flight.do('key', self.slow_call, 2), 3)
+
+    def test_errors(self):
+        """
+        Test errors are shared with waiting calls but not remembered.
+        """
+        def fail():
+            time.sleep(0.1)
+            self.calls += 1
+            raise ValueError()
+
+        def call():
+            try:
+                self.flight.do('key', fail, 10)
+            except ValueError as error:
+                return error
+
+        errors = self.run_concurrently(call)
+        self.assertEqual(len(set(map(id, errors))), 1)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.do('key', self.slow_call, 10), 2)
+
+    def test_timeout(self):
+        """
+        Test waiting calls run on their own when the call in flight hangs.
+        """
+        self.flight.timeout = 0.05
+        release = threading.Event()
+        leader = threading.Thread(
+            target=self.flight.do, args=('key', release.wait)
+        )
+        leader.start()
+        self.addCleanup(leader.join)
+        self.addCleanup(release.set)
+        while 'key' not in self.flight._calls:
+            time.sleep(0.01)
+        self.assertEqual(self.flight.do('key', lambda: 'local'), 'local')
+
+    def test_purge(self):
+        """
+        Test expired calls are purged when the size limit is reached.
+        """
+        self.flight.max_size = 2
+        with clock.freeze(1000):
+            self.flight.do('a', self.slow_call, 1)
+            self.flight.do('b', self.slow_call, 5)
+        with clock.freeze(1002):
+            self.flight.do('c', self.slow_call, 1)
+        self.assertEqual(set(self.flight._calls), {'b', 'c'})
+
+    @mock.patch.dict(AUTH_SETTINGS, {'REFRESH_COALESCING_CACHE': 'default'})
+    def test_cross_process_lock(self):
+        """
+        Test a call waits for the result of the process holding the lock.
+        """
+        cache.clear()
+        lock_key = coalescing.get_cache_key(
+            'key', coalescing.CACHE_KEY_PREFIX
+        ) + ':lock'
+        cache.add(lock_key, 1)
+
+        def other_process():
+            time.sleep(0.1)
+            cache.set(lock_key[:-len(':lock')], 'shared', 5)
+            cache.delete(lock_key)
+
+        thread = threading.Thread(target=other_process)
+        thread.start()
+        result = coalescing.share_across_processes('key', self.slow_call, 5)
+        thread.join()
+        self.assertEqual(result, 'shared')
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(
+            coalescing.share_across_processes('other', self.slow_call, 5), 1
+        )
+
+
+@mock.patch.dict(AUTH_SETTINGS, {
+    'REFRESH_COALESCING': True,
+    'REFRESH_COALESCING_WINDOW': 5,
+})
+class RefreshCoalescingTestCase(QueryBudgetMixin, TestCase):
+    """
+    Tests for the refresh serializer coalescing.
+    """
+    user_credentials = {
+        'username': 'testuser',
+        'password': 'qwerty'
+    }
+
+    def setUp(self):
+        User.objects.create_user(**self.user_credentials)
+        serializer = GetTokenPairSerializer(
+            data=self.user_credentials,
+            context={'request': RequestFactory().post('/api/auth/token/')},
+        )
+        serializer.is_valid()
+        self.refresh_token = serializer.validated_data['refresh_token']
+        self.addCleanup(coalescing.refresh_flight._calls.clear)
+
+    def refresh(self, refresh_token):
+        serializer = RefreshTokenSerializer(
+            data={'refresh_token': refresh_token}
+        )
+        serializer.is_valid()
+        return serializer.validated_data['access_token']
+
+    def test_shared_access_token(self):
+        """
+        Test refreshes within the window share the access token.
+        """
+        with self.assertQueryBudget(1):
+            access_token = self.refresh(self.refresh_token)
+            self.assertEqual(self.refresh(self.refresh_token), access_token)
+
+    def test_invalid_token(self):
+        """
+        Test invalid refresh tokens are rejected every time.
+        """
+        for i in range(2):
+            with self.assertRaises(AuthenticationFailed):
+                self.refresh('qwerty')
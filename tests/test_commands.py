@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import Group, Permission, User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from paseto_auth import clock, tokens
+from paseto_auth.settings import AUTH_SETTINGS
+from paseto_auth.stores import get_token_store
+
+from .utils import QueryBudgetMixin
+
+
+class DecodeTokensTestCase(QueryBudgetMixin, TestCase):
+    """
+    Tests for the decode_tokens management command.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+        self.app_token, app_refresh_token = tokens.create_app_token(
+            name="Test app"
+        )
+        self.user_key = get_token_store().generate_key('user')
+        get_token_store().create_token(
+            'user', key=self.user_key, user=self.user
+        )
+        with clock.freeze(clock.timestamp() - 3600):
+            expired = tokens.AccessToken(
+                data={'model': 'user', 'pk': self.user.pk}
+            )
+        self.lines = [
+            str(tokens.AccessToken(
+                data={'model': 'user', 'pk': self.user.pk}
+            )),
+            'Paseto {}'.format(tokens.AccessToken(
+                data={'model': 'app', 'pk': self.app_token.key}
+            )),
+            '',
+            str(expired),
+            app_refresh_token,
+            str(tokens.RefreshToken(data={
+                'model': 'user', 'key': self.user_key, 'lifetime': 'short',
+            })),
+            'qwerty',
+        ]
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as stream:
+            stream.write('\n'.join(self.lines))
+        self.addCleanup(os.remove, self.path)
+
+    def decode(self, **options):
+        out = io.StringIO()
+        call_command(
+            'decode_tokens', self.path, stdout=out, chunk_size=2, **options
+        )
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_decode(self):
+        """
+        Test tokens are decoded and classified in input order.
+        """
+        results = self.decode(workers=0)
+        self.assertEqual(
+            [result['line'] for result in results], [1, 2, 4, 5, 6, 7]
+        )
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['valid', 'valid', 'expired', 'valid', 'valid', 'invalid'],
+        )
+        self.assertEqual(
+            {key: results[0][key] for key in ('type', 'model', 'pk')},
+            {'type': 'access', 'model': 'user', 'pk': self.user.pk},
+        )
+        self.assertEqual(results[3]['key'], self.app_token.key)
+        self.assertNotIn('owner', results[0])
+
+    def test_decode_workers(self):
+        """
+        Test worker processes give the same results.
+        """
+        self.assertEqual(self.decode(workers=2), self.decode(workers=0))
+
+    def test_resolve_owners(self):
+        """
+        Test owners are resolved with a query per owner type and chunk.
+        """
+        with self.assertQueryBudget(6):
+            results = self.decode(workers=0, resolve_owners=True)
+        self.assertEqual(
+            [result.get('owner') for result in results],
+            ['testuser', 'Test app', 'testuser', 'Test app', 'testuser',
+             None],
+        )
+        get_token_store().lock_token('user', self.user_key)
+        results = self.decode(workers=0, resolve_owners=True)
+        self.assertIsNone(results[4]['owner'])
+
+
+class ExportTokensTestCase(QueryBudgetMixin, TestCase):
+    """
+    Tests for the export_tokens management command.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+        self.group = Group.objects.create(name="Test group")
+        self.perms = list(Permission.objects.order_by('pk')[:2])
+        self.user.groups.add(self.group)
+        self.user.user_permissions.add(*self.perms)
+        store = get_token_store()
+        for i in range(3):
+            store.create_token(
+                'user', key=store.generate_key('user'), user=self.user,
+                ip='127.0.0.1',
+            )
+        for i in range(5):
+            tokens.create_app_token(
+                name="App {}".format(i), owner=self.user,
+                groups=[self.group], perms=self.perms,
+            )
+
+    def export(self, *args, **options):
+        out = io.StringIO()
+        call_command('export_tokens', *args, stdout=out, **options)
+        return out.getvalue()
+
+    def get_perm_names(self):
+        return sorted(
+            '{}.{}'.format(perm.content_type.app_label, perm.codename)
+            for perm in self.perms
+        )
+
+    def test_export_user_tokens(self):
+        """
+        Test user tokens are exported as JSON lines ordered by key, with a
+        fixed number of queries per chunk.
+        """
+        # Chunks of 2 tokens: 2 chunks with token, group and permission
+        # queries
+        with self.assertQueryBudget(6):
+            output = self.export('user', chunk_size=2)
+        rows = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(
+            [row['key'] for row in rows], sorted(row['key'] for row in rows)
+        )
+        self.assertEqual(
+            {key: rows[0][key] for key in ('user_id', 'username', 'ip')},
+            {'user_id': self.user.pk, 'username': 'testuser',
+             'ip': '127.0.0.1'},
+        )
+        self.assertEqual(rows[0]['groups'], ['Test group'])
+        self.assertEqual(rows[0]['permissions'], self.get_perm_names())
+
+    def test_export_app_tokens(self):
+        """
+        Test app tokens are exported as CSV with a fixed number of queries
+        per chunk.
+        """
+        # Chunks of 2 tokens: 3 chunks with token, owner, group and
+        # permission queries
+        with self.assertQueryBudget(12):
+            output = self.export('app', export_format='csv', chunk_size=2)
+        rows = list(csv.DictReader(io.StringIO(output)))
+        self.assertEqual(len(rows), 5)
+        perm_names = self.get_perm_names()
+        self.assertEqual(
+            {key: rows[0][key] for key in (
+                'owner_type', 'owner', 'groups', 'permissions', 'locked'
+            )},
+            {'owner_type': 'auth.user', 'owner': 'testuser',
+             'groups': 'Test group', 'permissions': ','.join(perm_names),
+             'locked': 'False'},
+        )
+
+    def test_csv_formulas(self):
+        """
+        Test CSV values starting with formula characters are escaped.
+        """
+        tokens.create_app_token(name='=HYPERLINK("http://example.com")')
+        tokens.create_app_token(name='-2+3')
+        output = self.export('app', export_format='csv')
+        names = {row['name'] for row in csv.DictReader(io.StringIO(output))}
+        self.assertIn('\'=HYPERLINK("http://example.com")', names)
+        self.assertIn("'-2+3", names)
+        self.assertIn('App 0', names)
+        rows = [json.loads(line) for line in self.export('app').splitlines()]
+        self.assertIn('-2+3', {row['name'] for row in rows})
+
+    def test_sharded_export(self):
+        """
+        Test the tokens of every shard are exported.
+        """
+        with mock.patch.dict(AUTH_SETTINGS, {
+            'TOKEN_STORE': 'paseto_auth.stores.ShardedTokenStore',
+            'TOKEN_STORE_OPTIONS': {'databases': ['default', 'replica']},
+        }):
+            keys = {
+                tokens.create_app_token(name=str(i))[0].key for i in range(6)
+            }
+            shards = {get_token_store().get_database(key) for key in keys}
+            self.assertEqual(shards, {'default', 'replica'})
+            rows = [
+                json.loads(line) for line in self.export('app').splitlines()
+            ]
+        self.assertTrue(keys.issubset(row['key'] for row in rows))
+        self.assertEqual(len(rows), 11)
+
+    def test_cache_store_export(self):
+        """
+        Test exporting tokens not stored in the database is rejected.
+        """
+        with mock.patch.dict(AUTH_SETTINGS, {
+            'TOKEN_STORE': 'paseto_auth.stores.InMemoryTokenStore',
+            'TOKEN_STORE_OPTIONS': {},
+        }):
+            with self.assertRaises(CommandError):
+                self.export('user')
+            self.assertEqual(len(self.export('app').splitlines()), 5)
@@ -0,0 +1,190 @@
+import io
+import unittest
+from unittest import mock
+
+import paseto
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+
+from paseto_auth import crypto, tokens
+from paseto_auth.settings import AUTH_SETTINGS
+
+
+# Official PASETO test vectors: (key, random nonce bytes, message, footer,
+# token)
+NULL_KEY = bytes(32)
+FULL_KEY = bytes.fromhex(
+    '707172737475767778797a7b7c7d7e7f808182838485868788898a8b8c8d8e8f'
+)
+V2_VECTORS = [
+    (NULL_KEY, bytes(24), b'', b'',
+     b'v2.local.driRNhM20GQPvlWfJCepzh6HdijAq-yNUtKpdy5KXjKfpSKrOlqQvQ'),
+    (FULL_KEY, bytes(24), b'', b'',
+     b'v2.local.driRNhM20GQPvlWfJCepzh6HdijAq-yNkIWACdHuLiJiW16f2GuGYA'),
+    (FULL_KEY, bytes(24), b'', b'Cuon Alpinus',
+     b'v2.local.driRNhM20GQPvlWfJCepzh6HdijAq-yNreCcZAS0iGVlzdHjTf2ilg'
+     b'.Q3VvbiBBbHBpbnVz'),
+    (FULL_KEY, bytes(24), b'Love is stronger than hate or fear', b'',
+     b'v2.local.BEsKs5AolRYDb_O-bO-lwHWUextpShFSXlvv8MsrNZs3vTSnGQG4qRM9ezDl'
+     b'880jFwknSA6JARj2qKhDHnlSHx1GSCizfcF019U'),
+]
+V4_VECTORS = [
+    (FULL_KEY, bytes(32),
+     b'{"data":"this is a secret message",'
+     b'"exp":"2022-01-01T00:00:00+00:00"}', b'',
+     b'v4.local.AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAQAr68PS4AXe7If_Zge'
+     b'sdkUMvSwscFlAl1pk5HC0e8kApeaqMfGo_7OpBnwJOAbY9V7WU6abu74MmcUE8YWAia'
+     b'ArVI8XJ5hOb_4v9RmDkneN0S92dx0OW4pgy7omxgf3S8c3LlQg'),
+]
+
+
+class CryptoBackendTestCase(unittest.TestCase):
+    """
+    Tests for the crypto backends.
+    """
+    key = bytes.fromhex(AUTH_SETTINGS['SECRET_KEY'])
+    message = b'{"type": "access", "pk": 13}'
+
+    def get_backends(self):
+        return [
+            crypto.load_backend(path)
+            for path in crypto.get_available_backends()
+        ]
+
+    def test_v2_interoperability(self):
+        """
+        Test v2 tokens are interchangeable with the paseto package.
+        """
+        for backend in self.get_backends():
+            token = backend.encrypt(self.message, self.key, footer=b'kid')
+            parsed = paseto.PasetoV2.decrypt(token, self.key)
+            self.assertEqual(parsed['message'], self.message)
+            self.assertEqual(parsed['footer'], b'kid')
+            token = paseto.PasetoV2.encrypt(self.message, self.key, b'kid')
+            self.assertEqual(
+                backend.decrypt(token, self.key), (self.message, b'kid')
+            )
+
+    def assertVectors(self, vectors, encrypt, decrypt):
+        for key, random, message, footer, token in vectors:
+            self.assertEqual(
+                encrypt(message, key, footer, random=random), token
+            )
+            self.assertEqual(decrypt(token, key), (message, footer))
+
+    def test_sodium_vectors(self):
+        """
+        Test the sodium backend against the v2.local and v4.local vectors.
+        """
+        backend = crypto.load_backend('paseto_auth.crypto.SodiumBackend')
+        self.assertVectors(
+            V2_VECTORS, backend.encrypt_v2, backend.decrypt_v2
+        )
+        self.assertVectors(
+            V4_VECTORS, backend.encrypt_v4, backend.decrypt_v4
+        )
+
+    @unittest.skipUnless(
+        crypto.NaClBackend.is_available(), "PyNaCl isn't installed"
+    )
+    def test_nacl_vectors(self):
+        """
+        Test the nacl backend against the v2.local vectors.
+        """
+        backend = crypto.load_backend('paseto_auth.crypto.NaClBackend')
+        self.assertVectors(
+            V2_VECTORS, backend.encrypt_v2, backend.decrypt_v2
+        )
+
+    def test_version_keys(self):
+        """
+        Test v4 tokens are encrypted with a key derived from the v2 one.
+        """
+        backend = crypto.load_backend('paseto_auth.crypto.SodiumBackend')
+        token = backend.encrypt(self.message, self.key, crypto.V4_LOCAL)
+        with self.assertRaises(crypto.CryptoError):
+            backend.decrypt_v4(token, self.key)
+        v4_key = crypto.get_version_key(self.key, crypto.V4_LOCAL)
+        self.assertNotEqual(v4_key, self.key)
+        self.assertEqual(
+            backend.decrypt_v4(token, v4_key), (self.message, b'')
+        )
+        self.assertEqual(
+            crypto.get_version_key(self.key, crypto.V2_LOCAL), self.key
+        )
+
+    def test_v4_roundtrip(self):
+        """
+        Test v4 tokens are encrypted and decrypted.
+        """
+        backend = crypto.load_backend('paseto_auth.crypto.SodiumBackend')
+        token = backend.encrypt(self.message, self.key, crypto.V4_LOCAL)
+        self.assertTrue(token.startswith(crypto.V4_LOCAL))
+        self.assertEqual(backend.decrypt(token, self.key), (self.message, b''))
+
+    def test_tampered_token(self):
+        """
+        Test exception raised decrypting tampered tokens or with a wrong key.
+        """
+        backend = crypto.load_backend('paseto_auth.crypto.SodiumBackend')
+        for header in backend.versions:
+            token = backend.encrypt(self.message, self.key, header)
+            tampered = token[:-2] + (b'AA' if token[-2:] != b'AA' else b'BB')
+            with self.assertRaises(crypto.CryptoError):
+                backend.decrypt(tampered, self.key)
+            with self.assertRaises(crypto.CryptoError):
+                backend.decrypt(token, bytes(32))
+
+    def test_unsupported_version(self):
+        """
+        Test exception raised for versions not supported by the backend.
+        """
+        backend = crypto.load_backend('paseto_auth.crypto.PasetoBackend')
+        with self.assertRaises(crypto.CryptoError):
+            backend.encrypt(self.message, self.key, crypto.V4_LOCAL)
+        with self.assertRaises(crypto.CryptoError):
+            backend.decrypt(b'v1.local.qwerty', self.key)
+
+    def test_backend_versions(self):
+        """
+        Test the default backend is the first one supporting the version of
+        new tokens.
+        """
+        with mock.patch.object(crypto, 'BACKENDS', [
+            'paseto_auth.crypto.PasetoBackend',
+            'paseto_auth.crypto.SodiumBackend',
+        ]), mock.patch.dict(crypto._backends, clear=True):
+            for version, name in (('v2', 'paseto'), ('v4', 'sodium')):
+                with mock.patch.dict(AUTH_SETTINGS, {
+                    'CRYPTO_BACKEND': None, 'PASETO_VERSION': version,
+                }):
+                    self.assertEqual(crypto.get_backend().name, name)
+        with mock.patch.object(crypto, 'BACKENDS', [
+            'paseto_auth.crypto.PasetoBackend',
+        ]), mock.patch.dict(crypto._backends, clear=True):
+            with mock.patch.dict(AUTH_SETTINGS, {
+                'CRYPTO_BACKEND': None, 'PASETO_VERSION': 'v4',
+            }):
+                with self.assertRaises(ImproperlyConfigured):
+                    crypto.get_backend()
+
+    def test_v4_tokens(self):
+        """
+        Test access tokens with the v4 version are created, and parsed
+        whatever the version of new tokens.
+        """
+        with mock.patch.dict(AUTH_SETTINGS, {'PASETO_VERSION': 'v4'}):
+            token = tokens.AccessToken(data={'model': 'user', 'pk': 13})
+            self.assertTrue(str(token).startswith('v4.local.'))
+        parsed = tokens.AccessToken(token=str(token))
+        self.assertTrue(parsed.is_valid())
+        self.assertEqual(parsed.data['pk'], 13)
+
+    def test_benchmark_command(self):
+        """
+        Test the benchmark command reports the fastest backend.
+        """
+        out = io.StringIO()
+        call_command('benchmark_crypto', iterations=10, stdout=out)
+        self.assertIn("v2 fastest", out.getvalue())
+        self.assertIn("v4 fastest", out.getvalue())
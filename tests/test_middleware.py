@@ -0,0 +1,270 @@
+import asyncio
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from paseto_auth import clock, tokens
+from paseto_auth.authentication import PasetoAuthentication
+from paseto_auth.middleware import (
+    PasetoAuthMiddleware,
+    PasetoRenewalMiddleware,
+)
+from paseto_auth.serializers import (
+    GetTokenPairSerializer,
+    RefreshTokenSerializer,
+)
+from paseto_auth.settings import AUTH_SETTINGS
+from paseto_auth.stores import get_token_store
+
+
+class MiddlewareTestCase(TestCase):
+    """
+    Tests for the authentication middleware.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser")
+        self.access_token = tokens.AccessToken(
+            data={'model': 'user', 'pk': self.user.pk}
+        )
+
+    def fake_request(self, headers={}):
+        factory = RequestFactory()
+        request = factory.get('/view/', **headers)
+        return request
+
+    def auth_request(self, token=None):
+        auth_header = 'Paseto {}'.format(token or self.access_token)
+        return self.fake_request({'HTTP_AUTHORIZATION': auth_header})
+
+    def get_response(self, request):
+        return HttpResponse()
+
+    def test_authenticate(self):
+        """
+        Test the middleware sets the lazy user and the access token.
+        """
+        request = self.auth_request()
+        with self.assertNumQueries(0):
+            PasetoAuthMiddleware(self.get_response)(request)
+        self.assertEqual(request.auth.data['pk'], self.user.pk)
+        self.assertEqual(request.user.pk, self.user.pk)
+
+    def test_no_authorization_header(self):
+        """
+        Test requests without authentication header are left untouched.
+        """
+        request = self.fake_request({'HTTP_AUTHORIZATION': 'Basic qwerty'})
+        PasetoAuthMiddleware(self.get_response)(request)
+        self.assertFalse(hasattr(request, 'user'))
+        self.assertFalse(hasattr(request, 'auth'))
+        self.assertIsNone(PasetoAuthentication().authenticate(request))
+
+    def test_invalid_access_token(self):
+        """
+        Test invalid access token is rejected by the DRF authentication.
+        """
+        request = self.auth_request(token='zxcvb')
+        PasetoAuthMiddleware(self.get_response)(request)
+        self.assertFalse(hasattr(request, 'user'))
+        with self.assertRaises(AuthenticationFailed):
+            PasetoAuthentication().authenticate(Request(request))
+
+    def test_reuse_verified_token(self):
+        """
+        Test the DRF authentication reuses the middleware result.
+        """
+        request = self.auth_request()
+        PasetoAuthMiddleware(self.get_response)(request)
+        with mock.patch.object(tokens.AccessToken, 'is_valid') as is_valid:
+            user, token = PasetoAuthentication().authenticate(
+                Request(request)
+            )
+        self.assertFalse(is_valid.called)
+        self.assertIs(token, request.auth)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_async_authenticate(self):
+        """
+        Test the middleware in async mode.
+        """
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = PasetoAuthMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        request = self.auth_request()
+        response = asyncio.run(middleware(request))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request.auth.data['pk'], self.user.pk)
+
+
+class RenewalTestCase(TestCase):
+    """
+    Tests for the sliding access token renewal.
+    """
+    user_credentials = {
+        'username': 'testuser',
+        'password': 'qwerty'
+    }
+
+    def setUp(self):
+        patcher = mock.patch.dict(AUTH_SETTINGS, {'ACCESS_RENEWAL_WINDOW': 60})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(**self.user_credentials)
+        serializer = GetTokenPairSerializer(
+            data=self.user_credentials,
+            context={'request': RequestFactory().post('/api/auth/token/')},
+        )
+        self.assertTrue(serializer.is_valid())
+        self.token_pair = serializer.validated_data
+        self.access_token = tokens.AccessToken(
+            token=self.token_pair['access_token']
+        )
+        self.assertTrue(self.access_token.is_valid())
+
+    def get_response(self, request):
+        PasetoAuthentication().authenticate(Request(request))
+        return HttpResponse()
+
+    def request(self, token, timestamp):
+        auth_header = 'Paseto {}'.format(token)
+        request = RequestFactory().get(
+            '/view/', HTTP_AUTHORIZATION=auth_header
+        )
+        with clock.freeze(timestamp):
+            return PasetoRenewalMiddleware(self.get_response)(request)
+
+    def test_renewal_window(self):
+        """
+        Test access tokens are renewed within the renewal window only.
+        """
+        exp = self.access_token.get_expiration()
+        header = AUTH_SETTINGS['RENEWAL_HEADER']
+        with self.assertNumQueries(0):
+            response = self.request(self.access_token, exp - 61)
+        self.assertFalse(response.has_header(header))
+        # The user and the refresh token state are checked
+        with self.assertNumQueries(2):
+            response = self.request(self.access_token, exp - 30)
+        renewed_token = tokens.AccessToken(token=response[header])
+        with clock.freeze(exp - 30):
+            self.assertTrue(renewed_token.is_valid())
+        self.assertEqual(renewed_token.data['pk'], self.user.pk)
+        self.assertEqual(
+            renewed_token.data['key'], self.access_token.data['key']
+        )
+        self.assertEqual(
+            renewed_token.data['renew_until'],
+            self.access_token.data['renew_until'],
+        )
+        self.assertGreater(renewed_token.get_expiration(), exp)
+
+    def test_renewal_limit(self):
+        """
+        Test access tokens aren't renewed past the refresh token expiration.
+        """
+        renew_until = clock.to_timestamp(
+            self.access_token.data['renew_until']
+        )
+        with clock.freeze(renew_until - AUTH_SETTINGS['ACCESS_LIFETIME']):
+            access_token = tokens.AccessToken(data={
+                'model': 'user', 'pk': self.user.pk,
+                'key': self.access_token.data['key'],
+                'renew_until': self.access_token.data['renew_until'],
+            })
+        exp = access_token.get_expiration()
+        response = self.request(access_token, exp - 30)
+        self.assertFalse(response.has_header(AUTH_SETTINGS['RENEWAL_HEADER']))
+
+    def test_refreshed_token(self):
+        """
+        Test refreshed access tokens carry the refresh token expiration.
+        """
+        serializer = RefreshTokenSerializer(
+            data={'refresh_token': self.token_pair['refresh_token']}
+        )
+        self.assertTrue(serializer.is_valid())
+        access_token = tokens.AccessToken(
+            token=serializer.validated_data['access_token']
+        )
+        self.assertTrue(access_token.is_valid())
+        self.assertEqual(
+            access_token.data['renew_until'],
+            self.access_token.data['renew_until'],
+        )
+
+    def test_disabled(self):
+        """
+        Test tokens aren't renewed without the renewal window setting.
+        """
+        exp = self.access_token.get_expiration()
+        with mock.patch.dict(AUTH_SETTINGS, {'ACCESS_RENEWAL_WINDOW': 0}):
+            response = self.request(self.access_token, exp - 30)
+        self.assertFalse(response.has_header(AUTH_SETTINGS['RENEWAL_HEADER']))
+
+    def test_inactive_user(self):
+        """
+        Test access tokens of inactive users aren't renewed.
+        """
+        self.user.is_active = False
+        self.user.save()
+        exp = self.access_token.get_expiration()
+        response = self.request(self.access_token, exp - 30)
+        self.assertFalse(response.has_header(AUTH_SETTINGS['RENEWAL_HEADER']))
+
+    def test_revoked_refresh_token(self):
+        """
+        Test access tokens aren't renewed once their refresh token is
+        locked.
+        """
+        get_token_store().lock_token('user', self.access_token.data['key'])
+        exp = self.access_token.get_expiration()
+        response = self.request(self.access_token, exp - 30)
+        self.assertFalse(response.has_header(AUTH_SETTINGS['RENEWAL_HEADER']))
+
+    def test_locked_app_token(self):
+        """
+        Test access tokens of locked app tokens aren't renewed.
+        """
+        app_token, refresh_token = tokens.create_app_token()
+        serializer = RefreshTokenSerializer(
+            data={'refresh_token': refresh_token}
+        )
+        self.assertTrue(serializer.is_valid())
+        access_token = tokens.AccessToken(
+            token=serializer.validated_data['access_token']
+        )
+        self.assertTrue(access_token.is_valid())
+        exp = access_token.get_expiration()
+        header = AUTH_SETTINGS['RENEWAL_HEADER']
+        self.assertTrue(
+            self.request(access_token, exp - 30).has_header(header)
+        )
+        get_token_store().lock_token('app', app_token.key)
+        self.assertFalse(
+            self.request(access_token, exp - 30).has_header(header)
+        )
+
+    def test_without_middleware(self):
+        """
+        Test nothing is minted without the renewal middleware.
+        """
+        exp = self.access_token.get_expiration()
+        request = RequestFactory().get(
+            '/view/', HTTP_AUTHORIZATION='Paseto {}'.format(self.access_token)
+        )
+        with mock.patch(
+            'paseto_auth.authentication.AccessToken', wraps=tokens.AccessToken
+        ) as access_token_class, self.assertNumQueries(0):
+            with clock.freeze(exp - 30):
+                self.get_response(request)
+        # Only the received token is parsed
+        self.assertEqual(access_token_class.call_count, 1)
@@ -0,0 +1,64 @@
+import importlib
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class UserAgentMigrationTestCase(TransactionTestCase):
+    """
+    Tests for the user agent backfill migration.
+    """
+    migrate_from = [('paseto_auth', '0008_user_token_device')]
+    migrate_to = [('paseto_auth', '0009_user_agents')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+        latest = MigrationExecutor(connection).loader.graph.leaf_nodes()
+        apps = self.migrate(self.migrate_from)
+        self.addCleanup(self.migrate, latest)
+        UserRefreshToken = apps.get_model('paseto_auth', 'UserRefreshToken')
+        AppRefreshToken = apps.get_model('paseto_auth', 'AppRefreshToken')
+        for i, user_agent in enumerate(['curl/8.0', '', 'curl/8.0']):
+            UserRefreshToken.objects.create(
+                key='user{}'.format(i), user_id=self.user.pk,
+                user_agent=user_agent,
+            )
+        AppRefreshToken.objects.create(key='app', user_agent='Wget/1.21')
+
+    def test_backfill(self):
+        """
+        Test the user agent strings are moved to the lookup table.
+        """
+        migration = importlib.import_module(
+            'paseto_auth.migrations.0009_user_agents'
+        )
+        with mock.patch.object(migration, 'CHUNK_SIZE', 2):
+            apps = self.migrate(self.migrate_to)
+        UserAgent = apps.get_model('paseto_auth', 'UserAgent')
+        UserRefreshToken = apps.get_model('paseto_auth', 'UserRefreshToken')
+        AppRefreshToken = apps.get_model('paseto_auth', 'AppRefreshToken')
+        agents = dict(UserAgent.objects.values_list('value', 'id'))
+        self.assertEqual(set(agents), {'curl/8.0', 'Wget/1.21'})
+        self.assertEqual(
+            dict(UserRefreshToken.objects.values_list('key', 'agent_id')),
+            {'user0': agents['curl/8.0'], 'user1': None,
+             'user2': agents['curl/8.0']},
+        )
+        self.assertEqual(
+            AppRefreshToken.objects.get().agent_id, agents['Wget/1.21']
+        )
+
+        apps = self.migrate(self.migrate_from)
+        UserRefreshToken = apps.get_model('paseto_auth', 'UserRefreshToken')
+        self.assertEqual(
+            UserRefreshToken.objects.get(key='user2').user_agent, 'curl/8.0'
+        )
@@ -0,0 +1,172 @@
+import os
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User, Group, Permission
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from paseto_auth import tokens
+from paseto_auth.authentication import PasetoAuthentication
+from paseto_auth.serializers import (
+    GetTokenPairSerializer,
+    RefreshTokenSerializer,
+)
+
+from .utils import QueryBudgetMixin
+
+# Performance contract of the public entry points: number of queries, peak
+# traced memory in bytes and mean wall-clock time in seconds per call. Time
+# budgets depend on the machine load, so they're only checked with the
+# PASETO_AUTH_TIME_BUDGETS environment variable set, e.g. on a dedicated
+# benchmark machine. Login time is dominated by password hashing, and
+# has_perms includes the app token fetch and any number of checks.
+CHECK_TIME = bool(os.environ.get('PASETO_AUTH_TIME_BUDGETS'))
+
+BUDGETS = {
+    'authenticate_user': {'queries': 1, 'memory': 32 * 1024, 'time': 0.01},
+    'authenticate_app': {'queries': 1, 'memory': 32 * 1024, 'time': 0.01},
+    'has_perms': {'queries': 3, 'memory': 64 * 1024, 'time': 0.02},
+    'login': {
+        'queries': GetTokenPairSerializer.query_budget,
+        'memory': 64 * 1024,
+        'time': 2,
+    },
+    'refresh': {'queries': 1, 'memory': 48 * 1024, 'time': 0.01},
+    'create_app_token': {'queries': 4, 'memory': 48 * 1024, 'time': 0.05},
+}
+
+
+class PerformanceTestCase(QueryBudgetMixin, TestCase):
+    """
+    Query, memory and time budgets for the public entry points.
+    """
+    user_credentials = {
+        'username': 'testuser',
+        'password': 'qwerty'
+    }
+    repeat = 5
+
+    def setUp(self):
+        self.user = User.objects.create_user(**self.user_credentials)
+        self.group = Group.objects.create(name="Test group")
+        self.perms = list(Permission.objects.all()[:10])
+        self.group.permissions.add(*self.perms[5:])
+        self.app_token, self.app_refresh_token = tokens.create_app_token(
+            groups=[self.group], perms=self.perms[:5],
+        )
+
+    def assertBudget(self, name, func):
+        """
+        Asserts the query, memory and (if enabled) time budgets of a
+        callable.
+        """
+        budget = BUDGETS[name]
+        with self.assertQueryBudget(budget['queries']):
+            func()
+
+        tracemalloc.start()
+        try:
+            func()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLessEqual(
+            peak, budget['memory'],
+            '{} allocated {} bytes'.format(name, peak),
+        )
+        if not CHECK_TIME:
+            return
+
+        start = time.perf_counter()
+        for i in range(self.repeat):
+            func()
+        elapsed = (time.perf_counter() - start) / self.repeat
+        self.assertLessEqual(
+            elapsed, budget['time'],
+            '{} took {:.4f} seconds'.format(name, elapsed),
+        )
+
+    def authenticate(self, access_token):
+        auth_header = 'Paseto {}'.format(access_token)
+        request = RequestFactory().get(
+            '/api/view/', HTTP_AUTHORIZATION=auth_header
+        )
+        user, token = PasetoAuthentication().authenticate(request)
+        return user
+
+    def test_authenticate_user(self):
+        """
+        Test user authentication budget.
+        """
+        access_token = str(tokens.AccessToken(
+            data={'model': 'user', 'pk': self.user.pk}
+        ))
+        self.assertBudget(
+            'authenticate_user',
+            lambda: self.authenticate(access_token).is_authenticated,
+        )
+
+    def test_authenticate_app(self):
+        """
+        Test app authentication budget.
+        """
+        access_token = str(tokens.AccessToken(
+            data={'model': 'app', 'pk': self.app_token.key}
+        ))
+        self.assertBudget(
+            'authenticate_app',
+            lambda: self.authenticate(access_token).is_authenticated,
+        )
+
+    def test_has_perms(self):
+        """
+        Test app permission checks budget.
+        """
+        access_token = str(tokens.AccessToken(
+            data={'model': 'app', 'pk': self.app_token.key}
+        ))
+        perm_names = [
+            '{}.{}'.format(perm.content_type.app_label, perm.codename)
+            for perm in self.perms
+        ]
+
+        def has_perms():
+            user = self.authenticate(access_token)
+            self.assertTrue(user.has_perms(perm_names))
+            self.assertTrue(all(user.has_perm(perm) for perm in perm_names))
+
+        self.assertBudget('has_perms', has_perms)
+
+    def test_login(self):
+        """
+        Test login budget.
+        """
+        def login():
+            serializer = GetTokenPairSerializer(
+                data=self.user_credentials,
+                context={'request': RequestFactory().post('/')},
+            )
+            self.assertTrue(serializer.is_valid())
+
+        self.assertBudget('login', login)
+
+    def test_refresh(self):
+        """
+        Test refresh budget.
+        """
+        def refresh():
+            serializer = RefreshTokenSerializer(
+                data={'refresh_token': self.app_refresh_token}
+            )
+            self.assertTrue(serializer.is_valid())
+
+        self.assertBudget('refresh', refresh)
+
+    def test_create_app_token(self):
+        """
+        Test app token creation budget.
+        """
+        self.assertBudget('create_app_token', lambda: tokens.create_app_token(
+            groups=[self.group], perms=self.perms[:5],
+        ))
@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+
+from rest_framework.exceptions import AuthenticationFailed
+
+from paseto_auth.models import UserRefreshToken
+from paseto_auth.routers import TokenRouter
+from paseto_auth.serializers import (
+    GetTokenPairSerializer,
+    RefreshTokenSerializer,
+)
+from paseto_auth.settings import AUTH_SETTINGS
+
+
+@override_settings(DATABASE_ROUTERS=['paseto_auth.routers.TokenRouter'])
+@mock.patch.dict(AUTH_SETTINGS, {'READ_DATABASE': 'replica'})
+class TokenRouterTestCase(TestCase):
+    """
+    Tests for the token database router.
+    """
+    databases = {'default', 'replica'}
+    user_credentials = {
+        'username': 'testuser',
+        'password': 'qwerty'
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(**self.user_credentials)
+        User.objects.using('replica').create(
+            pk=self.user.pk, username=self.user.username
+        )
+
+    def get_refresh_token(self):
+        serializer = GetTokenPairSerializer(
+            data=self.user_credentials,
+            context={'request': RequestFactory().post('/api/auth/token/')},
+        )
+        self.assertTrue(serializer.is_valid())
+        return serializer.claims['key'], serializer.validated_data
+
+    def test_router(self):
+        """
+        Test token reads and writes are routed to the primary.
+        """
+        router = TokenRouter()
+        self.assertEqual(router.db_for_read(UserRefreshToken), 'default')
+        self.assertEqual(router.db_for_write(UserRefreshToken), 'default')
+        self.assertIsNone(router.db_for_read(User))
+        self.assertIsNone(router.db_for_write(User))
+
+    def test_issuance_writes_primary(self):
+        """
+        Test token state is stored in the primary database.
+        """
+        key, tokens = self.get_refresh_token()
+        self.assertTrue(
+            UserRefreshToken.objects.using('default').filter(key=key).exists()
+        )
+        self.assertFalse(
+            UserRefreshToken.objects.using('replica').filter(key=key).exists()
+        )
+
+    def test_validation_reads_replica(self):
+        """
+        Test refresh token validation reads from the replica.
+        """
+        key, tokens = self.get_refresh_token()
+        UserRefreshToken.objects.using('replica').create(
+            key=key, user_id=self.user.pk, locked=True
+        )
+        serializer = RefreshTokenSerializer(
+            data={'refresh_token': tokens['refresh_token']}
+        )
+        with self.assertRaises(AuthenticationFailed):
+            serializer.is_valid()
+
+    def test_admin_reads_primary(self):
+        """
+        Test token reads outside validation don't use the replica.
+        """
+        key, tokens = self.get_refresh_token()
+        UserRefreshToken.objects.using('replica').create(
+            key=key, user_id=self.user.pk, locked=True
+        )
+        self.assertFalse(UserRefreshToken.objects.get(key=key).locked)
+
+    def test_read_your_writes_fallback(self):
+        """
+        Test tokens missing from the replica are read from the primary.
+        """
+        key, tokens = self.get_refresh_token()
+        serializer = RefreshTokenSerializer(
+            data={'refresh_token': tokens['refresh_token']}
+        )
+        self.assertTrue(serializer.is_valid())
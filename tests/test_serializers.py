@@ -1,21 +1,26 @@
 from datetime import timedelta
+from unittest import mock
 
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.signals import user_login_failed
 from django.test import TestCase
 from django.test.client import RequestFactory
 
 import paseto
 from rest_framework.exceptions import AuthenticationFailed
 
-from paseto_auth.models import UserRefreshToken
+from paseto_auth import clock, tokens
+from paseto_auth.models import UserAgent, UserRefreshToken
 from paseto_auth.serializers import (
     GetTokenPairSerializer,
     RefreshTokenSerializer,
 )
 from paseto_auth.settings import AUTH_SETTINGS
 
+from .utils import QueryBudgetMixin
 
-class SerializerTestCase(TestCase):
+
+class SerializerTestCase(QueryBudgetMixin, TestCase):
     """
     Tests for token serializers.
     """
@@ -43,6 +48,23 @@ class SerializerTestCase(TestCase):
         with self.assertRaises(AuthenticationFailed):
             serializer.is_valid(raise_exception=True)
 
+    def test_failed_login_writes(self):
+        """
+        Test the writes of failed login receivers aren't rolled back.
+        """
+        def receiver(**kwargs):
+            Group.objects.create(name='failed login')
+
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+        serializer = GetTokenPairSerializer(data={
+            'username': 'testuser',
+            'password': '1234',
+        })
+        with self.assertRaises(AuthenticationFailed):
+            serializer.is_valid(raise_exception=True)
+        self.assertTrue(Group.objects.filter(name='failed login').exists())
+
     def test_get_user_ip(self):
         """
         Test get user IP from request.
@@ -150,3 +172,108 @@ class SerializerTestCase(TestCase):
             token=bytes(str(access_token), 'utf-8'),
         )
         self.assertTrue(parsed['message']['type'], 'access')
+
+    def test_login_query_budget(self):
+        """
+        Test a successful login stays within the query budget.
+        """
+        serializer = GetTokenPairSerializer(
+            data=self.user_credentials,
+            context={'request': self.fake_request()},
+        )
+        with self.assertQueryBudget(serializer.query_budget):
+            self.assertTrue(serializer.is_valid())
+
+    @mock.patch.dict(AUTH_SETTINGS, {'UPDATE_LAST_LOGIN': True})
+    def test_login_update_last_login(self):
+        """
+        Test last_login is updated in the login transaction if enabled.
+        """
+        serializer = GetTokenPairSerializer(
+            data=self.user_credentials,
+            context={'request': self.fake_request()},
+        )
+        with self.assertQueryBudget(serializer.query_budget + 1):
+            self.assertTrue(serializer.is_valid())
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+
+class DeviceReuseTestCase(QueryBudgetMixin, TestCase):
+    """
+    Tests for the reuse of device tokens on repeat logins.
+    """
+    user_credentials = {
+        'username': 'testuser',
+        'password': 'qwerty'
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(**self.user_credentials)
+        patcher = mock.patch.dict(AUTH_SETTINGS, {'DEVICE_REUSE_WINDOW': 300})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Known user agents are resolved from the process cache
+        UserAgent.objects.clear_cache()
+        self.addCleanup(UserAgent.objects.clear_cache)
+        with self.captureOnCommitCallbacks(execute=True):
+            for user_agent in ('Mozilla/5.0 (X11; Linux)', 'curl/8.0'):
+                UserAgent.objects.get_id(user_agent)
+
+    def login(self, budget=None, remember=False, **headers):
+        headers.setdefault('HTTP_USER_AGENT', 'Mozilla/5.0 (X11; Linux)')
+        request = RequestFactory().post('/api/auth/tokens/', **headers)
+        serializer = GetTokenPairSerializer(
+            data=dict(self.user_credentials, remember=remember),
+            context={'request': request},
+        )
+        with self.assertQueryBudget(budget or serializer.query_budget + 1):
+            self.assertTrue(serializer.is_valid())
+        refresh_token = tokens.RefreshToken(
+            token=serializer.validated_data['refresh_token']
+        )
+        self.assertTrue(refresh_token.is_valid())
+        return refresh_token
+
+    def test_reuse(self):
+        """
+        Test repeat logins from the same device reuse the token state
+        without writes, and the token expires with it.
+        """
+        first = self.login()
+        second = self.login(budget=GetTokenPairSerializer.query_budget)
+        self.assertEqual(first.data['key'], second.data['key'])
+        self.assertEqual(UserRefreshToken.objects.count(), 1)
+        state = UserRefreshToken.objects.get()
+        self.assertLessEqual(
+            clock.to_timestamp(second.data['exp']),
+            state.expires_at.timestamp(),
+        )
+        serializer = RefreshTokenSerializer(
+            data={'refresh_token': str(second)}
+        )
+        self.assertTrue(serializer.is_valid())
+
+    def test_other_devices(self):
+        """
+        Test logins from other user agents or IPs, or with another
+        lifetime, create new tokens.
+        """
+        key = self.login().data['key']
+        keys = {
+            self.login(HTTP_USER_AGENT='curl/8.0').data['key'],
+            self.login(REMOTE_ADDR='42.42.42.42').data['key'],
+            self.login(remember=True).data['key'],
+        }
+        self.assertEqual(len(keys), 3)
+        self.assertNotIn(key, keys)
+
+    def test_window(self):
+        """
+        Test tokens older than the window or locked aren't reused.
+        """
+        key = self.login().data['key']
+        with clock.freeze(clock.timestamp() + 301):
+            self.assertNotEqual(self.login().data['key'], key)
+        UserRefreshToken.objects.update(locked=True)
+        self.assertNotEqual(self.login().data['key'], key)
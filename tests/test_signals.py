@@ -0,0 +1,130 @@
+import io
+from unittest import mock
+
+from django.contrib.auth.models import Group, Permission
+from django.core.management import call_command
+from django.test import TestCase
+
+from paseto_auth import signals
+from paseto_auth.models import AppRefreshToken
+from paseto_auth.settings import AUTH_SETTINGS
+from paseto_auth.tokens import create_app_token
+
+from .utils import QueryBudgetMixin
+
+
+class EffectivePermissionsTestCase(QueryBudgetMixin, TestCase):
+    """
+    Tests for the denormalized app token permissions.
+    """
+
+    def setUp(self):
+        patcher = mock.patch.dict(
+            AUTH_SETTINGS, {'DENORMALIZE_PERMISSIONS': True}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        signals.connect()
+        self.addCleanup(signals.disconnect)
+        self.perms = list(Permission.objects.order_by('pk')[:6])
+        self.group = Group.objects.create(name="Test group")
+        self.group.permissions.add(*self.perms[:3])
+        self.app_token, refresh_token = create_app_token(
+            groups=[self.group], perms=self.perms[3:4],
+        )
+
+    def get_names(self, perms):
+        return {
+            '{}.{}'.format(perm.content_type.app_label, perm.codename)
+            for perm in perms
+        }
+
+    def get_permissions(self):
+        app_token = AppRefreshToken.objects.get(key=self.app_token.key)
+        return app_token.get_all_permissions()
+
+    def test_app_token_changes(self):
+        """
+        Test permissions are updated with the app token relations.
+        """
+        self.assertEqual(
+            self.get_permissions(), self.get_names(self.perms[:4])
+        )
+        self.app_token.user_permissions.add(self.perms[4])
+        self.app_token.groups.clear()
+        self.assertEqual(
+            self.get_permissions(), self.get_names(self.perms[3:5])
+        )
+        self.group.app_token_set.add(self.app_token)
+        self.assertEqual(
+            self.get_permissions(), self.get_names(self.perms[:5])
+        )
+
+    def test_group_changes(self):
+        """
+        Test permissions are updated with the group permissions.
+        """
+        self.group.permissions.remove(self.perms[0])
+        self.perms[5].group_set.add(self.group)
+        self.assertEqual(
+            self.get_permissions(),
+            self.get_names(self.perms[1:4] + self.perms[5:]),
+        )
+        self.perms[1].group_set.clear()
+        self.assertEqual(
+            self.get_permissions(),
+            self.get_names(self.perms[2:4] + self.perms[5:]),
+        )
+        self.group.delete()
+        self.assertEqual(
+            self.get_permissions(), self.get_names(self.perms[3:4])
+        )
+
+    def test_single_row_read(self):
+        """
+        Test permission checks don't query the relations.
+        """
+        app_token = AppRefreshToken.objects.get(key=self.app_token.key)
+        names = self.get_names(self.perms[:4])
+        with self.assertQueryBudget(0):
+            self.assertTrue(app_token.has_perms(names))
+
+    def test_update_command(self):
+        """
+        Test the command recomputes the permissions changed while the
+        signals were disconnected.
+        """
+        signals.disconnect()
+        self.group.permissions.remove(self.perms[0])
+        other_token, refresh_token = create_app_token(perms=self.perms[4:5])
+        AppRefreshToken.objects.filter(key=other_token.key).update(
+            effective_permissions=None
+        )
+        removed = self.get_names(self.perms[:1]).pop()
+        names = self.get_names(self.perms[1:4])
+        other_names = self.get_names(self.perms[4:5])
+        app_token = AppRefreshToken.objects.get(key=self.app_token.key)
+        self.assertTrue(app_token.has_perm(removed))
+        # Chunks of 1 token: key, permission queries and update per chunk,
+        # and the last empty key query
+        with self.assertQueryBudget(9):
+            call_command(
+                'update_effective_permissions', chunk_size=1,
+                stdout=io.StringIO(),
+            )
+        app_token = AppRefreshToken.objects.get(key=self.app_token.key)
+        other_token = AppRefreshToken.objects.get(key=other_token.key)
+        with self.assertQueryBudget(0):
+            self.assertFalse(app_token.has_perm(removed))
+            self.assertTrue(app_token.has_perms(names))
+            self.assertTrue(other_token.has_perms(other_names))
+
+    def test_fallback(self):
+        """
+        Test tokens without computed permissions query the relations.
+        """
+        AppRefreshToken.objects.update(effective_permissions=None)
+        app_token = AppRefreshToken.objects.get(key=self.app_token.key)
+        names = self.get_names(self.perms[:4])
+        with self.assertQueryBudget(2):
+            self.assertTrue(app_token.has_perms(names))
@@ -0,0 +1,446 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.client import RequestFactory
+
+from rest_framework.exceptions import AuthenticationFailed
+
+from paseto_auth import clock, stores, tokens
+from paseto_auth.authentication import get_user
+from paseto_auth.models import AppRefreshToken, UserAgent, UserRefreshToken
+from paseto_auth.serializers import (
+    GetTokenPairSerializer,
+    RefreshTokenSerializer,
+)
+from paseto_auth.settings import AUTH_SETTINGS
+
+from .utils import QueryBudgetMixin
+
+
+class KeyStrategyTestCase(SimpleTestCase):
+    """
+    Tests for the token key strategies.
+    """
+
+    def test_random_key(self):
+        """
+        Test random keys.
+        """
+        key = tokens.generate_random_key()
+        self.assertEqual(len(key), 32)
+        self.assertTrue(set(key).issubset(tokens.VALID_KEY_CHARS))
+
+    def test_ordered_key(self):
+        """
+        Test ordered keys sort by creation time.
+        """
+        keys = []
+        for timestamp in (999, 1000, 1600000000, 1600000000.001, 4e9):
+            with clock.freeze(timestamp):
+                keys.append(tokens.generate_ordered_key())
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+        self.assertTrue(all(len(key) == 32 for key in keys))
+
+    @mock.patch.dict(AUTH_SETTINGS, {'KEY_STRATEGY': 'ordered'})
+    def test_key_strategy_setting(self):
+        """
+        Test the store generates keys with the configured strategy.
+        """
+        with clock.freeze(1600000000):
+            key = tokens.generate_token_key('user', check_unique=False)
+            self.assertEqual(key[:9], tokens.generate_ordered_key()[:9])
+
+
+class ShardedTokenStoreTestCase(TestCase):
+    """
+    Tests for the sharded token store.
+    """
+    databases = {'default', 'replica'}
+    user_credentials = {
+        'username': 'testuser',
+        'password': 'qwerty'
+    }
+
+    def setUp(self):
+        patcher = mock.patch.dict(AUTH_SETTINGS, {
+            'TOKEN_STORE': 'paseto_auth.stores.ShardedTokenStore',
+            'TOKEN_STORE_OPTIONS': {'databases': ['default', 'replica']},
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(**self.user_credentials)
+        User.objects.using('replica').create(
+            pk=self.user.pk, username=self.user.username
+        )
+        self.store = stores.get_token_store()
+
+    def login(self):
+        serializer = GetTokenPairSerializer(
+            data=self.user_credentials,
+            context={'request': RequestFactory().post('/api/auth/token/')},
+        )
+        self.assertTrue(serializer.is_valid())
+        return serializer.claims['key'], serializer.validated_data
+
+    def test_store_setting(self):
+        """
+        Test the store is created from the settings.
+        """
+        self.assertIsInstance(self.store, stores.ShardedTokenStore)
+        self.assertIs(stores.get_token_store(), self.store)
+        with mock.patch.dict(AUTH_SETTINGS, {
+            'TOKEN_STORE': 'paseto_auth.stores.ORMTokenStore',
+            'TOKEN_STORE_OPTIONS': {},
+        }):
+            self.assertIsInstance(
+                stores.get_token_store(), stores.ORMTokenStore
+            )
+
+    def test_sharded_tokens(self):
+        """
+        Test tokens are stored in and validated against their shard.
+        """
+        shards = set()
+        for i in range(8):
+            key, token_pair = self.login()
+            database = self.store.get_database(key)
+            shards.add(database)
+            queryset = UserRefreshToken.objects.using(database)
+            self.assertTrue(queryset.filter(key=key).exists())
+            serializer = RefreshTokenSerializer(
+                data={'refresh_token': token_pair['refresh_token']}
+            )
+            self.assertTrue(serializer.is_valid())
+            self.store.lock_token('user', key)
+            self.assertTrue(queryset.get(key=key).locked)
+            serializer = RefreshTokenSerializer(
+                data={'refresh_token': token_pair['refresh_token']}
+            )
+            with self.assertRaises(AuthenticationFailed):
+                serializer.is_valid()
+        self.assertEqual(shards, {'default', 'replica'})
+
+    def test_sharded_app_tokens(self):
+        """
+        Test app tokens are retrieved from their shard.
+        """
+        for i in range(4):
+            obj, refresh_token = tokens.create_app_token(name=str(i))
+            database = self.store.get_database(obj.key)
+            self.assertTrue(
+                AppRefreshToken.objects.using(database)
+                .filter(key=obj.key).exists()
+            )
+            access_token = tokens.AccessToken(
+                data={'model': 'app', 'pk': obj.key}
+            )
+            user = get_user(access_token)
+            self.assertTrue(user.is_authenticated)
+            self.assertEqual(user.app_token._state.db, database)
+            self.store.lock_token('app', obj.key)
+            self.assertTrue(
+                AppRefreshToken.objects.using(database).get(key=obj.key).locked
+            )
+
+    def test_sharded_user_agents(self):
+        """
+        Test user agents are stored in the shard of their tokens.
+        """
+        for i in range(8):
+            key = self.store.generate_key('user')
+            self.store.create_token(
+                'user', key=key, user=self.user, user_agent='curl/8.0',
+            )
+            database = self.store.get_database(key)
+            token = UserRefreshToken.objects.using(database).get(key=key)
+            self.assertEqual(token.user_agent, 'curl/8.0')
+
+
+class CacheTokenStoreTestCase(QueryBudgetMixin, TestCase):
+    """
+    Tests for the key-value token stores.
+    """
+    store_path = 'paseto_auth.stores.CacheTokenStore'
+    user_credentials = {
+        'username': 'testuser',
+        'password': 'qwerty'
+    }
+
+    def setUp(self):
+        patcher = mock.patch.dict(AUTH_SETTINGS, {
+            'TOKEN_STORE': self.store_path,
+            'TOKEN_STORE_OPTIONS': {},
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        self.user = User.objects.create_user(**self.user_credentials)
+        self.store = stores.get_token_store()
+
+    def login(self):
+        serializer = GetTokenPairSerializer(
+            data=self.user_credentials,
+            context={'request': RequestFactory().post('/api/auth/token/')},
+        )
+        self.assertTrue(serializer.is_valid())
+        return serializer.claims['key'], serializer.validated_data
+
+    def refresh(self, refresh_token):
+        serializer = RefreshTokenSerializer(
+            data={'refresh_token': refresh_token}
+        )
+        return serializer.is_valid()
+
+    def test_user_tokens(self):
+        """
+        Test user token state is kept out of the database.
+        """
+        with self.assertQueryBudget(1):
+            key, token_pair = self.login()
+        self.assertFalse(UserRefreshToken.objects.exists())
+        token = self.store.get_token('user', key)
+        self.assertEqual(token.user, self.user)
+        self.assertIsNotNone(token.created_at)
+        with self.assertQueryBudget(0):
+            self.assertTrue(self.refresh(token_pair['refresh_token']))
+        self.store.lock_token('user', key)
+        with self.assertRaises(AuthenticationFailed):
+            self.refresh(token_pair['refresh_token'])
+
+    def test_user_agent(self):
+        """
+        Test the user agent is kept in the token state, without queries.
+        """
+        key = self.store.generate_key('user')
+        with self.assertNumQueries(0):
+            self.store.create_token(
+                'user', key=key, user_id=self.user.pk,
+                user_agent='curl/8.0',
+            )
+            token = self.store.get_token('user', key)
+            self.assertEqual(token.user_agent, 'curl/8.0')
+            found = self.store.get_tokens('user', [key])
+            self.assertEqual(found[key].user_agent, 'curl/8.0')
+        self.assertFalse(UserAgent.objects.exists())
+
+    def test_app_tokens(self):
+        """
+        Test app tokens are stored with the token model.
+        """
+        obj, refresh_token = tokens.create_app_token(name="Test")
+        self.assertTrue(AppRefreshToken.objects.filter(key=obj.key).exists())
+        self.assertTrue(self.refresh(refresh_token))
+
+    def test_timeout(self):
+        """
+        Test the token state expires with the token.
+        """
+        lifetime = AUTH_SETTINGS['REFRESH_SHORT_LIFETIME']
+        expires_at = clock.now() + timedelta(seconds=lifetime)
+        self.assertAlmostEqual(
+            self.store.get_timeout(expires_at), lifetime, delta=1
+        )
+        self.assertIsNone(self.store.get_timeout(None))
+
+
+class InMemoryTokenStoreTestCase(CacheTokenStoreTestCase):
+    """
+    Tests for the in-memory token store.
+    """
+    store_path = 'paseto_auth.stores.InMemoryTokenStore'
+
+    def test_separate_storage(self):
+        """
+        Test each in-memory store has its own storage.
+        """
+        key, token_pair = self.login()
+        self.assertTrue(self.store.exists('user', key))
+        self.assertFalse(stores.InMemoryTokenStore().exists('user', key))
+
+
+class SessionLimitTestCase(QueryBudgetMixin, TestCase):
+    """
+    Tests for the per-user session limit.
+    """
+    user_credentials = {
+        'username': 'testuser',
+        'password': 'qwerty'
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(**self.user_credentials)
+        self.store = stores.ORMTokenStore()
+
+    def create_tokens(self, count):
+        """
+        Creates user tokens from the oldest to the newest.
+        """
+        now = clock.now()
+        keys = []
+        for i in range(count):
+            token = self.store.create_token(
+                'user', key=self.store.generate_key('user'), user=self.user
+            )
+            UserRefreshToken.objects.filter(key=token.key).update(
+                created_at=now - timedelta(minutes=count - i)
+            )
+            keys.append(token.key)
+        return keys
+
+    def get_keys(self, **filters):
+        return set(UserRefreshToken.objects.filter(
+            user=self.user, **filters
+        ).values_list('key', flat=True))
+
+    def test_evict_tokens(self):
+        """
+        Test the oldest tokens are deleted with a single statement.
+        """
+        keys = self.create_tokens(5)
+        with self.assertQueryBudget(1):
+            self.assertEqual(self.store.evict_tokens(self.user, 2), 3)
+        self.assertEqual(self.get_keys(), set(keys[3:]))
+        self.assertEqual(self.store.evict_tokens(self.user, 2), 0)
+
+    def test_lock_tokens(self):
+        """
+        Test the oldest unlocked tokens are locked.
+        """
+        keys = self.create_tokens(5)
+        self.store.lock_token('user', keys[4])
+        self.assertEqual(self.store.evict_tokens(self.user, 2, lock=True), 2)
+        self.assertEqual(self.get_keys(locked=False), set(keys[2:4]))
+        self.assertEqual(len(self.get_keys()), 5)
+
+    def test_evict_same_time(self):
+        """
+        Test exactly the newest tokens are kept when created at the same
+        time.
+        """
+        keys = self.create_tokens(4)
+        UserRefreshToken.objects.filter(key__in=keys).update(
+            created_at=clock.now()
+        )
+        self.assertEqual(self.store.evict_tokens(self.user, 2), 2)
+        self.assertEqual(self.get_keys(), set(sorted(keys)[2:]))
+        features = connection.features
+        with mock.patch.object(features, 'update_can_self_select', False):
+            self.assertEqual(self.store.evict_tokens(self.user, 1), 1)
+        self.assertEqual(self.get_keys(), {max(keys)})
+
+    def test_evict_without_self_select(self):
+        """
+        Test eviction on databases that can't select from the updated table.
+        """
+        keys = self.create_tokens(3)
+        features = connection.features
+        with mock.patch.object(features, 'update_can_self_select', False):
+            self.assertEqual(self.store.evict_tokens(self.user, 5), 0)
+            self.assertEqual(self.store.evict_tokens(self.user, 1), 2)
+        self.assertEqual(self.get_keys(), {keys[2]})
+
+    def test_login_limit(self):
+        """
+        Test logins evict the sessions beyond the limit.
+        """
+        patcher = mock.patch.dict(AUTH_SETTINGS, {'MAX_SESSIONS_PER_USER': 2})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        keys = self.create_tokens(2)
+        serializer = GetTokenPairSerializer(
+            data=self.user_credentials,
+            context={'request': RequestFactory().post('/')},
+        )
+        with self.assertQueryBudget(GetTokenPairSerializer.query_budget + 1):
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(len(self.get_keys()), 2)
+        self.assertNotIn(keys[0], self.get_keys())
+
+    def test_unsupported_store(self):
+        """
+        Test stores without per-user indexes don't support the limit.
+        """
+        with self.assertRaises(NotImplementedError):
+            stores.InMemoryTokenStore().evict_tokens(self.user, 2)
+
+
+class UserAgentTestCase(QueryBudgetMixin, TestCase):
+    """
+    Tests for the user agent lookup table.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+        self.store = stores.ORMTokenStore()
+        UserAgent.objects.clear_cache()
+        self.addCleanup(UserAgent.objects.clear_cache)
+
+    def create_token(self, user_agent):
+        key = self.store.generate_key('user')
+        self.store.create_token(
+            'user', key=key, user=self.user, user_agent=user_agent
+        )
+        return UserRefreshToken.objects.get(key=key)
+
+    def test_deduplication(self):
+        """
+        Test tokens share the row of their user agent.
+        """
+        first = self.create_token('Mozilla/5.0 (X11; Linux)')
+        second = self.create_token('Mozilla/5.0 (X11; Linux)')
+        other = self.create_token('curl/8.0')
+        self.assertEqual(first.agent_id, second.agent_id)
+        self.assertNotEqual(first.agent_id, other.agent_id)
+        self.assertEqual(UserAgent.objects.count(), 2)
+        self.assertEqual(second.user_agent, 'Mozilla/5.0 (X11; Linux)')
+
+    def test_empty_user_agent(self):
+        """
+        Test tokens without user agent don't reference a row.
+        """
+        token = self.create_token('')
+        self.assertIsNone(token.agent_id)
+        self.assertEqual(token.user_agent, '')
+        self.assertFalse(UserAgent.objects.exists())
+
+    def test_cache(self):
+        """
+        Test ids are cached once committed, and then resolved without
+        queries.
+        """
+        UserAgent.objects.get_id('curl/8.0')
+        with self.assertQueryBudget(1):
+            UserAgent.objects.get_id('curl/8.0')
+        with self.captureOnCommitCallbacks(execute=True):
+            agent_id = UserAgent.objects.get_id('curl/8.0')
+        with self.assertQueryBudget(0):
+            self.assertEqual(UserAgent.objects.get_id('curl/8.0'), agent_id)
+            self.assertIsNone(UserAgent.objects.get_id(''))
+
+    def test_cache_size(self):
+        """
+        Test the least recently used ids are evicted from the cache.
+        """
+        with mock.patch.object(UserAgent.objects, 'cache_size', 2):
+            with self.captureOnCommitCallbacks(execute=True):
+                for user_agent in ('a', 'b', 'c'):
+                    UserAgent.objects.get_id(user_agent)
+            with self.assertQueryBudget(1):
+                for user_agent in ('c', 'b', 'a'):
+                    UserAgent.objects.get_id(user_agent)
+
+    def test_device_token(self):
+        """
+        Test unknown user agents have no device token.
+        """
+        token = self.create_token('curl/8.0')
+        expires_range = (clock.now(), token.expires_at or clock.now())
+        with self.assertQueryBudget(1):
+            self.assertIsNone(self.store.get_device_token(
+                self.user, 'Wget/1.21', None, expires_range
+            ))
@@ -1,4 +1,7 @@
+import time
 import unittest
+from unittest import mock
+
 import paseto
 import pendulum
 
@@ -97,3 +100,127 @@ class TokenTestCase(unittest.TestCase):
         self.assertTrue(token.is_valid())
         self.assertEqual(token.data['type'], tokens.ACCESS)
         self.assertEqual(token.data['model'], self.data['model'])
+
+    @mock.patch.dict(AUTH_SETTINGS, {'CLAIMS_FORMAT': tokens.COMPACT})
+    def test_create_compact_token(self):
+        """
+        Test that tokens are created using the compact claims profile.
+        """
+        token = tokens.AccessToken(data=self.data)
+        parsed = paseto.parse(
+            key=bytes.fromhex(AUTH_SETTINGS['SECRET_KEY']),
+            purpose='local',
+            token=bytes(str(token), 'utf-8'),
+        )
+        self.assertEqual(parsed['message']['v'], tokens.COMPACT_VERSION)
+        self.assertEqual(parsed['message']['t'], 0)
+        self.assertEqual(parsed['message']['m'], 0)
+        self.assertEqual(parsed['message']['p'], self.data['pk'])
+        self.assertIsInstance(parsed['message']['e'], int)
+        with mock.patch.dict(AUTH_SETTINGS, {'CLAIMS_FORMAT': tokens.VERBOSE}):
+            verbose_token = tokens.AccessToken(data=self.data)
+        self.assertLess(len(str(token)), len(str(verbose_token)))
+
+    @mock.patch.dict(AUTH_SETTINGS, {'CLAIMS_FORMAT': tokens.COMPACT})
+    def test_parse_compact_token(self):
+        """
+        Test compact and verbose tokens are parsed side by side.
+        """
+        token = tokens.RefreshToken(data=self.data)
+        token = tokens.RefreshToken(token=str(token))
+        self.assertTrue(token.is_valid())
+        self.assertEqual(token.data['type'], tokens.REFRESH)
+        self.assertEqual(token.data['model'], self.data['model'])
+        self.assertEqual(token.data['key'], self.data['key'])
+        with mock.patch.dict(AUTH_SETTINGS, {'CLAIMS_FORMAT': tokens.VERBOSE}):
+            verbose_token = tokens.RefreshToken(data=self.data)
+        verbose_token = tokens.RefreshToken(token=str(verbose_token))
+        self.assertTrue(verbose_token.is_valid())
+        self.assertEqual(verbose_token.data['key'], self.data['key'])
+
+    def test_parse_expired_compact_token(self):
+        """
+        Test expired compact token.
+        """
+        claims = tokens.encode_claims(
+            {'type': tokens.ACCESS, 'model': 'user', 'pk': 13},
+            int(time.time()) - 10,
+        )
+        token = paseto.create(
+            key=bytes.fromhex(AUTH_SETTINGS['SECRET_KEY']),
+            purpose='local',
+            claims=claims,
+        )
+        access_token = tokens.AccessToken(token=token.decode())
+        self.assertFalse(access_token.is_valid())
+
+    def test_parse_compact_token_without_expiration(self):
+        """
+        Test compact tokens without expiration claim are rejected.
+        """
+        claims = tokens.encode_claims(
+            {'type': tokens.ACCESS, 'model': 'user', 'pk': 13},
+            int(time.time()) + 60,
+        )
+        del claims['e']
+        for extra_claims in ({}, {'e': '2100-01-01T00:00:00'}):
+            claims.update(extra_claims)
+            token = paseto.create(
+                key=bytes.fromhex(AUTH_SETTINGS['SECRET_KEY']),
+                purpose='local',
+                claims=claims,
+            )
+            with self.assertRaises(paseto.PasetoValidationError):
+                tokens.decode_token(token.decode())
+            access_token = tokens.AccessToken(token=token.decode())
+            self.assertFalse(access_token.is_valid())
+
+    def test_parse_unknown_compact_code(self):
+        """
+        Test compact token with unknown claim codes.
+        """
+        claims = {'v': tokens.COMPACT_VERSION, 't': 0, 'm': 7, 'p': 13}
+        token = paseto.create(
+            key=bytes.fromhex(AUTH_SETTINGS['SECRET_KEY']),
+            purpose='local',
+            claims=claims,
+        )
+        access_token = tokens.AccessToken(token=token.decode())
+        self.assertFalse(access_token.is_valid())
+
+    def test_factory(self):
+        """
+        Test tokens minted by a factory are valid and carry the claims.
+        """
+        factory = tokens.AccessToken.factory(model='user')
+        token = factory(pk=13)
+        self.assertIsInstance(token, tokens.AccessToken)
+        self.assertEqual(token.data['type'], tokens.ACCESS)
+        self.assertEqual(token.data['pk'], 13)
+        self.assertNotEqual(str(token), str(factory(pk=13)))
+        parsed = tokens.AccessToken(token=str(token))
+        self.assertTrue(parsed.is_valid())
+        self.assertEqual(parsed.data, token.data)
+
+    @mock.patch.dict(AUTH_SETTINGS, {'CLAIMS_FORMAT': tokens.COMPACT})
+    def test_compact_factory(self):
+        """
+        Test refresh tokens minted by a factory with compact claims.
+        """
+        factory = tokens.RefreshToken.factory('long', model='app')
+        token = factory(key=self.data['key'])
+        self.assertAlmostEqual(
+            token.data['exp'] - int(time.time()),
+            AUTH_SETTINGS['REFRESH_LONG_LIFETIME'],
+            delta=1,
+        )
+        parsed = tokens.RefreshToken(token=str(token))
+        self.assertTrue(parsed.is_valid())
+        self.assertEqual(parsed.data, token.data)
+
+    def test_token_slots(self):
+        """
+        Test token objects don't have an instance dictionary.
+        """
+        token = tokens.AccessToken(data=self.data)
+        self.assertFalse(hasattr(token, '__dict__'))
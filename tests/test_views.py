@@ -1,13 +1,15 @@
+from unittest import mock
+
 import paseto
 import pendulum
 
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Permission, User
 from django.urls import reverse
 
 from rest_framework.test import APITestCase
 
 from paseto_auth import tokens
-from paseto_auth.models import UserRefreshToken
+from paseto_auth.models import AppRefreshToken, UserRefreshToken
 from paseto_auth.settings import AUTH_SETTINGS
 
 
@@ -116,3 +118,205 @@ class TokenViewTestCase(APITestCase):
             token=bytes(str(access_token), 'utf-8'),
         )
         self.assertEqual(parsed['message']['type'], 'access')
+
+
+class IntrospectTokenViewTestCase(APITestCase):
+    """
+    Tests for the token introspection view.
+    """
+    user_credentials = {
+        'username': 'testuser',
+        'password': 'qwerty'
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(**self.user_credentials)
+        permission = Permission.objects.get(codename='introspect_token')
+        app_token, refresh_token = tokens.create_app_token(
+            name="Introspection", perms=[permission],
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Paseto {}'.format(
+            tokens.AccessToken(data={'model': 'app', 'pk': app_token.key})
+        ))
+        response = self.client.post(
+            reverse('paseto_auth:get_token_pair'),
+            data=self.user_credentials,
+        )
+        self.token_pair = response.json()
+
+    def introspect(self, data):
+        return self.client.post(
+            reverse('paseto_auth:introspect_token'), data=data, format='json'
+        )
+
+    def test_permission(self):
+        """
+        Test introspection requires an app token with the permission.
+        """
+        app_token, refresh_token = tokens.create_app_token()
+        self.client.credentials(HTTP_AUTHORIZATION='Paseto {}'.format(
+            tokens.AccessToken(data={'model': 'app', 'pk': app_token.key})
+        ))
+        response = self.introspect({'token': self.token_pair['access_token']})
+        self.assertEqual(response.status_code, 403)
+        self.client.credentials(HTTP_AUTHORIZATION='Paseto {}'.format(
+            self.token_pair['access_token']
+        ))
+        response = self.introspect({'token': self.token_pair['access_token']})
+        self.assertEqual(response.status_code, 403)
+
+    def test_introspect_access_token(self):
+        """
+        Test introspection of a single access token.
+        """
+        response = self.introspect({'token': self.token_pair['access_token']})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['active'])
+        self.assertEqual(data['token_type'], tokens.ACCESS)
+        self.assertEqual(data['sub'], str(self.user.pk))
+        self.assertEqual(data['username'], self.user.username)
+        self.assertIsInstance(data['exp'], int)
+        self.assertNotIn('pk', data)
+        self.assertLessEqual(
+            data['expires_in'], AUTH_SETTINGS['ACCESS_LIFETIME']
+        )
+
+    def test_introspect_batch(self):
+        """
+        Test batch introspection with one query per owner model.
+        """
+        other_user = User.objects.create_user(username='other')
+        other_token = str(tokens.AccessToken(
+            data={'model': 'user', 'pk': other_user.pk}
+        ))
+        User.objects.filter(pk=other_user.pk).update(is_active=False)
+        app_token, app_refresh_token = tokens.create_app_token()
+        AppRefreshToken.objects.filter(key=app_token.key).update(locked=True)
+        batch = [
+            self.token_pair['access_token'],
+            self.token_pair['refresh_token'],
+            other_token,
+            app_refresh_token,
+            'qwerty',
+        ]
+        # Authentication and permission check (app token fetch and two
+        # permission queries), plus one query per owner model
+        with self.assertNumQueries(6):
+            response = self.introspect({
+                'tokens': batch, 'token_type_hint': 'refresh_token',
+            })
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(
+            [result['active'] for result in results],
+            [True, True, False, False, False],
+        )
+        self.assertEqual(results[1]['token_type'], tokens.REFRESH)
+        self.assertEqual(results[1]['sub'], str(self.user.pk))
+        self.assertNotIn('key', results[1])
+
+    def test_introspect_app_token(self):
+        """
+        Test app tokens are identified by an opaque subject, without their
+        key.
+        """
+        app_token, refresh_token = tokens.create_app_token()
+        access_token = str(tokens.AccessToken(
+            data={'model': 'app', 'pk': app_token.key}
+        ))
+        response = self.introspect({'tokens': [access_token, refresh_token]})
+        results = response.json()['results']
+        self.assertTrue(all(result['active'] for result in results))
+        self.assertEqual(results[0]['sub'], results[1]['sub'])
+        self.assertNotIn(app_token.key, str(results))
+
+    def test_introspect_decrypts_once(self):
+        """
+        Test refresh tokens are decrypted once whatever the hint.
+        """
+        with mock.patch(
+            'paseto_auth.serializers.decode_token', wraps=tokens.decode_token
+        ) as decode:
+            response = self.introspect({
+                'token': self.token_pair['refresh_token'],
+                'token_type_hint': 'access_token',
+            })
+        self.assertTrue(response.json()['active'])
+        self.assertEqual(decode.call_count, 1)
+
+    def test_invalid_request(self):
+        """
+        Test requests must have either a token or a batch.
+        """
+        response = self.introspect({})
+        self.assertEqual(response.status_code, 400)
+        response = self.introspect({
+            'token': self.token_pair['access_token'],
+            'tokens': [self.token_pair['access_token']],
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTokensViewTestCase(APITestCase):
+    """
+    Tests for the token export view.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser')
+        permission = Permission.objects.get(codename='export_tokens')
+        self.app_token, refresh_token = tokens.create_app_token(
+            name="Export", perms=[permission],
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Paseto {}'.format(
+            tokens.AccessToken(
+                data={'model': 'app', 'pk': self.app_token.key}
+            )
+        ))
+
+    def export(self, refresh_token_type, export_format):
+        return self.client.get(reverse(
+            'paseto_auth:export_tokens',
+            kwargs={
+                'refresh_token_type': refresh_token_type,
+                'export_format': export_format,
+            },
+        ))
+
+    def test_permission(self):
+        """
+        Test the export requires the permission.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Paseto {}'.format(
+            tokens.AccessToken(data={'model': 'user', 'pk': self.user.pk})
+        ))
+        self.assertEqual(self.export('app', 'csv').status_code, 403)
+
+    def test_export(self):
+        """
+        Test the tokens are streamed in the requested format.
+        """
+        response = self.export('app', 'jsonl')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn(self.app_token.key, lines[0])
+        response = self.export('user', 'csv')
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().split(',')[0],
+            'key',
+        )
+        self.assertEqual(self.export('user', 'xml').status_code, 404)
+
+    def test_unsupported_store(self):
+        """
+        Test exporting tokens not stored in the database is not found.
+        """
+        with mock.patch.dict(AUTH_SETTINGS, {
+            'TOKEN_STORE': 'paseto_auth.stores.InMemoryTokenStore',
+            'TOKEN_STORE_OPTIONS': {},
+        }):
+            self.assertEqual(self.export('user', 'csv').status_code, 404)
@@ -0,0 +1,219 @@
+import asyncio
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import DatabaseError
+from django.test import TestCase
+
+from paseto_auth import clock, tokens
+from paseto_auth.settings import AUTH_SETTINGS
+from paseto_auth.websocket import (
+    CLOSE_CODE,
+    Connection,
+    PasetoWebsocketAuthMiddleware,
+    Revalidator,
+    get_scope_token,
+)
+
+
+class WebsocketTestCase(TestCase):
+    """
+    Tests for the websocket authentication middleware.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser")
+        self.token = str(tokens.AccessToken(
+            data={'model': 'user', 'pk': self.user.pk}
+        ))
+        self.revalidator = Revalidator(interval=3600)
+        self.scopes = []
+        self.sent = []
+
+    async def inner(self, scope, receive, send):
+        self.scopes.append(scope)
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    async def receive(self):
+        return {'type': 'websocket.connect'}
+
+    def connect(self, scope):
+        middleware = PasetoWebsocketAuthMiddleware(
+            self.inner, revalidator=self.revalidator
+        )
+        scope = dict({'type': 'websocket'}, **scope)
+        async_to_sync(middleware)(scope, self.receive, self.send)
+        return self.scopes[-1]
+
+    def test_scope_token(self):
+        """
+        Test the access token is read from headers, subprotocols and query.
+        """
+        self.assertEqual(get_scope_token({
+            'headers': [(b'authorization', b'Paseto qwerty')]
+        }), 'qwerty')
+        self.assertEqual(get_scope_token({
+            'subprotocols': ['paseto', 'qwerty']
+        }), 'qwerty')
+        self.assertEqual(get_scope_token({
+            'query_string': b'token=qwerty'
+        }), 'qwerty')
+        self.assertIsNone(get_scope_token({
+            'headers': [(b'authorization', b'Basic qwerty')],
+            'subprotocols': ['paseto'],
+        }))
+
+    def test_authenticate(self):
+        """
+        Test the user is resolved from a valid access token.
+        """
+        scope = self.connect({'query_string': b'token=' + self.token.encode()})
+        self.assertEqual(scope['user'].pk, self.user.pk)
+        self.assertEqual(scope['auth'].data['pk'], self.user.pk)
+
+    def test_invalid_token(self):
+        """
+        Test anonymous user if invalid access token.
+        """
+        scope = self.connect({'query_string': b'token=qwerty'})
+        self.assertFalse(scope['user'].is_authenticated)
+        self.assertIsNone(scope['auth'])
+        scope = self.connect({'type': 'websocket'})
+        self.assertFalse(scope['user'].is_authenticated)
+
+    def test_revalidate(self):
+        """
+        Test connections are closed if revoked, but not when the access
+        token expires.
+        """
+        other_user = User.objects.create_user(username="otheruser")
+        obj, refresh_token = tokens.create_app_token()
+        access_tokens = [
+            tokens.AccessToken(token=str(tokens.AccessToken(data=data)))
+            for data in (
+                {'model': 'user', 'pk': self.user.pk},
+                {'model': 'user', 'pk': other_user.pk},
+                {'model': 'app', 'pk': obj.key},
+            )
+        ]
+        connections = []
+        for access_token in access_tokens:
+            access_token.is_valid()
+            connection = Connection(access_token, self.send)
+            self.revalidator.connections.add(connection)
+            connections.append(connection)
+
+        other_user.is_active = False
+        other_user.save()
+        with self.assertNumQueries(2):
+            async_to_sync(self.revalidator.revalidate)()
+        self.assertEqual(
+            [c.closed for c in connections], [False, True, False]
+        )
+        self.assertEqual(
+            self.sent, [{'type': 'websocket.close', 'code': CLOSE_CODE}]
+        )
+
+        expired_at = time.time() + AUTH_SETTINGS['ACCESS_LIFETIME'] + 1
+        with clock.freeze(expired_at):
+            async_to_sync(self.revalidator.revalidate)()
+        self.assertEqual(
+            [c.closed for c in connections], [False, True, False]
+        )
+
+        obj.locked = True
+        obj.save()
+        with clock.freeze(expired_at):
+            async_to_sync(self.revalidator.revalidate)()
+        self.assertEqual(
+            [c.closed for c in connections], [False, True, True]
+        )
+        self.assertEqual(len(self.revalidator.connections), 1)
+
+    def test_register_loops(self):
+        """
+        Test the timer is restarted in the event loop of a new connection.
+        """
+        async def register():
+            self.revalidator.register(Connection(access_token, self.send))
+            return self.revalidator._task
+
+        access_token = tokens.AccessToken(data={
+            'model': 'user', 'pk': self.user.pk,
+        })
+        tasks = []
+        for i in range(2):
+            loop = asyncio.new_event_loop()
+            self.addCleanup(loop.close)
+            task = loop.run_until_complete(register())
+            self.assertIs(task.get_loop(), loop)
+            self.assertFalse(task.done())
+            tasks.append(task)
+        self.assertIsNot(tasks[0], tasks[1])
+        for task in tasks:
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                task.get_loop().run_until_complete(task)
+
+    def test_sharded_app_tokens(self):
+        """
+        Test app tokens are revalidated through the token store.
+        """
+        with mock.patch.dict(AUTH_SETTINGS, {
+            'TOKEN_STORE': 'paseto_auth.stores.ShardedTokenStore',
+            'TOKEN_STORE_OPTIONS': {'databases': ['default', 'replica']},
+        }):
+            connections = []
+            for i in range(4):
+                obj, refresh_token = tokens.create_app_token(name=str(i))
+                access_token = tokens.AccessToken(data={
+                    'model': 'app', 'pk': obj.key,
+                })
+                connection = Connection(access_token, self.send)
+                self.revalidator.connections.add(connection)
+                connections.append(connection)
+            async_to_sync(self.revalidator.revalidate)()
+        self.assertFalse(any(c.closed for c in connections))
+
+    def test_close_errors(self):
+        """
+        Test a failing close doesn't stop closing the other connections.
+        """
+        async def broken_send(message):
+            raise OSError
+
+        for send in (broken_send, self.send):
+            access_token = tokens.AccessToken(data={
+                'model': 'user', 'pk': self.user.pk + 1,
+            })
+            self.revalidator.connections.add(Connection(access_token, send))
+        with self.assertLogs('paseto_auth.websocket'):
+            async_to_sync(self.revalidator.revalidate)()
+        self.assertEqual(
+            self.sent, [{'type': 'websocket.close', 'code': CLOSE_CODE}]
+        )
+        self.assertFalse(self.revalidator.connections)
+
+    def test_run_errors(self):
+        """
+        Test a failed revalidation is logged and the timer keeps running.
+        """
+        revalidator = Revalidator(interval=0.001)
+        calls = []
+
+        async def revalidate():
+            calls.append(revalidator)
+            if len(calls) == 1:
+                raise DatabaseError
+            revalidator.connections.clear()
+
+        revalidator.revalidate = revalidate
+        revalidator.connections.add(mock.Mock())
+        with self.assertLogs('paseto_auth.websocket'):
+            async_to_sync(revalidator.run)()
+        self.assertEqual(len(calls), 2)
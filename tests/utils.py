@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin(object):
+    """
+    Test case mixin to assert query budgets.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        """
+        Asserts the number of queries, excluding the savepoints the test
+        case transaction turns atomic blocks into.
+        """
+        with CaptureQueriesContext(connection) as context:
+            yield
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if 'SAVEPOINT' not in query['sql']
+        ]
+        self.assertEqual(len(queries), budget, '\n'.join(queries))